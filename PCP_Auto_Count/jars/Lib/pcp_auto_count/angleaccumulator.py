@@ -0,0 +1,68 @@
+# Running statistics over a stream of angles, for summaries and rose diagrams over any number of chunks or images.
+# Only sums, counts and bar counts are kept, never the angles themselves, so memory use doesn't grow with the number of angles.
+# Accumulators from different images (or worker threads) can be merged, as long as they count the same rose diagram bars.
+# Nothing in this file depends on ImageJ.
+from pcp_auto_count.umath import addToAngleHistogram, getCircularMeanFromSums, getSinCosSums
+
+class AngleAccumulator:
+
+	# barCount is the number of rose diagram bars to count angles into (0 for none),
+	# and barsZeroTo360 is the scale of those bars: True for 0 to 360, False for -180 to 180.
+	def __init__(self, barCount=0, barsZeroTo360=True):
+		self.count = 0
+		self.sinSum = 0.0
+		self.cosSum = 0.0
+		self.minAngle = None
+		self.maxAngle = None
+		self.barsZeroTo360 = barsZeroTo360
+		self.bars = [0] * barCount
+
+	# Adds one angle, in degrees.
+	def add(self, angle):
+		self.addAngles([angle])
+
+	# Adds a list of angles, in degrees.
+	def addAngles(self, angles):
+		if len(angles) == 0:
+			return
+		sums = getSinCosSums(angles)
+		self.sinSum = self.sinSum + sums[0]
+		self.cosSum = self.cosSum + sums[1]
+		self.count = self.count + len(angles)
+
+		smallest = min(angles)
+		largest = max(angles)
+		if self.minAngle is None or smallest < self.minAngle:
+			self.minAngle = smallest
+		if self.maxAngle is None or largest > self.maxAngle:
+			self.maxAngle = largest
+
+		if len(self.bars) > 0:
+			addToAngleHistogram(self.bars, angles, self.barsZeroTo360)
+
+	# Adds everything another accumulator has counted to this one.
+	def merge(self, other):
+		if len(other.bars) != len(self.bars) or (len(self.bars) > 0 and other.barsZeroTo360 != self.barsZeroTo360):
+			raise ValueError("Can't merge angle accumulators that count different rose diagram bars.")
+		if other.count == 0:
+			return
+		self.sinSum = self.sinSum + other.sinSum
+		self.cosSum = self.cosSum + other.cosSum
+		self.count = self.count + other.count
+		if self.minAngle is None or other.minAngle < self.minAngle:
+			self.minAngle = other.minAngle
+		if self.maxAngle is None or other.maxAngle > self.maxAngle:
+			self.maxAngle = other.maxAngle
+		for i in range(len(self.bars)):
+			self.bars[i] = self.bars[i] + other.bars[i]
+
+	# Returns [mean angle, RML, variance, standard deviation] of the angles added so far, like getCircularMeanOfAngles,
+	# or "N/A" for each if there are none.
+	def getCircularMean(self, zeroTo360=True):
+		if self.count == 0:
+			return ["N/A", "N/A", "N/A", "N/A"]
+		return getCircularMeanFromSums(self.sinSum, self.cosSum, self.count, zeroTo360)
+
+# This part only runs if the script is run directly, which should not happen.
+if __name__ == "__main__" or __name__ == "__builtin__":
+	print "This module is not meant to be run directly."
@@ -0,0 +1,587 @@
+# The ImageJ-independent part of ChunkCollection: a list of chunks and the measuring pipeline that runs on them.
+# Chunks can be loaded from a PixelBuffer or a plain list of pixel rows, so this runs under plain CPython too.
+# chunkcollection.py adds reading ImagePlus images and all the ImageJ output (images, overlays, tables, rose diagrams).
+from pcp_auto_count import numpybackend
+from pcp_auto_count.angleaccumulator import AngleAccumulator
+from pcp_auto_count.chunkfinder import ChunkFinder
+from pcp_auto_count.noiserecords import NoiseRecords
+from pcp_auto_count.pixelbuffer import PixelBuffer, RgbPixelBuffer
+from pcp_auto_count.plasticwrap import PlasticWrap
+from pcp_auto_count.profiler import StageProfiler
+from pcp_auto_count.progress import ProgressReporter
+from pcp_auto_count import resultcache
+from pcp_auto_count.settings import Color
+from pcp_auto_count.umath import getAnglesM, angleAxisModeIsZeroTo360
+from pcp_auto_count.workerpool import runOnItems
+
+degreeSign = u"\N{DEGREE SIGN}"
+angleLabel = "Angle" + degreeSign
+
+# The columns of a results row, as returned by getResultRows.
+resultColumns = ["Label", "Chunk Centroid X", "Chunk Centroid Y", "Cave Centroid X", "Cave Centroid Y", "Vector Length", "Chunk Area", angleLabel]
+
+# The fixed colors of the output image.
+blackRGB = Color(0, 0, 0).getRGB()
+whiteRGB = Color(255, 255, 255).getRGB()
+grayRGB = Color(66, 66, 66).getRGB()
+
+# Processing settings that only change which chunks are filtered out (or nothing at all).
+# Chunks measured before with the rest of the settings the same don't have to be measured again (see refilterChunks).
+filterSettings = ('remove_noise', 'noise_max_size', 'remove_conglomerates', 'conglomerates_min_size', 'exclude_border_cells', 'exclude_oblong_cells', 'oblong_multiplier', 'split_doublets', 'chunk_labeling_mode', 'batch_worker_count', 'chunk_worker_count', 'strip_width', 'result_cache_size')
+
+# Returns the size of the components the labeler can set aside as noise straight away, or 0 if the options keep them all.
+def getLabelingNoiseMaxSize(options):
+	if options is not None and options.removeNoise == True:
+		return options.noiseMaxSize
+	return 0
+
+class BaseChunkCollection:
+
+	# Constructor
+	def __init__(self):
+		self.chunks = []
+		self.noiseChunks = []
+		self.conglomerates = []
+		self.tooWideChunks = []
+		self.tooTallChunks = []
+		self.doubletBothAxisChunks = []
+		self.removedBorderChunks = []
+		self.badChunks = []
+
+		# Noise set aside while labeling, before it became chunks (see noiserecords.py). It's drawn like noiseChunks.
+		self.noiseRecords = NoiseRecords()
+
+		self.imageWidth = 0
+		self.imageHeight = 0
+		self.imageDepth = 1
+		self.imageType = "RGB"
+		self.imageTitle = "untitled"
+		self.chunkWorkerCount = 1
+		self.progress = ProgressReporter()
+
+		# Records the time and chunk counts of every stage when the options ask for a profile (see profiler.py).
+		self.profiler = None
+
+		# Statistics and rose diagram bar counts of the chunk angles, filled in by calculateAngles.
+		self.angleAccumulator = AngleAccumulator()
+
+		# The chunks as found, before any filtering, kept by measureChunks so refilterChunks can start over from them.
+		self.labeledChunks = None
+
+		# Doublets already split, and chunks already measured (plastic wrap, centroid and cave), by id of the filtered chunk.
+		# Each entry also holds the filtered chunk itself, so its id can't be reused by another chunk.
+		self.splitChunks = {}
+		self.measuredChunks = {}
+		self.measuredChunksKey = None
+
+	# Returns how many chunks currently exist.
+	def count(self):
+		return len(self.chunks)
+
+	# Adds a chunk to the collection
+	def append(self, chunk):
+		self.chunks.append(chunk)
+
+	# Records the size, type and title of the image the chunks come from.
+	def setImageInfo(self, width, height, title="untitled", depth=1, imageType="8-bit", options=None):
+		self.imageWidth = width
+		self.imageHeight = height
+		self.imageDepth = depth
+		self.imageType = imageType
+		self.imageTitle = title
+		if options is not None:
+			self.chunkWorkerCount = options.chunkWorkerCount
+			if options.outputStageProfile == True:
+				self.profiler = StageProfiler(title, width, height)
+
+	# Finds the chunks, noise included, in a PixelBuffer.
+	# The labeling engine is picked by options.chunkLabelingMode; they all produce the same chunks.
+	# 'numpy' needs NumPy (so not in Fiji); without it, the union-find engine is used.
+	def loadChunksFromPixels(self, pixels, title="untitled", options=None):
+		self.setImageInfo(pixels.width, pixels.height, title, options=options)
+		self.findChunksInPixels(pixels, options)
+
+	# Finds the chunks in a plain 2-D array: a list of rows, each a sequence of pixel values (0 to 255).
+	def loadChunksFromRows(self, rows, title="untitled", options=None, foreground=255):
+		self.loadChunksFromPixels(PixelBuffer.fromRows(rows, foreground), title, options)
+
+	# With noiseMaxSize above 0, the union-find engine puts components of at most that many pixels in noiseRecords
+	# instead of making chunks of them. The other engines make chunks of everything, and leave the noise to filterChunks.
+	def findChunksInPixels(self, pixels, options=None, noiseMaxSize=0):
+		if self.profiler is not None:
+			self.profiler.startStage("find chunks", self.chunks)
+		self.noiseRecords = NoiseRecords(noiseMaxSize)
+		if options is not None and options.chunkLabelingMode == 'legacy':
+			ChunkFinder.FindChunks(pixels, self.chunks, self.progress)
+		elif options is not None and options.chunkLabelingMode == 'numpy' and numpybackend.isAvailable():
+			numpybackend.FindChunks(pixels, self.chunks, self.progress)
+		else:
+			ChunkFinder.FindChunksUnionFind(pixels, self.chunks, self.progress, noiseMaxSize, self.noiseRecords)
+		if self.profiler is not None:
+			self.profiler.endStage(self.chunks)
+
+	# Calls function(*args) as one stage of the pipeline, and returns what it returns.
+	# With profiling on, the stage's time and the chunks before and after it are recorded under name.
+	def runStage(self, name, function, *args):
+		if self.profiler is None:
+			return function(*args)
+		self.profiler.startStage(name, self.chunks)
+		result = function(*args)
+		self.profiler.endStage(self.chunks)
+		return result
+
+	# Runs the whole measuring pipeline on a PixelBuffer. See measureChunks.
+	def measurePixels(self, pixels, options, title="untitled"):
+		self.setImageInfo(pixels.width, pixels.height, title, options=options)
+		self.findAndMeasureChunks(pixels, options)
+
+	# Finds and measures the chunks in a PixelBuffer, after setImageInfo.
+	# With options.resultCacheSize above 0, the measured chunks are read from the result cache when this image
+	# has been measured with the same processing settings before, and stored there otherwise (see resultcache.py).
+	def findAndMeasureChunks(self, pixels, options):
+		if options.resultCacheSize <= 0:
+			self.findChunksInPixels(pixels, options, getLabelingNoiseMaxSize(options))
+			self.measureChunks(options)
+			return
+
+		key = self.runStage("result cache lookup", resultcache.getCacheKey, pixels, options)
+		if self.runStage("result cache load", resultcache.loadCachedResult, key, self):
+			self.runStage("angle statistics", self.accumulateAngles, options)
+			return
+		self.findChunksInPixels(pixels, options, getLabelingNoiseMaxSize(options))
+		self.measureChunks(options)
+		self.runStage("result cache store", resultcache.storeResult, key, self, options.resultCacheSize)
+
+	# Runs everything in the pipeline after finding chunks on the chunks already in the collection.
+	# The label numbers start after labelOffsets (chunks, bad chunks, removed border chunks).
+	# The chunks are kept as they are now, so the filters can be tuned afterwards with refilterChunks.
+	def measureChunks(self, options, labelOffsets=(0, 0, 0)):
+		self.labeledChunks = list(self.chunks)
+		self.splitChunks = {}
+		self.measuredChunks = {}
+		self.measuredChunksKey = None
+		self.refilterChunks(options, labelOffsets)
+
+	# Runs the pipeline again, with new options, on the chunks measureChunks started from, without finding them again.
+	# The filters are cheap passes over the chunks. Only the chunks that weren't measured before with the same
+	# settings (other than the filterSettings) are plastic wrapped and have their caves found; the rest keep their results.
+	# Noise set aside while labeling can't become chunks again, so the noise threshold can only go up from there.
+	def refilterChunks(self, options, labelOffsets=(0, 0, 0)):
+		if self.labeledChunks is None:
+			raise ValueError("There are no labeled chunks to filter; measure the chunks first.")
+		if len(self.noiseRecords) > 0 and getLabelingNoiseMaxSize(options) < self.noiseRecords.maxSize:
+			raise ValueError("Noise of up to " + str(self.noiseRecords.maxSize) + " pixels was removed while labeling; find the chunks again to keep it.")
+		# Removed border chunks are labeled as they were found (everything else is labeled as a measured copy),
+		# and they may end up in another list this time.
+		for c in self.removedBorderChunks:
+			if hasattr(c, 'label'):
+				del c.label
+		self.chunks = list(self.labeledChunks)
+		self.noiseChunks = []
+		self.conglomerates = []
+		self.tooWideChunks = []
+		self.tooTallChunks = []
+		self.doubletBothAxisChunks = []
+		self.removedBorderChunks = []
+		self.badChunks = []
+
+		self.runStage("filters", self.filterChunks, options)
+		self.measureFilteredChunks(options)
+		self.runStage("bad chunk removal", self.removeCavelessChunks)
+		self.runStage("angles", self.calculateAngles, options)
+		self.runStage("labels", self.generateChunkLabels, labelOffsets[0], labelOffsets[1], labelOffsets[2])
+
+	# Plastic wraps the chunks that made it through the filters and finds their centroids, caves and centroid distances,
+	# reusing the results for chunks measured before with the same settings.
+	# Each chunk is measured as a copy (plastic wrap changes its pixels), so the labeled chunks stay as they were found.
+	def measureFilteredChunks(self, options):
+		key = '\n'.join([line for line in options.getProcessingIniString().split('\n') if not line.startswith(filterSettings)])
+		if key != self.measuredChunksKey:
+			self.measuredChunks = {}
+			self.measuredChunksKey = key
+
+		filteredChunks = self.chunks
+		newChunks = [c for c in filteredChunks if id(c) not in self.measuredChunks]
+		self.chunks = [c.copy() for c in newChunks]
+		if options.usePlasticWrap == True:
+			self.runStage("plastic wrap", self.plasticWrapChunks, 0, options)
+		self.runStage("centroids", self.findCentroids)
+		self.runStage("caves", self.findCaves, options)
+		for c, measuredChunk in zip(newChunks, self.chunks):
+			self.measuredChunks[id(c)] = (c, measuredChunk)
+
+		self.chunks = [c for c in self.chunks if c.hasUsableCave()]
+		self.runStage("centroid distances", self.findCentroidDistances)
+
+		self.chunks = [self.measuredChunks[id(c)][1] for c in filteredChunks]
+
+
+	# Measures an image strip by strip (options.stripWidth columns at a time), for images too large to hold all their chunks.
+	# Only the memory for chunks is bounded by the strip; how much of the image itself is in memory is up to readStrip.
+	# readStrip(x, stripWidth) returns the PixelBuffer for one strip of the image, which is width x height pixels.
+	# Each time a strip is read, the chunks completed so far are measured as their own collection (of this class) and
+	# passed to onStripMeasured(chunks), then dropped. Labels keep counting up across strips, so they stay unique in the image.
+	# Chunks come out in the order they are completed, rather than the order they are first found.
+	# With noise removal on, the noise of each strip never becomes chunks; it's in the collection's noiseRecords.
+	# Progress goes to the given reporter, or to the usual one of this class if there isn't one.
+	@classmethod
+	def measureInStrips(cls, readStrip, width, height, options, onStripMeasured, title="untitled", setupCollection=None, progress=None):
+		labelOffsets = [0, 0, 0]
+		if progress is None:
+			progress = cls().progress
+		def measureCompletedChunks(completedChunks, noiseRecords):
+			chunks = cls()
+			chunks.progress = progress
+			chunks.setImageInfo(width, height, title, options=options)
+			if setupCollection is not None:
+				setupCollection(chunks)
+			chunks.chunks = completedChunks
+			chunks.noiseRecords = noiseRecords
+			chunks.measureChunks(options, labelOffsets)
+			labelOffsets[0] += len(chunks.chunks)
+			labelOffsets[1] += len(chunks.badChunks)
+			labelOffsets[2] += len(chunks.removedBorderChunks)
+			onStripMeasured(chunks)
+		ChunkFinder.FindChunksInStrips(readStrip, width, options.stripWidth, measureCompletedChunks, progress, getLabelingNoiseMaxSize(options))
+
+	# Calls function(chunk) for every chunk, spread over chunkWorkerCount threads (0 means one per processor).
+	# Each chunk is handled by exactly one thread and the chunk list keeps its order, so labels don't change.
+	def forEachChunk(self, function, status):
+		def showChunkProgress(finishedCount, totalCount):
+			self.progress.showStatus(status)
+			self.progress.showProgress(finishedCount, totalCount)
+		runOnItems(function, self.chunks, self.chunkWorkerCount, showChunkProgress)
+
+	# Sorts the chunks into the kept chunks and the lists of removed ones, in a single pass, by the filter options:
+	# noise, conglomerates, too wide and too tall chunks (excludeOblongCells), doublets to split or to remove
+	# (doubletBothAxisChunks) and, after splitting, chunks at the image border. Each chunk goes to the first filter it fails.
+	# The kept chunks stay in order, with the halves of a split doublet in its place. Every list of removed chunks is
+	# filled in reverse order, like the filters that popped chunks off the end of the list used to.
+	def filterChunks(self, options):
+		removeNoise = options.removeNoise == True
+		removeConglomerates = options.removeConglomerates == True
+		checkTooWide = options.excludeOblongCellsW == True and options.oblongMultiplierW > 0.0
+		checkTooTall = options.excludeOblongCellsH == True and options.oblongMultiplierH > 0.0
+		splitTooWide = options.splitDoubletsW == True and options.splitDoubletsMultiplierW > 0.0
+		splitTooTall = options.splitDoubletsH == True and options.splitDoubletsMultiplierH > 0.0
+		checkShape = checkTooWide or checkTooTall or splitTooWide or splitTooTall
+		excludeBorder = options.excludeBorderCells == True
+		borderOffset = 1 + options.excludeBorderCellsDistance
+
+		kept = []
+		noiseChunks = []
+		conglomerates = []
+		tooWideChunks = []
+		tooTallChunks = []
+		doubletBothAxisChunks = []
+		removedBorderChunks = []
+
+		self.progress.showStatus("PCP Auto Count: Filtering Chunks...")
+		count = len(self.chunks)
+		for i, c in enumerate(self.chunks):
+			self.progress.showProgress(i, count)
+			if removeNoise and c.size <= options.noiseMaxSize:
+				noiseChunks.append(c)
+				continue
+			if removeConglomerates and c.size >= options.conglomeratesMinSize:
+				conglomerates.append(c)
+				continue
+
+			pieces = [c]
+			if checkShape:
+				w = float(c.getBoundingBoxWidth())
+				h = float(c.getBoundingBoxHeight())
+				if checkTooWide and w >= h * options.oblongMultiplierW:
+					tooWideChunks.append(c)
+					continue
+				if checkTooTall and h >= w * options.oblongMultiplierH:
+					tooTallChunks.append(c)
+					continue
+				isTooWide = splitTooWide and w >= h * options.splitDoubletsMultiplierW
+				isTooTall = splitTooTall and h >= w * options.splitDoubletsMultiplierH
+				if isTooWide and isTooTall:
+					doubletBothAxisChunks.append(c)
+					continue
+				elif isTooWide:
+					pieces = self.getSplitChunks(c, 'W')
+				elif isTooTall:
+					pieces = self.getSplitChunks(c, 'H')
+
+			for piece in pieces:
+				if excludeBorder and self.isBorderChunk(piece, borderOffset):
+					removedBorderChunks.append(piece)
+				else:
+					kept.append(piece)
+
+		self.chunks = kept
+		for removedChunks, chunkList in [(noiseChunks, self.noiseChunks), (conglomerates, self.conglomerates), (tooWideChunks, self.tooWideChunks), (tooTallChunks, self.tooTallChunks), (doubletBothAxisChunks, self.doubletBothAxisChunks), (removedBorderChunks, self.removedBorderChunks)]:
+			removedChunks.reverse()
+			chunkList.extend(removedChunks)
+		self.progress.showProgress(1, 1)
+
+	# Returns whether a chunk comes within offset pixels of the image border (an offset of 1 means touching it).
+	def isBorderChunk(self, chunk, offset):
+		if chunk.minX < offset or chunk.minY < offset:
+			return True
+		return chunk.maxX >= self.imageWidth - offset or chunk.maxY >= self.imageHeight - offset
+
+	# Returns the two halves of a doublet split vertically ('W', for too wide) or horizontally ('H'),
+	# the same ones every time, so refilterChunks can reuse their measurements.
+	def getSplitChunks(self, chunk, axis):
+		key = (id(chunk), axis)
+		if key not in self.splitChunks:
+			if axis == 'W':
+				self.splitChunks[key] = (chunk, chunk.divide())
+			else:
+				self.splitChunks[key] = (chunk, chunk.divideHorizontally())
+		return self.splitChunks[key][1]
+
+	# Uses vector math to find new borders as though you were plastic wrapping them.
+	# Mostly useful for chunks with true caves that aren't fully enclosed in the chunk.
+	# The options pick the engine (legacy scans or convex hull); without options the legacy engine is used.
+	def plasticWrapChunks(self, expandBoundsBy = 0, options=None):
+		mode = 'legacy'
+		if options is not None:
+			mode = options.plasticWrapMode
+		PlasticWrap.plasticWrapChunks(self, mode=mode, workerCount=self.chunkWorkerCount, progress=self.progress)
+
+	# Finds the true cave of each chunk in the collection.
+	# The cavefinder also finds the cave centroid when a cave is detected.
+	def findCaves(self, options=None):
+		self.forEachChunk(lambda c: c.findCave(options), "PCP Auto Count: Finding Caves...")
+
+	# Moves any chunk that has no cave to the bad chunks, in reverse order like the other removed chunks.
+	def removeCavelessChunks(self):
+		self.progress.showStatus("PCP Auto Count: Marking Bad Chunks...")
+		kept = []
+		badChunks = []
+		for c in self.chunks:
+			# This also removes any chunk where the chunk centroid is the same point as the cave centroid.
+			if c.hasUsableCave():
+				kept.append(c)
+			else:
+				badChunks.append(c)
+		self.chunks = kept
+		badChunks.reverse()
+		self.badChunks.extend(badChunks)
+		self.progress.showProgress(1, 1)
+
+	# Finds the centroids of each chunk.
+	def findCentroids(self):
+		self.forEachChunk(lambda c: c.findCentroid(), "PCP Auto Count: Calculating chunk centroids...")
+
+        # For each chunk, finds the distance between the chunk and cave centroid.
+	def findCentroidDistances(self):
+                count = self.count()
+                for i, c in enumerate(self.chunks):
+                        self.progress.showStatus("PCP Auto Count: Calculating centroid distances...")
+			self.progress.showProgress(i, count)
+                        c.findCentroidDistance()                
+
+	# Calculates the cell-PCP angle for each chunk.
+	# The angles of all chunks are computed with one getAnglesM call, with the same results as Chunk.calculateAngle.
+	# They're also added to a new angleAccumulator (see accumulateAngles).
+	def calculateAngles(self, options):
+		self.progress.showStatus("PCP Auto Count: Taking angle measurements...")
+		x1s = [float(c.centroid[0]) for c in self.chunks]
+		x2s = [float(c.caveCentroid[0]) for c in self.chunks]
+		y1s = [float(c.centroid[1]) for c in self.chunks]
+		y2s = [float(c.caveCentroid[1]) for c in self.chunks]
+		imageAngles, angles = getAnglesM(x1s, x2s, y1s, y2s, options)
+		count = self.count()
+		for i, c in enumerate(self.chunks):
+			self.progress.showProgress(i, count)
+			c.imageAngle = imageAngles[i]
+			c.angle = angles[i]
+			c.findAngleOrientation()
+		self.accumulateAngles(options, angles)
+		self.progress.showProgress(1, 1)
+
+	# Adds the chunk angles (or the angles given) to a new angleAccumulator, counting the rose diagram bars the options ask for.
+	def accumulateAngles(self, options, angles=None):
+		if angles is None:
+			angles = [c.angle for c in self.chunks]
+		self.angleAccumulator = AngleAccumulator(int(360 / options.outputRoseDiagramBarSize), angleAxisModeIsZeroTo360(options.angleAxisMode))
+		self.angleAccumulator.addAngles(angles)
+
+	# Generates a unique numeric label for each chunk for identification on the image and/or results table.
+	# The numbering of each kind of label can start after an offset, for collections that continue another one.
+	def generateChunkLabels(self, chunkOffset=0, badChunkOffset=0, removedBorderChunkOffset=0):
+		count = self.count()
+		for i, chunk in enumerate(self.chunks):
+			self.progress.showStatus("PCP Auto Count: Generating Chunk Labels...")
+			self.progress.showProgress(i, count)
+			chunk.label = str(chunkOffset + i + 1)
+		count = len(self.badChunks)
+		for i, badChunk in enumerate(self.badChunks):
+			self.progress.showStatus("PCP Auto Count: Generating Bad Chunk Labels...")
+			self.progress.showProgress(i, count)
+			badChunk.label = "BAD_" + str(badChunkOffset + i + 1)
+		count = len(self.removedBorderChunks)
+		for i, removedBorderChunk in enumerate(self.removedBorderChunks):
+			self.progress.showStatus("PCP Auto Count: Generating Removed Border Chunk Labels...")
+			self.progress.showProgress(i, count)
+			removedBorderChunk.label = "REM_" + str(removedBorderChunkOffset + i + 1)
+		self.progress.showProgress(1, 1)
+
+
+	# Returns one row (see resultColumns) per measured chunk, followed by the bad chunks if asked for,
+	# which have no cave, so their cave and angle columns are empty strings.
+	def getResultRows(self, includeBadChunks=False):
+		rows = []
+		for c in self.chunks:
+			rows.append([c.label, c.centroid[0], c.centroid[1], c.caveCentroid[0], c.caveCentroid[1], c.centroidDistance, c.getSize(), c.angle])
+		if includeBadChunks == True:
+			for b in self.badChunks:
+				rows.append([b.label, b.centroid[0], b.centroid[1], "", "", "", b.getSize(), ""])
+		return rows
+
+	# Returns the aggregate statistics about the angle data, as a dictionary:
+	# counts of processed, bad and total chunks, the percentage processed, the smallest and largest angle,
+	# circularMean, which is [mean angle, RML, variance, standard deviation], and the rose diagram bar counts.
+	# Values that can't be computed are "N/A". Everything comes from angleAccumulator, so no angles are gathered or sorted.
+	def getAngleSummary(self, angleAxisScaleZeroTo360=False):
+
+		self.progress.showStatus("PCP Auto Count: Generating Cell Summary...")
+		accumulator = self.angleAccumulator
+
+		summary = {}
+		summary['count'] = 0
+		summary['badCount'] = 0
+		summary['totalCount'] = 0
+		summary['processedPercent'] = "N/A"
+		summary['minAngle'] = "N/A"
+		summary['maxAngle'] = "N/A"
+		summary['circularMean'] = ["N/A", "N/A", "N/A", "N/A"]
+		summary['bars'] = accumulator.bars
+
+		if accumulator.count > 0:
+			summary['count'] = accumulator.count
+			summary['badCount'] = len(self.badChunks)
+			summary['totalCount'] = summary['count'] + summary['badCount']
+			summary['processedPercent'] = (float(summary['count']) / float(summary['totalCount'])) * 100
+			summary['minAngle'] = accumulator.minAngle
+			summary['maxAngle'] = accumulator.maxAngle
+			summary['circularMean'] = accumulator.getCircularMean(angleAxisScaleZeroTo360)
+
+		return summary
+
+	# Draws the detected pixels of each chunk on a new RgbPixelBuffer, and returns it (or None if there is no image size).
+	# The measured chunks are white on black, then come the plastic wrap pixels, and the removed chunks in their colors
+	# as the options ask for them, each category drawn over the ones before it. A gray margin can go on the right.
+	# Nothing is shown, so this also serves to export the output image without ImageJ (see chunksToNewImage).
+	def renderChunks(self, options):
+		if self.imageWidth < 1 or self.imageHeight < 1:
+			return None
+
+		self.progress.showStatus("PCP Auto Count: Drawing Output Image...")
+		self.progress.showProgress(0, 1)
+
+		canvas = RgbPixelBuffer.filled(self.imageWidth + options.outputImageMarginPixels, self.imageHeight, blackRGB)
+
+		# If the user wants the gray margin, we color it in here.
+		if options.outputImageMarginPixels > 0:
+			canvas.fillRect(self.imageWidth, 0, options.outputImageMarginPixels, self.imageHeight, grayRGB)
+
+		count = self.count()
+		for i, c in enumerate(self.chunks):
+			self.progress.showStatus("PCP Auto Count: Drawing Successful Chunks...")
+			self.progress.showProgress(i, count)
+			canvas.fillEntity(c, whiteRGB)
+
+		# We only care about plastic wrap drawing options if it was actually used
+		if options.usePlasticWrap == True:
+
+			# Plastic wrap was used if we get here.
+
+			if options.outputImagePlasticWrapBorder == True:
+				# If we get here, the user wants to draw the plastic wrap pixels.
+				# In either mode, drawing all such pixels in yellow is fine to start.
+				plasticWrapRGB = options.getColorPlasticWrap().getRGB()
+				for i, c in enumerate(self.chunks):
+					self.progress.showStatus("PCP Auto Count: Drawing Plastic Wrap Pixels...")
+					self.progress.showProgress(i, count)
+					if len(c.plasticWrapBorder) > 1:
+						canvas.fillPoints(c.plasticWrapBorder, plasticWrapRGB)
+
+				if options.outputImagePlasticWrapAddedWeight == True:
+					# If the second mode was used, unique plastic wrap pixels should be in cyan instead of yellow.
+					plasticWrapNewRGB = options.getColorPlasticWrapNew().getRGB()
+					for i, c in enumerate(self.chunks):
+						self.progress.showStatus("PCP Auto Count: Drawing Plastic Wrap Added Weight...")
+						self.progress.showProgress(i, count)
+						if len(c.plasticWrapUniquePixels) > 0:
+							canvas.fillPoints(c.plasticWrapUniquePixels, plasticWrapNewRGB)
+
+			else:
+				# If plastic wrap was used but the user doesn't want those pixels highlighted, we actually need to draw any unique pixels in black.
+				# This is because they were technically added to the original chunk pixels, which were already drawn in white.
+				for i, c in enumerate(self.chunks):
+					self.progress.showStatus("PCP Auto Count: Hiding Plastic Wrap Added Weight...")
+					self.progress.showProgress(i, count)
+					if len(c.plasticWrapUniquePixels) > 0:
+						canvas.fillPoints(c.plasticWrapUniquePixels, blackRGB)
+
+		if options.outputImageNoise == True and (len(self.noiseChunks) > 0 or len(self.noiseRecords) > 0):
+			count = len(self.noiseChunks)
+			noiseRGB = options.getColorNoise().getRGB()
+			for i, n in enumerate(self.noiseChunks):
+				self.progress.showStatus("PCP Auto Count: Drawing removed noise...")
+				self.progress.showProgress(i, count)
+				canvas.fillEntity(n, noiseRGB)
+			# The noise set aside while labeling is drawn in one go, straight from its shared spans.
+			canvas.fillEntity(self.noiseRecords, noiseRGB)
+
+		if options.outputImageConglomerates == True and len(self.conglomerates) > 0:
+                        count = len(self.conglomerates)
+                        conglomeratesRGB = options.getColorConglomerates().getRGB()
+                        for i, n in enumerate(self.conglomerates):
+                                self.progress.showStatus("PCP Auto Count: Drawing removed conglomerates...")
+                                self.progress.showProgress(i, count)
+                                canvas.fillEntity(n, conglomeratesRGB)
+
+		if options.outputImageBadCells == True and len(self.badChunks) > 0:
+			count = len(self.badChunks)
+			badChunksRGB = options.getColorBadChunks().getRGB()
+			for i, b in enumerate(self.badChunks):
+				self.progress.showStatus("PCP Auto Count: Drawing bad chunks...")
+				self.progress.showProgress(i, count)
+				canvas.fillEntity(b, badChunksRGB)
+
+		if options.outputImageRemovedBorderCells == True and len(self.removedBorderChunks) > 0:
+			count = len(self.removedBorderChunks)
+			borderChunksRGB = options.getColorBorderChunks().getRGB()
+			for i, r in enumerate(self.removedBorderChunks):
+				self.progress.showStatus("PCP Auto Count: Drawing removed border chunks...")
+				self.progress.showProgress(i, count)
+				canvas.fillEntity(r, borderChunksRGB)
+
+		if options.outputImageRemovedOblongCells == True:
+                        self.progress.showStatus("PCP Auto Count: Drawing removed border chunks...")
+                        oblongChunksRGB = options.getColorOblongChunks().getRGB()
+                        if len(self.tooWideChunks) > 0:
+                                for tw in self.tooWideChunks:
+                                        canvas.fillEntity(tw, oblongChunksRGB)
+                        if len(self.tooTallChunks) > 0:
+                                for tt in self.tooTallChunks:
+                                        canvas.fillEntity(tt, oblongChunksRGB)
+
+		self.progress.showProgress(1, 1)
+
+		return canvas
+
+	def flush(self):
+		# A function to cleanup memory when an instance of ChunkCollection will no longer be needed.
+		del self.chunks
+		del self.noiseChunks
+		del self.removedBorderChunks
+		del self.badChunks
+		self.noiseRecords = None
+		self.labeledChunks = None
+		self.splitChunks = {}
+		self.measuredChunks = {}
+
+
+# This part only runs if the script is run directly, which should not happen.
+if __name__ == "__main__" or __name__ == "__builtin__":
+	print "This module is not meant to be run directly."
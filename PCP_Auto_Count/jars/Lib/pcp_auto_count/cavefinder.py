@@ -1,6 +1,7 @@
 # This file contains the cave-finding algorithm.
 from pcp_auto_count.cave import Cave
-from pcp_auto_count.umath import findCenterOfMassB, getAngleM
+from pcp_auto_count.umath import getAngleM
+from pcp_auto_count.runlabeling import findRoot, unionRuns
 
 class CaveFinder:
 
@@ -19,87 +20,13 @@ class CaveFinder:
                         if options.ignoreLargeCaves == True:
                                 largeCaveLimit = options.largeCaveMinSize
 		
-		caves = []
-		
-		for col in chunk.columns:
-		
-			roundSpans = []
-		
-			currentSpanYs = []
-			
-			for y in range(chunk.minY, chunk.maxY + 1):
-			
-				if y not in col.ys:
-				
-					if len(currentSpanYs) == 0:
-						currentSpanYs.append(y)
-					elif currentSpanYs[-1] == (y - 1):
-						currentSpanYs.append(y)
-					else:
-						# Next cave in the same column...
-						roundSpans.append([currentSpanYs[0], currentSpanYs[-1]])
-						currentSpanYs = [y]
-						
-			if not len(currentSpanYs) == 0:			
-				roundSpans.append([currentSpanYs[0], currentSpanYs[-1]])
-				currentSpanYs = []
-			
-			if col.x == chunk.minX:
-				for span in roundSpans:
-					cave = Cave()
-					cave.addSpan(col.x, span[0], span[1])
-					caves.append(cave)
-			else:
-				# For all but the first column, we need to see if the discovered pieces touch one or more existing caves to the left.
-				# If so, this piece (and possibly other caves if touching more than one) must be consolidated into it, instead of added new.
-				
-				for span in roundSpans:
-				
-					# Let's get the indexes of caves this span touches.					
-					touching = []
-					
-					for i, cave in enumerate(caves):
-						if cave.touchesSpan(col.x, span[0], span[1]) == True:
-							touching.append(i)
-							
-					# If this span touches no existing caves, it becomes a new one.
-					if len(touching) == 0:					
-						cave = Cave()
-						cave.addSpan(col.x, span[0], span[1])
-						caves.append(cave)
-					
-					# If this span touches at least one cave, add the span to the existing cave (first one if multiple).
-					elif len(touching) > 0:
-					
-						caves[touching[0]].addSpan(col.x, span[0], span[1])
-					
-						# If the span touched more than one cave, the latter caves are absorbed into the first one.
-						if len(touching) > 1:
-						
-							# Add this pixels from the other caves to the first one
-							for i in range(1, len(touching)):
-								for s in caves[touching[i]].spans:
-									caves[touching[0]].addSpan(s.x, s.minY, s.maxY)
-									
-							# Then remove the absorbed caves from the list
-							touching.pop(0)
-							touching.sort()
-							touching.reverse()
-							
-							for i in touching:
-								caves.pop(i)
-		
-		
 		chunk.cave = None
-		
-		if len(caves) == 0:
-			return False
-		
-		# Any prospective caves that are actually outside the chunk are invalid.
-		for i in range(len(caves) - 1, -1, -1):
-			if caves[i].minX == chunk.minX or caves[i].maxX == chunk.maxX or caves[i].minY == chunk.minY or caves[i].maxY == chunk.maxY:
-				caves.pop(i)
-				
+
+		if options is not None and options.caveLabelingMode == 'legacy':
+			caves = CaveFinder.FindCaveCandidates(chunk)
+		else:
+			caves = CaveFinder.FindCaveCandidatesUnionFind(chunk)
+
 		if len(caves) == 0:
 			return False
 				
@@ -182,7 +109,7 @@ class CaveFinder:
 			
 			for i, cave in enumerate(caves):
 			
-				pCentroid = findCenterOfMassB(cave.columns)				
+				pCentroid = cave.getCentroid()				
 				pAngle = None
 				if chunk.centroid[0] == pCentroid[0]:
 					if chunk.centroid[1] > pCentroid[1]:
@@ -231,6 +158,174 @@ class CaveFinder:
 		
 		return True
 
+	# Finds the prospective caves of a chunk: the connected pieces of background inside its bounding box
+	# that don't touch the edge of the box. They are returned in the order they were found, scanning column by column.
+	@staticmethod
+	def FindCaveCandidates(chunk):
+
+		caves = []
+		
+		spanXs = chunk.spanXs
+		spanMinYs = chunk.spanMinYs
+		spanMaxYs = chunk.spanMaxYs
+		spanCount = len(spanXs)
+		first = 0
+
+		while first < spanCount:
+
+			# The chunk's spans in this column are spanXs[first:last], sorted top to bottom.
+			x = spanXs[first]
+			last = first + 1
+			while last < spanCount and spanXs[last] == x:
+				last += 1
+
+			# The background runs are the gaps between them, within the chunk's bounding box.
+			roundSpans = []
+			y = chunk.minY
+			for i in range(first, last):
+				if spanMinYs[i] > y:
+					roundSpans.append([y, spanMinYs[i] - 1])
+				y = spanMaxYs[i] + 1
+			if y <= chunk.maxY:
+				roundSpans.append([y, chunk.maxY])
+
+			first = last
+
+			if x == chunk.minX:
+				for span in roundSpans:
+					cave = Cave()
+					cave.addSpan(x, span[0], span[1])
+					caves.append(cave)
+			else:
+				# For all but the first column, we need to see if the discovered pieces touch one or more existing caves to the left.
+				# If so, this piece (and possibly other caves if touching more than one) must be consolidated into it, instead of added new.
+				
+				for span in roundSpans:
+				
+					# Let's get the indexes of caves this span touches.					
+					touching = []
+					
+					for i, cave in enumerate(caves):
+						if cave.touchesSpan(x, span[0], span[1]) == True:
+							touching.append(i)
+							
+					# If this span touches no existing caves, it becomes a new one.
+					if len(touching) == 0:					
+						cave = Cave()
+						cave.addSpan(x, span[0], span[1])
+						caves.append(cave)
+					
+					# If this span touches at least one cave, add the span to the existing cave (first one if multiple).
+					elif len(touching) > 0:
+					
+						caves[touching[0]].addSpan(x, span[0], span[1])
+					
+						# If the span touched more than one cave, the latter caves are absorbed into the first one.
+						if len(touching) > 1:
+						
+							# Add this pixels from the other caves to the first one
+							for i in range(1, len(touching)):
+								for sx, sMinY, sMaxY in caves[touching[i]].iterSpans():
+									caves[touching[0]].addSpan(sx, sMinY, sMaxY)
+									
+							# Then remove the absorbed caves from the list
+							touching.pop(0)
+							touching.sort()
+							touching.reverse()
+							
+							for i in touching:
+								caves.pop(i)
+
+		# Any prospective caves that are actually outside the chunk are invalid.
+		for i in range(len(caves) - 1, -1, -1):
+			if caves[i].minX == chunk.minX or caves[i].maxX == chunk.maxX or caves[i].minY == chunk.minY or caves[i].maxY == chunk.maxY:
+				caves.pop(i)
+
+		return caves
+
+	# A faster replacement for FindCaveCandidates that returns the same caves, in the same order.
+	# The background runs are labeled with the same run union-find as ChunkFinder.FindChunksUnionFind,
+	# and groups touching the bounding box are dropped before any Cave is built for them.
+	@staticmethod
+	def FindCaveCandidatesUnionFind(chunk):
+
+		runXs = []
+		runStarts = []
+		runEnds = []
+		parent = []
+
+		spanXs = chunk.spanXs
+		spanMinYs = chunk.spanMinYs
+		spanMaxYs = chunk.spanMaxYs
+		spanCount = len(spanXs)
+		first = 0
+
+		previousX = None
+		previousFirst = 0
+		previousLast = 0
+
+		while first < spanCount:
+
+			x = spanXs[first]
+			last = first + 1
+			while last < spanCount and spanXs[last] == x:
+				last += 1
+
+			# Runs only connect to the previous column if it is directly to the left.
+			if previousX != x - 1:
+				previousLast = previousFirst
+			columnFirst = len(parent)
+			p = previousFirst
+
+			# The background runs are the gaps between the chunk's spans in this column, within the bounding box.
+			y = chunk.minY
+			for i in range(first, last + 1):
+				if i < last:
+					yend = spanMinYs[i] - 1
+				else:
+					yend = chunk.maxY
+				if yend >= y:
+					label = len(parent)
+					parent.append(label)
+					runXs.append(x)
+					runStarts.append(y)
+					runEnds.append(yend)
+
+					while p < previousLast and runEnds[p] < y:
+						p += 1
+					q = p
+					while q < previousLast and runStarts[q] <= yend:
+						unionRuns(parent, label, q)
+						q += 1
+				if i < last:
+					y = spanMaxYs[i] + 1
+
+			first = last
+			previousX = x
+			previousFirst = columnFirst
+			previousLast = len(parent)
+
+		# A group that reaches the edge of the bounding box is outside the chunk, not a cave.
+		runCount = len(parent)
+		roots = [findRoot(parent, label) for label in range(runCount)]
+		outside = [False] * runCount
+		for label in range(runCount):
+			if runXs[label] == chunk.minX or runXs[label] == chunk.maxX or runStarts[label] == chunk.minY or runEnds[label] == chunk.maxY:
+				outside[roots[label]] = True
+
+		caves = []
+		caveIndexes = [-1] * runCount
+		for label in range(runCount):
+			root = roots[label]
+			if outside[root] == True:
+				continue
+			if caveIndexes[root] < 0:
+				caveIndexes[root] = len(caves)
+				caves.append(Cave())
+			caves[caveIndexes[root]].addSpan(runXs[label], runStarts[label], runEnds[label])
+
+		return caves
+
 # This part only runs if the script is run directly, which should not happen.
 if __name__ == "__main__" or __name__ == "__builtin__":
 	print "This module is not meant to be run directly."
@@ -1,5 +1,5 @@
 # Represents a chunk found in an image, and functions related directly to them.
-from pcp_auto_count.umath import getAngleM, getSlope, findX, findCenterOfMassB, getDistance, getEndpointFloat
+from pcp_auto_count.umath import getAngleM, getSlope, findX, getDistance, getEndpointFloat
 from pcp_auto_count.cavefinder import CaveFinder
 from pcp_auto_count.entity import Entity
 
@@ -14,14 +14,6 @@ class Chunk(Entity):
 	def getEntityType():
 		return "chunk"
 
-	def containsPixel(self, x, y):
-		for col in self.columns:
-			if col.x == x:
-				for yy in col.ys:
-					if yy == y:
-						return True
-		return False
-
 	def divide(self):
 		# This is called when the chunk is detected to be a doublet.
 		# It splits itself down the middle vertically, and returns the resulting chunks.
@@ -31,11 +23,11 @@ class Chunk(Entity):
 		leftChunk = Chunk()
 		rightChunk = Chunk()
 
-		for span in self.spans:
-			if span.x < centerX:
-				leftChunk.addSpan(span.x, span.minY, span.maxY)
+		for x, minY, maxY in self.iterSpans():
+			if x < centerX:
+				leftChunk.addSpan(x, minY, maxY)
 			else:
-				rightChunk.addSpan(span.x, span.minY, span.maxY)
+				rightChunk.addSpan(x, minY, maxY)
 
 		return (leftChunk, rightChunk)
 
@@ -48,26 +40,32 @@ class Chunk(Entity):
 		topChunk = Chunk()
 		bottomChunk = Chunk()
 
-		for span in self.spans:
-			if span.minY < centerY and span.maxY < centerY: # Top chunk
-				topChunk.addSpan(span.x, span.minY, span.maxY)
-			elif span.minY >= centerY and span.maxY >= centerY: # Bottom chunk
-				bottomChunk.addSpan(span.x, span.minY, span.maxY)
+		for x, minY, maxY in self.iterSpans():
+			if minY < centerY and maxY < centerY: # Top chunk
+				topChunk.addSpan(x, minY, maxY)
+			elif minY >= centerY and maxY >= centerY: # Bottom chunk
+				bottomChunk.addSpan(x, minY, maxY)
 			else: # Split the difference
-				topChunk.addSpan(span.x, span.minY, centerY - 1)
-				bottomChunk.addSpan(span.x, centerY, span.maxY)
+				topChunk.addSpan(x, minY, centerY - 1)
+				bottomChunk.addSpan(x, centerY, maxY)
 
 		return (topChunk, bottomChunk)
 
 	def findCave(self, options):
 		CaveFinder.FindCave(self, options)
 
+	def hasUsableCave(self):
+		# A chunk needs a cave, and a cave centroid that isn't the same point as the chunk centroid, to have an angle.
+		if self.cave is None:
+			return False
+		return self.centroidInt[0] != self.caveCentroidInt[0] or self.centroidInt[1] != self.caveCentroidInt[1]
+
 	def findCentroid(self):
-		self.centroid = findCenterOfMassB(self.columns)
+		self.centroid = self.getCentroid()
 		self.centroidInt = [int(round(self.centroid[0])), int(round(self.centroid[1]))]
 
 	def findCaveCentroid(self):
-		self.caveCentroid = findCenterOfMassB(self.cave.columns)
+		self.caveCentroid = self.cave.getCentroid()
 		self.caveCentroidInt = [int(round(self.caveCentroid[0])), int(round(self.caveCentroid[1]))]
 
         def findCentroidDistance(self):
@@ -1,12 +1,14 @@
 # This class holds a list of chunks, and provides methods to process them.
-from ij import IJ, ImagePlus
+# The processing itself lives in BaseChunkCollection, which doesn't need ImageJ. This class adds reading ImagePlus images,
+# reporting progress in ImageJ's status bar, and all the ImageJ output (images, overlays, tables, rose diagrams).
+from ij import IJ, ImagePlus, ImageStack
 from ij.measure import ResultsTable
+from ij.process import ColorProcessor
 from java.awt import Color
-from pcp_auto_count.chunkfinder import ChunkFinder
-from pcp_auto_count.umath import getCircularMeanOfAngles
-from pcp_auto_count.drawing import drawArrow, drawText
+from pcp_auto_count.basechunkcollection import BaseChunkCollection
+from pcp_auto_count.drawing import addRoisToImage, getArrowRoi, getLabelFont, getTextRoi
+from pcp_auto_count.imagejadapter import ImageJProgressReporter, getPixelBuffer
 from pcp_auto_count.rosediagram import RoseDiagram
-from pcp_auto_count.plasticwrap import PlasticWrap
 
 imageTypes = { ImagePlus.COLOR_RGB : "RGB", ImagePlus.GRAY8 : "8-bit", ImagePlus.GRAY16 : "16-bit", ImagePlus.GRAY32 : "32-bit", ImagePlus.COLOR_256 : "8-bit color"}
 blackColor = Color(0, 0, 0)
@@ -24,213 +26,39 @@ transparentColor = Color(0, 0, 0, 0)
 degreeSign = u"\N{DEGREE SIGN}"
 angleLabel = "Angle" + degreeSign
 
-class ChunkCollection:
+class ChunkCollection(BaseChunkCollection):
 
 	# Constructor
 	def __init__(self):
-		self.chunks = []
-		self.noiseChunks = []
-		self.conglomerates = []
-		self.tooWideChunks = []
-		self.tooTallChunks = []
-		self.doubletBothAxisChunks = []
-		self.removedBorderChunks = []
-		self.badChunks = []
-
-		self.imageWidth = 0
-		self.imageHeight = 0
-		self.imageDepth = 1
-		self.imageType = "RGB"
-		self.imageTitle = "untitled"
-
-	# Returns how many chunks currently exist.
-	def count(self):
-		return len(self.chunks)
-
-	# Adds a chunk to the collection
-	def append(self, chunk):
-		self.chunks.append(chunk)
+		BaseChunkCollection.__init__(self)
+		self.progress = ImageJProgressReporter()
 
-	# Scans an ImagePlus for chunks, noise included.
-	def loadChunksFromImage(self, imp):
-		self.imageWidth = imp.width
-		self.imageHeight = imp.height
-		self.imageDepth = imp.getNSlices()
-		self.imageType = imageTypes[imp.type]
-		self.imageTitle = imp.title
-		ChunkFinder.FindChunks(imp, self.chunks)
-
-	# Removes tiny chunks from the list to be processed.
-	def removeNoiseChunks(self, size):
-		count = len(self.chunks)
-		for i in range(count - 1, -1, -1):
-			IJ.showStatus("PCP Auto Count: Removing Noise...")
-			IJ.showProgress(count - i, count)
-			if self.chunks[i].size <= size:
-				self.noiseChunks.append(self.chunks.pop(i))
-		IJ.showProgress(1, 1)
-
-	# Remove chunks which are too large to be processed.
-	def removeConglomerates(self, size):
-                count = len(self.chunks)
-                for i in range(count - 1, -1, -1):
-                        IJ.showStatus("PCP Auto Count: Removing Conglomerates...")
-                        IJ.showProgress(count - i, count)
-                        if self.chunks[i].size >= size:
-                                self.conglomerates.append(self.chunks.pop(i))
-                IJ.showProgress(1, 1)
-
-	# Remove chunks which are too wide or too tall.
-	def removeOblongChunks(self, tooWideMultiplier = 0.0, tooTallMultiplier = 0.0, checkTooWide = True, checkTooTall = True):
-		if tooWideMultiplier <= 0.0:
-			checkTooWide = False
-		if tooTallMultiplier <= 0.0:
-			checkTooTall = False
-		if checkTooWide == False and checkTooTall == False:
-			return False
-		count = self.count()
-		for i in range(count - 1, -1, -1):
-			IJ.showStatus("PCP Auto Count: Removing oblong chunks...")
-			IJ.showProgress(count - i, count + 1)
-			c = self.chunks[i]
-			w = float(c.getBoundingBoxWidth())
-			h = float(c.getBoundingBoxHeight())
-			if checkTooWide:
-				if w >= h * tooWideMultiplier:
-					self.tooWideChunks.append(self.chunks.pop(i))
-					continue
-			if checkTooTall:
-				if h >= w * tooTallMultiplier:
-					self.tooTallChunks.append(self.chunks.pop(i))
-
-        IJ.showProgress(1, 1)
-
-	# Split chunks which are too wide or too tall into two separate ones.
-	def splitDoubletChunks(self, tooWideMultiplier = 0.0, tooTallMultiplier = 0.0, checkTooWide = True, checkTooTall = True):
-		if tooWideMultiplier <= 0.0:
-			checkTooWide = False
-		if tooTallMultiplier <= 0.0:
-			checkTooTall = False
-		if checkTooWide == False and checkTooTall == False:
-			return False
-
-		count = self.count()
-
-		for i in range(count - 1, -1, -1):
-			IJ.showStatus("PCP Auto Count: Finding Doublets...")
-			IJ.showProgress(count - i, count + 1)
-			c = self.chunks[i]
-			w = float(c.getBoundingBoxWidth())
-			h = float(c.getBoundingBoxHeight())
-			isTooWide = False
-			isTooTall = False
-			if checkTooWide:
-				if w >= h * tooWideMultiplier:
-					isTooWide = True
-
-			if checkTooTall:
-				if h >= w * tooTallMultiplier:
-					isTooTall = True
-
-			if isTooWide and isTooTall:
-				self.doubletBothAxisChunks.append(self.chunks.pop(i))
-			elif isTooWide:
-				splitChunks = c.divide()
-				self.chunks.pop(i)
-				self.chunks.insert(i, splitChunks[1])
-				self.chunks.insert(i, splitChunks[0])
-			elif isTooTall:
-				splitChunks = c.divideHorizontally()
-				self.chunks.pop(i)
-				self.chunks.insert(i, splitChunks[1])
-				self.chunks.insert(i, splitChunks[0])
-
-		IJ.showProgress(1, 1)
-
-	# Removes chunk at the image border.
-	def removeBorderChunks(self, offset = 0):
-		count = self.count()
-		adjustedOffset = 1 + offset
-		for i in range(count - 1, -1, -1):
-			IJ.showStatus("PCP Auto Count: Removing Border Chunks...")
-			IJ.showProgress(count - i, count)
-			if self.chunks[i].minX < adjustedOffset or self.chunks[i].minY < adjustedOffset:
-				self.removedBorderChunks.append(self.chunks.pop(i))
-			elif self.chunks[i].maxX >= self.imageWidth - adjustedOffset:
-				self.removedBorderChunks.append(self.chunks.pop(i))
-			elif self.chunks[i].maxY >= self.imageHeight - adjustedOffset:
-				self.removedBorderChunks.append(self.chunks.pop(i))
-		IJ.showProgress(1, 1)
-
-	# Uses vector math to find new borders as though you were plastic wrapping them.
-	# Mostly useful for chunks with true caves that aren't fully enclosed in the chunk.
-	def plasticWrapChunks(self, expandBoundsBy = 0):
-		PlasticWrap.plasticWrapChunks(self)
-
-	# Finds the true cave of each chunk in the collection.
-	# The cavefinder also finds the cave centroid when a cave is detected.
-	def findCaves(self, options=None):
-		count = self.count()
-		for i, c in enumerate(self.chunks):
-			IJ.showStatus("PCP Auto Count: Finding Caves...")
-			IJ.showProgress(i, count)
-			c.findCave(options)
+	# Records the size, type and title of an ImagePlus the chunks come from.
+	def setImageInfoFromImage(self, imp, options=None):
+		self.setImageInfo(imp.width, imp.height, imp.title, imp.getNSlices(), imageTypes[imp.type], options)
 
-	# Removes any chunk that has no cave.
-	def removeCavelessChunks(self):
-		count = self.count()
-		for i in range(len(self.chunks) - 1, -1, -1):
-			IJ.showStatus("PCP Auto Count: Marking Bad Chunks...")
-			IJ.showProgress(count - i, count)
-			if self.chunks[i].cave is None:
-				self.badChunks.append(self.chunks.pop(i))
-			# Also remove any chunk where the chunk centroid is the same point as the cave centroid.
-			elif self.chunks[i].centroidInt[0] == self.chunks[i].caveCentroidInt[0] and self.chunks[i].centroidInt[1] == self.chunks[i].caveCentroidInt[1]:
-                                self.badChunks.append(self.chunks.pop(i))
-
-	# Finds the centroids of each chunk.
-	def findCentroids(self):
-		count = self.count()
-		for i, c in enumerate(self.chunks):
-			IJ.showStatus("PCP Auto Count: Calculating chunk centroids...")
-			IJ.showProgress(i, count)
-			c.findCentroid()
-
-        # For each chunk, finds the distance between the chunk and cave centroid.
-	def findCentroidDistances(self):
-                count = self.count()
-                for i, c in enumerate(self.chunks):
-                        IJ.showStatus("PCP Auto Count: Calculating centroid distances...")
-			IJ.showProgress(i, count)
-                        c.findCentroidDistance()                
-
-	# Calculates the cell-PCP angle for each chunk.
-	def calculateAngles(self, options):
-		count = self.count()
-		for i, c in enumerate(self.chunks):
-			IJ.showStatus("PCP Auto Count: Taking angle measurements...")
-			IJ.showProgress(i, count)
-			c.calculateAngle(options)
-			c.findAngleOrientation()
-
-	# Generates a unique numeric label for each chunk for identification on the image and/or results table.
-	def generateChunkLabels(self):
-		count = self.count()
-		for i, chunk in enumerate(self.chunks):
-			IJ.showStatus("PCP Auto Count: Generating Chunk Labels...")
-			IJ.showProgress(i, count)
-			chunk.label = str(i + 1)
-		count = len(self.badChunks)
-		for i, badChunk in enumerate(self.badChunks):
-			IJ.showStatus("PCP Auto Count: Generating Bad Chunk Labels...")
-			IJ.showProgress(i, count)
-			badChunk.label = "BAD_" + str(i + 1)
-		count = len(self.removedBorderChunks)
-		for i, removedBorderChunk in enumerate(self.removedBorderChunks):
-			IJ.showStatus("PCP Auto Count: Generating Removed Border Chunk Labels...")
-			IJ.showProgress(i, count)
-			removedBorderChunk.label = "REM_" + str(i + 1)
-		IJ.showProgress(1, 1)
+	# Scans an ImagePlus for chunks, noise included.
+	# The labeling engine is picked by options.chunkLabelingMode; they all produce the same chunks.
+	def loadChunksFromImage(self, imp, options=None):
+		self.setImageInfoFromImage(imp, options)
+		self.findChunksInPixels(getPixelBuffer(imp), options)
+
+	# Runs the whole measuring pipeline on an image, as configured by the options: finding chunks, removing the unwanted ones,
+	# and finding caves, angles and labels. Nothing is drawn or shown, so this is safe to run on a worker thread.
+	# Results come from the result cache when the image has been measured with the same settings before.
+	def measureImage(self, imp, options):
+		self.setImageInfoFromImage(imp, options)
+		self.findAndMeasureChunks(getPixelBuffer(imp), options)
+
+	# Measures an ImagePlus strip by strip. See BaseChunkCollection.measureInStrips.
+	# The strips are read from the ImagePlus, which is already fully in memory, so this bounds the memory for chunks but not for the image.
+	@staticmethod
+	def measureImageInStrips(imp, options, onStripMeasured, progress=None):
+		def readStrip(x, stripWidth):
+			return getPixelBuffer(imp, x, stripWidth)
+		def setImageInfo(chunks):
+			chunks.setImageInfoFromImage(imp, options)
+		ChunkCollection.measureInStrips(readStrip, imp.width, imp.height, options, onStripMeasured, imp.title, setImageInfo, progress)
 
 	# Gets an overlay image containing only the arrows.
 	# Users can put this over the original for comparison.
@@ -238,8 +66,8 @@ class ChunkCollection:
 		if self.imageWidth < 1 or self.imageHeight < 1:
 			return None
 
-		IJ.showStatus("PCP Auto Count: Creating Overlay...")
-		IJ.showProgress(0, 1)
+		self.progress.showStatus("PCP Auto Count: Creating Overlay...")
+		self.progress.showProgress(0, 1)
 
 		IJ.newImage("Overlay - " + self.imageTitle, "RGB", self.imageWidth, self.imageHeight, self.imageDepth)
 		imp = IJ.getImage()
@@ -248,170 +76,60 @@ class ChunkCollection:
 		ip.setColor(transparentColor)
 		ip.fill()
 
+		# Arrows and labels are drawn in one go, so the image is only repainted once.
+		rois = []
 		if options.outputOverlayArrows == True:
-			self.drawArrowsOnImage(imp, options)
-
-		if options.outputOverlayLabels == True or options.outputOverlayAngles == True:
-			self.drawAngleLabelsOnImage(imp, options.outputOverlayLabels, options.outputOverlayAngles, options.getColorLabels(), options.drawingFontSize)
-
-		imp.updateAndRepaintWindow()
+			rois.extend(self.getArrowRois(options))
+		rois.extend(self.getAngleLabelRois(options.outputOverlayLabels, options.outputOverlayAngles, options.getColorLabels(), options.drawingFontSize))
+		addRoisToImage(imp, rois)
 
 		return imp
 
 	# A sanity check that draws the detected pixels of each chunk on a new image.
 	# We can compare this to the original to get an idea if everything desirable is being detected.
+	# The pixels are drawn by renderChunks, and the image is made from them in one go. It isn't shown; callers do that.
 	# Returns None if there is no image to process (shouldn't happen), or a reference to the new image.
 	def chunksToNewImage(self, options):
-		if self.imageWidth < 1 or self.imageHeight < 1:
+		canvas = self.renderChunks(options)
+		if canvas is None:
 			return None
 
-		IJ.showStatus("PCP Auto Count: Drawing Output Image...")
-		IJ.showProgress(0, 1)
-
-		IJ.newImage("Detected chunks - " + self.imageTitle, "RGB", self.imageWidth + options.outputImageMarginPixels, self.imageHeight, self.imageDepth)
-		imp = IJ.getImage()
-		ip = imp.getProcessor()
-
-		ip.setColor(blackColor)
-		ip.fill()
-
-		# If the user wants the gray margin, we color it in here.
-		if options.outputImageMarginPixels > 0:
-			ip.setColor(grayColor)
-			ip.fillRect(self.imageWidth, 0, options.outputImageMarginPixels, self.imageHeight)
-
-		ip.setColor(whiteColor)
+		title = "Detected chunks - " + self.imageTitle
+		ip = ColorProcessor(canvas.width, canvas.height, canvas.pixels)
+		if self.imageDepth <= 1:
+			return ImagePlus(title, ip)
+
+		# Like the source image, the output has a slice per source slice. Only the first is drawn on; the rest are white.
+		stack = ImageStack(canvas.width, canvas.height)
+		stack.addSlice(ip)
+		for i in range(1, self.imageDepth):
+			blank = ColorProcessor(canvas.width, canvas.height)
+			blank.setColor(whiteColor)
+			blank.fill()
+			stack.addSlice(blank)
+		return ImagePlus(title, stack)
+
+	# Returns arrow ROIs representing all chunk angles.
+	def getArrowRois(self, options):
+		arrowColor = options.getColorArrows()
 		count = self.count()
+		rois = []
 		for i, c in enumerate(self.chunks):
-			IJ.showStatus("PCP Auto Count: Drawing Successful Chunks...")
-			IJ.showProgress(i, count)
-			for col in c.columns:
-				for y in col.ys:
-					ip.drawPixel(col.x, y)
-
-		# We only care about plastic wrap drawing options if it was actually used
-		if options.usePlasticWrap == True:
-
-			# Plastic wrap was used if we get here.
-
-			if options.outputImagePlasticWrapBorder == True:
-				# If we get here, the user wants to draw the plastic wrap pixels.
-				# In either mode, drawing all such pixels in yellow is fine to start.
-				ip.setColor(options.getColorPlasticWrap())
-				#ip.setColor(yellowColor)
-				for i, c in enumerate(self.chunks):
-					IJ.showStatus("PCP Auto Count: Drawing Plastic Wrap Pixels...")
-					IJ.showProgress(i, count)
-					if len(c.plasticWrapBorder) > 1:
-						for p in c.plasticWrapBorder:
-							ip.drawPixel(p[0], p[1])
-
-				if options.outputImagePlasticWrapAddedWeight == True:
-					# If the second mode was used, unique plastic wrap pixels should be in cyan instead of yellow.
-					ip.setColor(options.getColorPlasticWrapNew())
-					#ip.setColor(cyanColor)
-					for i, c in enumerate(self.chunks):
-						IJ.showStatus("PCP Auto Count: Drawing Plastic Wrap Added Weight...")
-						IJ.showProgress(i, count)
-						if len(c.plasticWrapUniquePixels) > 0:
-							for p in c.plasticWrapUniquePixels:
-								ip.drawPixel(p[0], p[1])
-
-			else:
-				# If plastic wrap was used but the user doesn't want those pixels highlighted, we actually need to draw any unique pixels in black.
-				# This is because they were technically added to the original chunk pixels, which were already drawn in white.
-				for i, c in enumerate(self.chunks):
-					IJ.showStatus("PCP Auto Count: Hiding Plastic Wrap Added Weight...")
-					IJ.showProgress(i, count)
-					if len(c.plasticWrapUniquePixels) > 0:
-						ip.setColor(blackColor)
-						for p in c.plasticWrapUniquePixels:
-							ip.drawPixel(p[0], p[1])
-
-		if options.outputImageNoise == True and len(self.noiseChunks) > 0:
-			count = len(self.noiseChunks)
-			ip.setColor(options.getColorNoise())
-			#ip.setColor(magentaColor)
-			for i, n in enumerate(self.noiseChunks):
-				IJ.showStatus("PCP Auto Count: Drawing removed noise...")
-				IJ.showProgress(i, count)
-				for col in n.columns:
-					for y in col.ys:
-						ip.drawPixel(col.x, y)
-
-		if options.outputImageConglomerates == True and len(self.conglomerates) > 0:
-                        count = len(self.conglomerates)
-                        ip.setColor(options.getColorConglomerates())
-                        for i, n in enumerate(self.conglomerates):
-                                IJ.showStatus("PCP Auto Count: Drawing removed conglomerates...")
-                                IJ.showProgress(i, count)
-                                for col in n.columns:
-                                        for y in col.ys:
-                                                ip.drawPixel(col.x, y)
-
-		if options.outputImageBadCells == True and len(self.badChunks) > 0:
-			count = len(self.badChunks)
-			ip.setColor(options.getColorBadChunks())
-			#ip.setColor(redColor)
-			for i, b in enumerate(self.badChunks):
-				IJ.showStatus("PCP Auto Count: Drawing bad chunks...")
-				IJ.showProgress(i, count)
-				for col in b.columns:
-					for y in col.ys:
-						ip.drawPixel(col.x, y)
-
-		if options.outputImageRemovedBorderCells == True and len(self.removedBorderChunks) > 0:
-			count = len(self.removedBorderChunks)
-			ip.setColor(options.getColorBorderChunks())
-			#ip.setColor(purpleColor)
-			for i, r in enumerate(self.removedBorderChunks):
-				IJ.showStatus("PCP Auto Count: Drawing removed border chunks...")
-				IJ.showProgress(i, count)
-				for col in r.columns:
-					for y in col.ys:
-						ip.drawPixel(col.x, y)
-
-		if options.outputImageRemovedOblongCells == True:
-                        IJ.showStatus("PCP Auto Count: Drawing removed border chunks...")
-                        ip.setColor(options.getColorOblongChunks())
-                        #ip.setColor(blueColor)
-                        if len(self.tooWideChunks) > 0:
-                                for tw in self.tooWideChunks:
-                                        for col in tw.columns:
-                                                for y in col.ys:
-                                                        ip.drawPixel(col.x, y)
-                        if len(self.tooTallChunks) > 0:
-                                for tt in self.tooTallChunks:
-                                        for col in tt.columns:
-                                                for y in col.ys:
-                                                        ip.drawPixel(col.x, y)
-
-		imp.updateAndRepaintWindow()
-
-		# Cleanup
-		ip = None
-
-		IJ.showProgress(1, 1)
-
-		return imp
-
-	# Draws arrows representing all chunk angles on an image.
-	def drawArrowsOnImage(self, imp, options):
-                arrowColor = options.getColorArrows()
-		count = self.count()
-		for i, c in enumerate(self.chunks):
-			IJ.showStatus("PCP Auto Count: Drawing arrows for angle measurements...")
-			IJ.showProgress(i, count)
+			self.progress.showStatus("PCP Auto Count: Drawing arrows for angle measurements...")
+			self.progress.showProgress(i, count)
 			coords = c.getArrowCoords()
-			drawArrow(imp, arrowColor, coords[0], coords[1], coords[2], coords[3], options.drawingArrowheadSize, options.drawingArrowlineSize)
+			rois.append(getArrowRoi(arrowColor, coords[0], coords[1], coords[2], coords[3], options.drawingArrowheadSize, options.drawingArrowlineSize))
+		return rois
 
-	# Draws angle labels and/or angle measures at each chunk centroid.
-	def drawAngleLabelsOnImage(self, imp, outputImageLabels, outputImageAngles, textColor, fontSize = 12):
+	# Returns text ROIs with the angle label and/or angle measure of each chunk, placed at its centroid. They all share one font.
+	def getAngleLabelRois(self, outputImageLabels, outputImageAngles, textColor, fontSize = 12):
+		rois = []
 		if outputImageLabels == True or outputImageAngles == True:
+			textFont = getLabelFont(fontSize)
 			count = self.count()
 			for i, c in enumerate(self.chunks):
-				IJ.showStatus("PCP Auto Count: Drawing chunk labels...")
-				IJ.showProgress(i, count)
+				self.progress.showStatus("PCP Auto Count: Drawing chunk labels...")
+				self.progress.showProgress(i, count)
 				text = ""
 				if outputImageLabels == True and outputImageAngles == False:
 					text = "[" + c.label + "]"
@@ -419,18 +137,31 @@ class ChunkCollection:
 					text = str(round(c.angle, 3)) + degreeSign
 				else:
 					text = "[" + c.label + "]   " + str(round(c.angle, 3)) + degreeSign
-				drawText(imp, text, c.centroidInt[0], c.centroidInt[1], textColor, fontSize)
+				rois.append(getTextRoi(text, c.centroidInt[0], c.centroidInt[1], textColor, textFont))
+		return rois
+
+	# Draws arrows representing all chunk angles on an image, repainting it once.
+	# With asOverlay, they go in the image's overlay instead, where they can be hidden without touching the pixels.
+	def drawArrowsOnImage(self, imp, options, asOverlay = False):
+		addRoisToImage(imp, self.getArrowRois(options), asOverlay)
+
+	# Draws angle labels and/or angle measures at each chunk centroid, repainting the image once.
+	# With asOverlay, they go in the image's overlay instead, where they can be hidden without touching the pixels.
+	def drawAngleLabelsOnImage(self, imp, outputImageLabels, outputImageAngles, textColor, fontSize = 12, asOverlay = False):
+		rois = self.getAngleLabelRois(outputImageLabels, outputImageAngles, textColor, fontSize)
+		if len(rois) > 0:
+			addRoisToImage(imp, rois, asOverlay)
 
 
 	# Generates a table showing the angle of each detected cell, and other metrics.
 	def showAngleResultsTable(self, options):
-		IJ.showStatus("PCP Auto Count: Generating Results Table...")
+		self.progress.showStatus("PCP Auto Count: Generating Results Table...")
 		total = len(self.chunks)
 		if options.outputResultsTableIncludeBadChunks:
                         total += len(self.badChunks)
 		table = ResultsTable()
 		if total == 0:
-                        IJ.showProgress(1, 1)
+                        self.progress.showProgress(1, 1)
 			table.addRow()
 			table.addValue("Label", "No chunks found.")
 			table.addValue("Chunk Centroid X", "")
@@ -443,7 +174,7 @@ class ChunkCollection:
 		else:
                         if len(self.chunks) > 0:
                                 for i, c in enumerate(self.chunks):
-                                        IJ.showProgress(i, total)
+                                        self.progress.showProgress(i, total)
                                         table.addRow()
                                         table.addValue("Label", c.label)
                                         table.addValue("Chunk Centroid X", c.centroid[0])
@@ -455,7 +186,7 @@ class ChunkCollection:
                                         table.addValue(angleLabel, c.angle)
                         if options.outputResultsTableIncludeBadChunks and len(self.badChunks) > 0:
                                 for i, b in enumerate(self.badChunks):
-                                        IJ.showProgress(i, total)
+                                        self.progress.showProgress(i, total)
                                         table.addRow()
                                         table.addValue("Label", b.label)
                                         table.addValue("Chunk Centroid X", b.centroid[0])
@@ -475,43 +206,17 @@ class ChunkCollection:
 		if options.outputCellSummary == False and options.outputRoseDiagram == False:
 			return False
 
-		chCount = self.count()
-
-		count = 0
-		badCount = 0
-		totalCount = 0
-		processedPercent = "N/A"
-		minAngle = "N/A"
-		maxAngle = "N/A"
-		average = "N/A"
-		stdDeviation = "N/A"
-		med = "N/A"
-		circularMean = ["N/A", "N/A", "N/A", "N/A"]
-
-		angles = []
-		for i, c in enumerate(self.chunks):
-			IJ.showStatus("PCP Auto Count: Generating Cell Summary...")
-			IJ.showProgress(i, chCount)
-			angles.append(c.angle)
-
-		if len(angles) > 0:
-			angles.sort()
-			count = len(angles)
-			badCount = len(self.badChunks)
-			totalCount = count + badCount
-			processedPercent = (float(count) / float(totalCount)) * 100
-			minAngle = angles[0]
-			maxAngle = angles[-1]
-			circularMean = getCircularMeanOfAngles(angles, options.angleAxisScaleZeroTo360)
+		summary = self.getAngleSummary(options.angleAxisScaleZeroTo360)
+		circularMean = summary['circularMean']
 
 		if options.outputCellSummary == True:
 
 			table = ResultsTable()
 			table.addRow()
-			table.addValue("Processed Count", count)
-			table.addValue("Bad Count", badCount)
-			table.addValue("Total Count", totalCount)
-			table.addValue("Processed %", processedPercent)
+			table.addValue("Processed Count", summary['count'])
+			table.addValue("Bad Count", summary['badCount'])
+			table.addValue("Total Count", summary['totalCount'])
+			table.addValue("Processed %", summary['processedPercent'])
 			table.addValue("RML", circularMean[1])
 			table.addValue("Variance", circularMean[2])
 			table.addValue("Mean Angle", circularMean[0])
@@ -521,19 +226,11 @@ class ChunkCollection:
 			table.show('Chunk Summary')
 
 		if options.outputRoseDiagram == True:
-			IJ.showStatus("PCP Auto Count: Generating Rose Diagram...")
-			# Need to translate bar size to bar count first...
-			barCount = int(360 / options.outputRoseDiagramBarSize)
-			RoseDiagram.generate(angles, options.angleAxisMode, circularMean, barCount, -1, options.outputRoseDiagramAxisSize, options.outputRoseDiagramMarkerIncrement, options.getColorRoseDiagram())
-
-		IJ.showProgress(1, 1)
-
-	def flush(self):
-		# A function to cleanup memory when an instance of ChunkCollection will no longer be needed.
-		del self.chunks
-		del self.noiseChunks
-		del self.removedBorderChunks
-		del self.badChunks
+			self.progress.showStatus("PCP Auto Count: Generating Rose Diagram...")
+			# The bars were already counted (for the bar size in the options) when the angles were calculated.
+			RoseDiagram.generateFromBars(summary['bars'], summary['count'], options.angleAxisMode, circularMean, -1, options.outputRoseDiagramAxisSize, options.outputRoseDiagramMarkerIncrement, options.getColorRoseDiagram())
+
+		self.progress.showProgress(1, 1)
 
 # This part only runs if the script is run directly, which should not happen.
 if __name__ == "__main__" or __name__ == "__builtin__":
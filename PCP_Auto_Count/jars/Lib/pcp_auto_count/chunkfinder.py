@@ -1,22 +1,20 @@
 # This file contains the chunk-finding algorithm.
-from ij import IJ
-from ij.process import ByteProcessor
+# The finders read pixels from a PixelBuffer, so they don't depend on ImageJ (see imagejadapter.py for reading an ImagePlus).
 from pcp_auto_count.chunk import Chunk
+from pcp_auto_count.noiserecords import NoiseRecords
+from pcp_auto_count.progress import ProgressReporter
+from pcp_auto_count.runlabeling import findRoot, unionRuns
 
 class ChunkFinder:
 
-	# This function takes an ImagePlus and finds all the potential chunks inside of it.
+	# This function takes the pixels of an image and finds all the potential chunks inside of it.
 	# The chunks are added to the provided (empty) list of chunks.
 	@staticmethod
-	def FindChunks(imp, chunks):
+	def FindChunks(pixels, chunks, progress=None):
 	
-		width = imp.width
-		height = imp.height
-		ipmain = imp.getProcessor()
-		whitePixel = 255
-		if ipmain.isInvertedLut() == True:
-			whitePixel = 0
-		bp = ByteProcessor(ipmain, True)
+		if progress is None:
+			progress = ProgressReporter()
+		width = pixels.width
 		
 		oldestPossibleChunkIndex = 0
 		skewerMultiple = 25
@@ -24,29 +22,10 @@ class ChunkFinder:
 		
 		for x in range(width):
 		
-			IJ.showStatus("PCP Auto Count: Finding Chunks...")
-			IJ.showProgress(x, width)
+			progress.showStatus("PCP Auto Count: Finding Chunks...")
+			progress.showProgress(x, width)
 		
-			roundSpans = []
-		
-			currentSpanYs = []
-			
-			for y in range(height):
-			
-				if bp.getPixel(x, y) == whitePixel:
-				
-					if len(currentSpanYs) == 0:
-						currentSpanYs.append(y)
-					elif currentSpanYs[-1] == (y - 1):
-						currentSpanYs.append(y)
-					else:
-						# Next chunk in the same column...
-						roundSpans.append([currentSpanYs[0], currentSpanYs[-1]])
-						currentSpanYs = [y]
-						
-			if not len(currentSpanYs) == 0:			
-				roundSpans.append([currentSpanYs[0], currentSpanYs[-1]])
-				currentSpanYs = []
+			roundSpans = pixels.getColumnRuns(x)
 			
 			if x == 0:
 				if len(roundSpans) > 0:
@@ -86,8 +65,8 @@ class ChunkFinder:
 							
 								# Add the pixels from the other chunks to the first one
 								for i in range(1, len(touching)):
-									for s in chunks[touching[i]].spans:
-										chunks[touching[0]].addSpan(s.x, s.minY, s.maxY)
+									for sx, sMinY, sMaxY in chunks[touching[i]].iterSpans():
+										chunks[touching[0]].addSpan(sx, sMinY, sMaxY)
 										
 								# Then remove the absorbed chunks from the list
 								touching.pop(0)
@@ -117,12 +96,205 @@ class ChunkFinder:
 						skewerMultiple = skewerMultiple + skewerIncrement								
 				
 								
-		IJ.showProgress(1, 1)
+		progress.showProgress(1, 1)
 								
 		for chunk in chunks:
-			IJ.showStatus("PCP Auto Count: Calculating Chunk Sizes...")
+			progress.showStatus("PCP Auto Count: Calculating Chunk Sizes...")
 			chunk.getSize()
-								
+
+	# A faster replacement for FindChunks that produces the same chunks, in the same order.
+	# Pass one records every run of white pixels and unions it with the runs it touches in the previous column.
+	# Pass two resolves each run to its root and builds one chunk per root, in the order the roots were found.
+	# Given a NoiseRecords, components of at most noiseMaxSize pixels are added to it instead of becoming chunks.
+	@staticmethod
+	def FindChunksUnionFind(pixels, chunks, progress=None, noiseMaxSize=0, noiseRecords=None):
+
+		if progress is None:
+			progress = ProgressReporter()
+		width = pixels.width
+
+		# Every run gets a label, which is its index in these lists.
+		# The lists are in column-major order, so a root (the smallest label of a group) is always its chunk's first run.
+		runXs = []
+		runStarts = []
+		runEnds = []
+		parent = []
+
+		previousFirst = 0
+		previousLast = 0
+
+		for x in range(width):
+
+			progress.showStatus("PCP Auto Count: Finding Chunks...")
+			progress.showProgress(x, width)
+
+			columnFirst = len(parent)
+			p = previousFirst
+
+			for ystart, yend in pixels.getColumnRuns(x):
+
+				label = len(parent)
+				parent.append(label)
+				runXs.append(x)
+				runStarts.append(ystart)
+				runEnds.append(yend)
+
+				# Runs in the previous column are sorted, so skip the ones ending above this run and union the overlapping ones.
+				while p < previousLast and runEnds[p] < ystart:
+					p += 1
+				q = p
+				while q < previousLast and runStarts[q] <= yend:
+					unionRuns(parent, label, q)
+					q += 1
+
+			previousFirst = columnFirst
+			previousLast = len(parent)
+
+		progress.showProgress(1, 1)
+
+		runCount = len(parent)
+		roots = [findRoot(parent, label) for label in range(runCount)]
+
+		# Noise is picked out by the size of each root's component, before any chunk is built.
+		recordIndexes = None
+		if noiseRecords is not None and noiseMaxSize > 0:
+			sizes = [0] * runCount
+			for label in range(runCount):
+				sizes[roots[label]] += (runEnds[label] - runStarts[label]) + 1
+			recordIndexes = [-1] * runCount
+			recordCount = 0
+			for label in range(runCount):
+				root = roots[label]
+				if sizes[root] <= noiseMaxSize:
+					if root == label:
+						recordIndexes[label] = recordCount
+						recordCount += 1
+					else:
+						recordIndexes[label] = recordIndexes[root]
+			noiseRecords.addRuns(recordIndexes, recordCount, runXs, runStarts, runEnds)
+
+		# Second pass: build the chunks.
+		chunkIndexes = [-1] * runCount
+		for label in range(runCount):
+			if recordIndexes is not None and recordIndexes[label] >= 0:
+				continue
+			root = roots[label]
+			if chunkIndexes[root] < 0:
+				chunkIndexes[root] = len(chunks)
+				chunks.append(Chunk())
+			chunks[chunkIndexes[root]].addSpan(runXs[label], runStarts[label], runEnds[label])
+
+		for chunk in chunks:
+			progress.showStatus("PCP Auto Count: Calculating Chunk Sizes...")
+			chunk.getSize()
+
+	# A streaming version of FindChunksUnionFind, for images whose chunks don't all fit in memory at once.
+	# The image (width columns wide) is read in vertical strips of stripWidth columns, each one a PixelBuffer
+	# returned by readStrip(x, stripWidth). Chunks only grow from one column into the next,
+	# so a chunk is complete as soon as a column has no run touching it. At the end of every strip,
+	# the chunks completed so far are passed to onChunksCompleted(chunks, noiseRecords), ordered by when they were first found,
+	# and forgotten. Completed components of at most noiseMaxSize pixels go in that NoiseRecords instead of becoming chunks.
+	# Chunks crossing into the next strip carry on there with the same run overlap test, so every chunk
+	# comes out exactly as it would from labeling the whole image at once.
+	@staticmethod
+	def FindChunksInStrips(readStrip, width, stripWidth, onChunksCompleted, progress=None, noiseMaxSize=0):
+
+		if progress is None:
+			progress = ProgressReporter()
+
+		# Each open chunk has an id, handed out in scan order, and a list of its (x, ystart, yend) spans.
+		# When chunks join, the smaller id wins, like unionRuns.
+		parent = {}
+		openSpans = {}
+		completedSpans = {}
+		nextId = 0
+
+		# [ystart, yend, chunk id] for every run in the previous column.
+		previousRuns = []
+
+		for stripX in range(0, width, stripWidth):
+
+			pixels = readStrip(stripX, min(stripWidth, width - stripX))
+
+			for column in range(pixels.width):
+
+				x = stripX + column
+				progress.showStatus("PCP Auto Count: Finding Chunks...")
+				progress.showProgress(x, width)
+
+				currentRuns = []
+				p = 0
+
+				for ystart, yend in pixels.getColumnRuns(column):
+
+					while p < len(previousRuns) and previousRuns[p][1] < ystart:
+						p += 1
+					root = -1
+					q = p
+					while q < len(previousRuns) and previousRuns[q][0] <= yend:
+						other = findRoot(parent, previousRuns[q][2])
+						if root < 0:
+							root = other
+						elif other != root:
+							keep = min(root, other)
+							absorbed = max(root, other)
+							parent[absorbed] = keep
+							openSpans[keep].extend(openSpans.pop(absorbed))
+							root = keep
+						q += 1
+
+					if root < 0:
+						root = nextId
+						nextId += 1
+						parent[root] = root
+						openSpans[root] = []
+
+					openSpans[root].append((x, ystart, yend))
+					currentRuns.append([ystart, yend, root])
+
+				# Chunks that touched the previous column but not this one are complete.
+				active = set()
+				for run in currentRuns:
+					run[2] = findRoot(parent, run[2])
+					active.add(run[2])
+				for run in previousRuns:
+					root = findRoot(parent, run[2])
+					if root not in active and root in openSpans:
+						completedSpans[root] = openSpans.pop(root)
+
+				# From here on, only chunks with a run in this column can be reached.
+				parent = dict([(root, root) for root in active])
+				previousRuns = currentRuns
+
+			# At the right edge of the image, every chunk is complete.
+			if stripX + stripWidth >= width:
+				completedSpans.update(openSpans)
+				openSpans = {}
+
+			if len(completedSpans) > 0:
+				chunks = []
+				noiseRecords = NoiseRecords(noiseMaxSize)
+				for chunkId in sorted(completedSpans.keys()):
+					spans = sorted(completedSpans[chunkId])
+					if noiseMaxSize > 0 and getSpanPixelCount(spans) <= noiseMaxSize:
+						noiseRecords.addSpans(spans)
+						continue
+					chunk = Chunk()
+					for span in spans:
+						chunk.addSpan(span[0], span[1], span[2])
+					chunks.append(chunk)
+				completedSpans = {}
+				onChunksCompleted(chunks, noiseRecords)
+
+		progress.showProgress(1, 1)
+
+# Returns the number of pixels in a list of (x, ystart, yend) spans.
+def getSpanPixelCount(spans):
+	count = 0
+	for x, ystart, yend in spans:
+		count += (yend - ystart) + 1
+	return count
+
 # This part only runs if the script is run directly, which should not happen.
 if __name__ == "__main__" or __name__ == "__builtin__":
 	print "This module is not meant to be run directly."
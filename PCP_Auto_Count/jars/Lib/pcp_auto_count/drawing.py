@@ -1,37 +1,56 @@
 # Utility functions for drawing things on an image.
-from ij.gui import Arrow, TextRoi
+from ij.gui import Arrow, Overlay, TextRoi
 from java.awt import Color, Font
 
 # The color we'll draw arrows on the result image.
 #arrowColor = Color(0, 185, 0)
 #textColor = Color(211, 84, 0)
 
-# A function for drawing an arrow on an image.
-def drawArrow(imp, arrowColor, startX, startY, endX, endY, headSize = 5, lineWidth = 3):
+# Returns an arrow ROI, ready to be drawn on an image or added to an overlay.
+def getArrowRoi(arrowColor, startX, startY, endX, endY, headSize = 5, lineWidth = 3):
 	arw = Arrow(startX, startY, endX, endY)
 	arw.setHeadSize(headSize)
 	arw.setStrokeWidth(lineWidth)
 	arw.setFillColor(arrowColor)
+	return arw
 
-	processor = imp.getProcessor()			
-	processor.drawRoi(arw)
-		
-	imp.updateAndRepaintWindow()
+# Returns the font labels are drawn in. Make it once and share it between all the labels of an image.
+def getLabelFont(fontSize = 12):
+	return Font("Default", Font.BOLD, fontSize)
 
-# A function to draw text on an image at specified coordinates.
-def drawText(imp, text, x, y, textColor, fontSize = 12):
-
-        textFont = Font("Default", Font.BOLD, fontSize)
-	
+# Returns a text ROI, ready to be drawn on an image or added to an overlay.
+def getTextRoi(text, x, y, textColor, textFont):
 	textRoi = TextRoi(x, y, text)
 	textRoi.setColor(textColor)
-	
 	textRoi.setFont(textFont)
-	
-	processor = imp.getProcessor()
-	processor.drawRoi(textRoi)
-	
+	return textRoi
+
+# Puts a list of ROIs on an image, and repaints it once.
+# With asOverlay, they are added to the image's overlay, which leaves the pixels alone and can be hidden and shown
+# again (Image > Overlay > Hide Overlay) without redrawing. Otherwise they are drawn into the pixels.
+def addRoisToImage(imp, rois, asOverlay = False):
+	if asOverlay:
+		overlay = imp.getOverlay()
+		if overlay is None:
+			overlay = Overlay()
+		for roi in rois:
+			overlay.add(roi)
+		imp.setOverlay(overlay)
+	else:
+		processor = imp.getProcessor()
+		for roi in rois:
+			processor.drawRoi(roi)
 	imp.updateAndRepaintWindow()
+
+# A function for drawing an arrow on an image.
+# To draw many arrows, use getArrowRoi and addRoisToImage, which repaint the image only once.
+def drawArrow(imp, arrowColor, startX, startY, endX, endY, headSize = 5, lineWidth = 3):
+	addRoisToImage(imp, [getArrowRoi(arrowColor, startX, startY, endX, endY, headSize, lineWidth)])
+
+# A function to draw text on an image at specified coordinates.
+# To draw many labels, use getTextRoi and addRoisToImage, with one font from getLabelFont.
+def drawText(imp, text, x, y, textColor, fontSize = 12):
+	addRoisToImage(imp, [getTextRoi(text, x, y, textColor, getLabelFont(fontSize))])
 	
 # This part only runs if the script is run directly, which should not happen.
 if __name__ == "__main__" or __name__ == "__builtin__":
@@ -1,85 +1,103 @@
 # "entity" is a class that chunk and cave both inherit from.
 # This is because, while they are different, they both share
-# the same functionality in having spans and columns of pixels.
+# the same functionality in having spans of pixels.
+#
+# An entity is stored as run-length spans only: each span is a vertical run of pixels (x, minY to maxY).
+# The spans live in three parallel integer arrays, kept sorted by x and then by minY.
+# Individual pixels are never stored, so memory depends on the number of runs, not the number of pixels.
+#
+# For fast containsPixel lookups, an index is built the first time it's needed (and dropped when spans change):
+# entities with small bounding boxes get a bitmap mask, larger ones an offset array that points to each column's spans.
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import izip
 
-class Column:
-	def __init__(self):
-		self.x = -1
-		self.ys = []
-		
-class Span:
-	def __init__(self):
-		self.x = -1
-		self.minY = -1
-		self.maxY = -1
-		
-	def __eq__(self, other):
-		return self.x == other.x and self.minY == other.minY
-		
-	def __gt__(self, other):
-		if self.x > other.x:
-			return True
-		if self.x == other.x:
-			if self.minY > other.minY:
-				return True
-		return False
-			
-	def __lt__(self, other):
-		if self.x < other.x:
-			return True
-		if self.x == other.x:
-			if self.minY < other.minY:
-				return True
-		return False
-		
-class Entity():
+# Entities whose bounding box has at most this many pixels get a bitmap mask instead of a column index.
+pixelMaskMaxArea = 262144
+
+class Entity(object):
 
 	def __init__(self):
-		self.columns = []
-		self.spans = []
+		self.spanXs = array('i')
+		self.spanMinYs = array('i')
+		self.spanMaxYs = array('i')
 		self.minX = -1
 		self.maxX = -1
 		self.minY = -1
 		self.maxY = -1
 		self.size = 0
-		
+		self.columnOffsets = None
+		self.pixelMask = None
+		self.cachedCentroid = None
+
 	def addSpan(self, x, ystart, yend):
-		
-		# We add the span as a new column or to an existing one, and update metadata.
-		
-		# First, add the span
-		span = Span()
-		span.x = x
-		span.minY = ystart
-		span.maxY = yend
-		
-		self.spans.append(span)
-		
-		self.spans.sort() # Make sure to keep the correct order. Extremely important for absorbing other entities.
-		
-		# Second, the column.
-		ys = range(ystart, yend + 1)
-		
-		# If a column is already on the books which would contain coordinates in this span, add it there.
-		if len(self.columns) > 0:
-			for col in self.columns:
-				if col.x == x:
-					for y in ys:
-						col.ys.append(y)
-					col.ys.sort()
-					self.recalculateBoundaries(x, ystart, yend)
-					return True
-					
-		# Otherwise, add the span's coordinates to a new column.		
-		col = Column()
-		col.x = x
-		for y in ys:
-			col.ys.append(y)
-		self.columns.append(col)
-		
+
+		# We add the span in sorted position, and update metadata.
+		# The order (by x, then by minY) is extremely important for absorbing other entities.
+
+		count = len(self.spanXs)
+		if count == 0 or x > self.spanXs[-1] or (x == self.spanXs[-1] and ystart > self.spanMinYs[-1]):
+			# Spans usually arrive in order, so this is the common case.
+			self.spanXs.append(x)
+			self.spanMinYs.append(ystart)
+			self.spanMaxYs.append(yend)
+		else:
+			first = bisect_left(self.spanXs, x)
+			last = bisect_right(self.spanXs, x, first)
+			index = bisect_right(self.spanMinYs, ystart, first, last)
+			self.spanXs.insert(index, x)
+			self.spanMinYs.insert(index, ystart)
+			self.spanMaxYs.insert(index, yend)
+
+		self.size += (yend - ystart) + 1
+		self.columnOffsets = None
+		self.pixelMask = None
+		self.cachedCentroid = None
+
 		# Finally, we see if adding the pixels in this span changes the entity's bounding box.
 		self.recalculateBoundaries(x, ystart, yend)
-			
+
+	def addPixels(self, points):
+
+		# Adds a list of [x, y] points, merging them into the existing spans.
+		# Points already in the entity are ignored.
+
+		if len(points) == 0:
+			return
+
+		runs = list(self.iterSpans())
+		for p in points:
+			runs.append((p[0], p[1], p[1]))
+		runs.sort()
+
+		self.spanXs = array('i')
+		self.spanMinYs = array('i')
+		self.spanMaxYs = array('i')
+		self.size = 0
+
+		currentX, currentMinY, currentMaxY = runs[0]
+		for x, ystart, yend in runs:
+			if x == currentX and ystart <= currentMaxY + 1:
+				if yend > currentMaxY:
+					currentMaxY = yend
+			else:
+				self.addSpan(currentX, currentMinY, currentMaxY)
+				currentX, currentMinY, currentMaxY = x, ystart, yend
+		self.addSpan(currentX, currentMinY, currentMaxY)
+
+	def copy(self):
+		# Returns a new entity of the same type with the same spans, so the copy can be changed (e.g. plastic wrapped) on its own.
+		entity = self.__class__()
+		entity.spanXs = array('i', self.spanXs)
+		entity.spanMinYs = array('i', self.spanMinYs)
+		entity.spanMaxYs = array('i', self.spanMaxYs)
+		entity.minX = self.minX
+		entity.maxX = self.maxX
+		entity.minY = self.minY
+		entity.maxY = self.maxY
+		entity.size = self.size
+		return entity
+
 	def recalculateBoundaries(self, x, ystart, yend):
 		if self.minX == -1 or x < self.minX:
 			self.minX = x
@@ -89,41 +107,105 @@ class Entity():
 			self.minY = ystart
 		if self.maxY == -1 or yend > self.maxY:
 			self.maxY = yend
-	
+
+	def iterSpans(self):
+		# Yields (x, minY, maxY) for every span, in sorted order.
+		return izip(self.spanXs, self.spanMinYs, self.spanMaxYs)
+
+	def getSpanCount(self):
+		return len(self.spanXs)
+
+	def getColumnSpanRange(self, x):
+		# Returns the (first, last) indexes of the spans in column x; first == last if there are none.
+		if x < self.minX or x > self.maxX:
+			return (0, 0)
+		if self.columnOffsets is None:
+			self.buildPixelIndex()
+		i = x - self.minX
+		return (self.columnOffsets[i], self.columnOffsets[i + 1])
+
+	def buildPixelIndex(self):
+
+		# columnOffsets[x - minX] is the index of the first span at or right of x, so column x's spans
+		# are columnOffsets[x - minX] up to (not including) columnOffsets[x - minX + 1].
+		width = self.getBoundingBoxWidth()
+		offsets = array('i', [0] * (width + 1))
+		spanXs = self.spanXs
+		index = 0
+		for i in range(width):
+			while index < len(spanXs) and spanXs[index] < self.minX + i:
+				index += 1
+			offsets[i] = index
+		offsets[width] = len(spanXs)
+		self.columnOffsets = offsets
+
+		# Small entities also get a column-major bitmap, so a lookup is a single index.
+		self.pixelMask = None
+		height = self.getBoundingBoxHeight()
+		if width * height <= pixelMaskMaxArea:
+			mask = bytearray(width * height)
+			for x, ystart, yend in self.iterSpans():
+				start = ((x - self.minX) * height) + (ystart - self.minY)
+				mask[start:start + (yend - ystart) + 1] = '\x01' * ((yend - ystart) + 1)
+			self.pixelMask = mask
+
 	def touchesSpan(self, x, ystart, yend):
-	
+
 		# Tests whether the described span of pixels touches an pixels in this entity.
-		
+
 		# Let's check our entity's spans backwards. This is typically how we'd check algorithmically.
-		for i in range(len(self.spans) - 1, -1, -1):
-			span = self.spans[i]
-			if span.x < (x - 1):
+		spanXs = self.spanXs
+		for i in range(len(spanXs) - 1, -1, -1):
+			spanX = spanXs[i]
+			if spanX < (x - 1):
 				# At this point, we're checking spans too far to the left of our span to touch.
 				return False
-			elif span.x == (x - 1):
+			elif spanX == (x - 1):
 				# This is a span that may be touching.
 				# They touch if the y ranges of the spans overlap.
-				if ((yend >= span.minY) and (span.maxY >= ystart)) == True:
+				if ((yend >= self.spanMinYs[i]) and (self.spanMaxYs[i] >= ystart)) == True:
 					return True
-				
+
 		# If we go through all the spans and none of them passed the test, the described span doesn't touch.
 		return False
-		
+
+	def containsPixel(self, x, y):
+		if self.size == 0 or x < self.minX or x > self.maxX or y < self.minY or y > self.maxY:
+			return False
+		if self.columnOffsets is None:
+			self.buildPixelIndex()
+		if self.pixelMask is not None:
+			return self.pixelMask[((x - self.minX) * self.getBoundingBoxHeight()) + (y - self.minY)] == 1
+		i = x - self.minX
+		first = self.columnOffsets[i]
+		index = bisect_right(self.spanMinYs, y, first, self.columnOffsets[i + 1]) - 1
+		return index >= first and y <= self.spanMaxYs[index]
+
 	def getSize(self):
 		# Returns the number of pixels that make up this entity.
-		size = 0
-		if len(self.columns) > 0:
-			for col in self.columns:
-				size += len(col.ys)
-		self.size = size
-		return size
+		return self.size
+
+	def getCentroid(self):
+		# Returns the center of mass [x, y] of the entity's pixels, computed from the spans.
+		# A labeler that already knows the centroid (see numpybackend.py) can leave it in cachedCentroid; adding spans clears it.
+		if self.cachedCentroid is not None:
+			return list(self.cachedCentroid)
+		sumX = 0
+		sumY = 0
+		tally = 0
+		for x, ystart, yend in self.iterSpans():
+			n = (yend - ystart) + 1
+			sumX += x * n
+			sumY += ((ystart + yend) * n) // 2
+			tally += n
+		return [float(sumX) / float(tally), float(sumY) / float(tally)]
 
 	def getBoundingBoxWidth(self):
                 return (self.maxX - self.minX) + 1
 
         def getBoundingBoxHeight(self):
                 return (self.maxY - self.minY) + 1
-		
+
 # This part only runs if the script is run directly, which should not happen.
 if __name__ == "__main__" or __name__ == "__builtin__":
 	print "This module is not meant to be run directly."
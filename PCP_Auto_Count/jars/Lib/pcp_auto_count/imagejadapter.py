@@ -0,0 +1,40 @@
+# The glue between ImageJ and the ImageJ-independent core: reading ImagePlus pixels and reporting progress in the status bar.
+from ij import IJ
+from ij.process import ByteProcessor
+from pcp_auto_count.pixelbuffer import PixelBuffer
+from pcp_auto_count.progress import ThrottledProgressReporter
+
+# Shows progress in ImageJ's status bar and progress bar, only as often as it's worth redrawing them.
+class ImageJProgressReporter(ThrottledProgressReporter):
+
+	def displayStatus(self, message):
+		IJ.showStatus(message)
+
+	def displayProgress(self, current, total):
+		IJ.showProgress(current, total)
+
+# Reads an ImagePlus into a PixelBuffer with a single getPixels() call.
+# The image is converted to 8-bit first, and white means 0 instead of 255 if the LUT is inverted.
+# If a width is given, only columns x to x + width - 1 are read, as a buffer of that width.
+# The columns are cropped out of the image's own processor, so its ROI is put back afterwards.
+def getPixelBuffer(imp, x=0, width=None):
+	ipmain = imp.getProcessor()
+	whitePixel = 255
+	if ipmain.isInvertedLut() == True:
+		whitePixel = 0
+	if width is not None:
+		roi = ipmain.getRoi()
+		mask = ipmain.getMask()
+		ipmain.setRoi(x, 0, width, imp.height)
+		try:
+			strip = ipmain.crop()
+		finally:
+			ipmain.setRoi(roi)
+			ipmain.setMask(mask)
+		ipmain = strip
+	bp = ByteProcessor(ipmain, True)
+	return PixelBuffer(bp.getPixels().tostring(), bp.getWidth(), bp.getHeight(), whitePixel)
+
+# This part only runs if the script is run directly, which should not happen.
+if __name__ == "__main__" or __name__ == "__builtin__":
+	print "This module is not meant to be run directly."
@@ -4,6 +4,7 @@ from ij import IJ, ImagePlus
 from pcp_auto_count.chunkcollection import ChunkCollection
 from pcp_auto_count.settings import ProcessingOptions, settingsFileExists, getProcessingOptionsFromSettingsFile, writeProcessingOptionsToSettingsFile
 from pcp_auto_count.optionsdialog import OptionsDialog
+from pcp_auto_count.profiler import reportProfile
 
 
 # The main, high-level workflow of the script.
@@ -45,7 +46,7 @@ def main(quickrun=False):
 		except:
 			print "PCP Auto Count Warning: could not load existing settings. Normal Run dialog will show default options."
 		
-		optionsDialog = OptionsDialog(options)
+		optionsDialog = OptionsDialog(options, imp)
 		optionsDialog.setVisible(True)
 		
 		# If the user presses cancel, don't do anything else.
@@ -68,43 +69,27 @@ def main(quickrun=False):
 	
 	
 	chunks = ChunkCollection()	
-	chunks.loadChunksFromImage(imp)
-	if options.removeNoise == True:
-		chunks.removeNoiseChunks(options.noiseMaxSize)
-	if options.removeConglomerates == True:
-                chunks.removeConglomerates(options.conglomeratesMinSize)
-	if options.excludeOblongCellsW == True or options.excludeOblongCellsH == True:
-                chunks.removeOblongChunks(options.oblongMultiplierW, options.oblongMultiplierH, options.excludeOblongCellsW, options.excludeOblongCellsH)
-        if options.splitDoubletsW == True or options.splitDoubletsH == True:
-                chunks.splitDoubletChunks(options.splitDoubletsMultiplierW, options.splitDoubletsMultiplierH, options.splitDoubletsW, options.splitDoubletsH)
-	if options.excludeBorderCells == True:
-		chunks.removeBorderChunks(options.excludeBorderCellsDistance)
-	if options.usePlasticWrap == True:
-		chunks.plasticWrapChunks()
-	chunks.findCentroids()
-	chunks.findCaves(options)
-	chunks.removeCavelessChunks()
-	chunks.findCentroidDistances()
-	chunks.calculateAngles(options)
-	chunks.generateChunkLabels()
+	chunks.measureImage(imp, options)
 	
 	if options.outputImage == True:
-		nimp = chunks.chunksToNewImage(options)			
+		nimp = chunks.runStage("output image", chunks.chunksToNewImage, options)
 		if options.outputImageArrows == True:
-			chunks.drawArrowsOnImage(nimp, options)
+			chunks.runStage("arrows", chunks.drawArrowsOnImage, nimp, options, options.outputImageAnnotationsAsOverlay)
 		if options.outputImageLabels == True or options.outputImageAngles == True:
-			chunks.drawAngleLabelsOnImage(nimp, options.outputImageLabels, options.outputImageAngles, options.getColorLabels(), options.drawingFontSize)
+			chunks.runStage("angle labels", chunks.drawAngleLabelsOnImage, nimp, options.outputImageLabels, options.outputImageAngles, options.getColorLabels(), options.drawingFontSize, options.outputImageAnnotationsAsOverlay)
 		nimp.show()	
 	
 	if options.outputResultsTable == True:
-		chunks.showAngleResultsTable(options)
+		chunks.runStage("results table", chunks.showAngleResultsTable, options)
 	if options.outputCellSummary == True or options.outputRoseDiagram == True:
-		chunks.showAngleSummary(options)	
+		chunks.runStage("summary", chunks.showAngleSummary, options)
 	
 	if options.outputOverlay == True:
-		oimp = chunks.getOverlayFromChunks(options)
+		oimp = chunks.runStage("overlay", chunks.getOverlayFromChunks, options)
 		oimp.show()
 	
+	reportProfile(chunks.profiler)
+	
 	# Finally cleanup
 	IJ.showProgress(1, 1)
 	IJ.showStatus("PCP Auto Count: Cleanup")		
@@ -1,12 +1,17 @@
 # A version of umeasure.py that operates on all open images instead of only the active one.
+from copy import deepcopy
 from ij import IJ, ImagePlus, WindowManager
 from ij.measure import ResultsTable
 from pcp_auto_count.chunkcollection import ChunkCollection
 from pcp_auto_count.input import showErrorDialog
 from pcp_auto_count.settings import ProcessingOptions, settingsFileExists, getProcessingOptionsFromSettingsFile, writeProcessingOptionsToSettingsFile
 from pcp_auto_count.optionsdialog import OptionsDialog
-from pcp_auto_count.umath import getCircularMeanOfAngles
+from pcp_auto_count.profiler import reportProfile
+from pcp_auto_count.progress import ProgressReporter
+from pcp_auto_count.umath import angleAxisModeIsZeroTo360
+from pcp_auto_count.angleaccumulator import AngleAccumulator
 from pcp_auto_count.rosediagram import RoseDiagram
+from pcp_auto_count.workerpool import runJobs, getWorkerCount
 
 degreeSign = u"\N{DEGREE SIGN}"
 angleLabel = "Angle" + degreeSign
@@ -74,46 +79,33 @@ def main(quickrun=False):
 		
 	# If we get here, the user didn't cancel, so continue.
 	
-	# Process each image individually.
-	chunkCollections = []
+	# Measuring each image is independent of the others, so the images are spread over worker threads.
+	# The collections come back in the same order as the images, whichever one finishes first.
+	# When images already run in parallel, each image keeps its chunks on its own thread rather than starting more threads.
+	imageOptions = options
+	if getWorkerCount(options.batchWorkerCount) > 1 and len(imps) > 1:
+		imageOptions = deepcopy(options)
+		imageOptions.chunkWorkerCount = 1
+	IJ.showStatus("PCP Auto Count: Measuring " + str(len(imps)) + " images...")
+	chunkCollections = runJobs(measureImage, [[imp, imageOptions] for imp in imps], options.batchWorkerCount, showImagesMeasured)
 	
-	# All measuring, plus image and overlay outputs, can be done completely individually.
-	for imp in imps:
-	
-		chunks = ChunkCollection()	
-		chunks.loadChunksFromImage(imp)
-		if options.removeNoise == True:
-			chunks.removeNoiseChunks(options.noiseMaxSize)
-		if options.removeConglomerates == True:
-                        chunks.removeConglomerates(options.conglomeratesMinSize)
-                if options.excludeOblongCellsW == True or options.excludeOblongCellsH == True:
-                        chunks.removeOblongChunks(options.oblongMultiplierW, options.oblongMultiplierH, options.excludeOblongCellsW, options.excludeOblongCellsH)
-                if options.splitDoubletsW == True or options.splitDoubletsH == True:
-                        chunks.splitDoubletChunks(options.splitDoubletsMultiplierW, options.splitDoubletsMultiplierH, options.splitDoubletsW, options.splitDoubletsH)
-		if options.excludeBorderCells == True:
-			chunks.removeBorderChunks(options.excludeBorderCellsDistance)
-		if options.usePlasticWrap == True:
-			chunks.plasticWrapChunks()
-		chunks.findCentroids()
-		chunks.findCaves(options)
-		chunks.removeCavelessChunks()
-		chunks.findCentroidDistances()
-		chunks.calculateAngles(options)
-		chunks.generateChunkLabels()
+	# Image and overlay outputs open new windows, so they are made here, one image at a time.
+	for chunks in chunkCollections:
 		
 		if options.outputImage == True:
-			nimp = chunks.chunksToNewImage(options)			
+			nimp = chunks.runStage("output image", chunks.chunksToNewImage, options)
 			if options.outputImageArrows == True:
-				chunks.drawArrowsOnImage(nimp, options)
+				chunks.runStage("arrows", chunks.drawArrowsOnImage, nimp, options, options.outputImageAnnotationsAsOverlay)
 			if options.outputImageLabels == True or options.outputImageAngles == True:
-				chunks.drawAngleLabelsOnImage(nimp, options.outputImageLabels, options.outputImageAngles, options.getColorLabels(), options.drawingFontSize)
+				chunks.runStage("angle labels", chunks.drawAngleLabelsOnImage, nimp, options.outputImageLabels, options.outputImageAngles, options.getColorLabels(), options.drawingFontSize, options.outputImageAnnotationsAsOverlay)
 			nimp.show()	
 		
 		if options.outputOverlay == True:
-			oimp = chunks.getOverlayFromChunks(options)
+			oimp = chunks.runStage("overlay", chunks.getOverlayFromChunks, options)
 			oimp.show()
-			
-		chunkCollections.append(chunks)
+		
+		# The combined tables below aren't timed per image, so each image's profile is complete here.
+		reportProfile(chunks.profiler)
 		
 	# However, the results table, chunk summary, and rose diagram should all show combined data.
 		
@@ -137,6 +129,19 @@ def main(quickrun=False):
 	# All done.
 	IJ.showStatus("PCP Auto Count: Finished")
 	
+# Measures one image. This runs on a worker thread, so it must not open any windows.
+# Progress is shown per image (see showImagesMeasured), so the chunk-level progress of each image isn't shown.
+def measureImage(imp, options):
+	chunks = ChunkCollection()
+	chunks.progress = ProgressReporter()
+	chunks.measureImage(imp, options)
+	return chunks
+
+# Reports how many images of the batch have been measured.
+def showImagesMeasured(finishedCount, totalCount):
+	IJ.showStatus("PCP Auto Count: Measured " + str(finishedCount) + " of " + str(totalCount) + " images")
+	IJ.showProgress(finishedCount, totalCount)
+	
 def showAngleResultsTable(chunkCollections, imageNames, options):
 	IJ.showStatus("PCP Auto Count: Generating Results Table...")
 	collectionCount = len(chunkCollections)
@@ -216,22 +221,22 @@ def showAngleSummary(chunkCollections, options):
 	med = "N/A"
 	circularMean = ["N/A", "N/A", "N/A", "N/A"]
 	
-	angles = []
+	# Each collection already has the statistics and rose diagram bars of its own angles, so they're merged
+	# instead of gathering every angle from every image.
+	accumulator = AngleAccumulator(int(360 / options.outputRoseDiagramBarSize), angleAxisModeIsZeroTo360(options.angleAxisMode))
 	for i, collection in enumerate(chunkCollections):
 		IJ.showStatus("PCP Auto Count: Generating Cell Summary...")
 		IJ.showProgress(i, collectionCount)
 		badCount += len(collection.badChunks)
-		for c in collection.chunks:
-			angles.append(c.angle)
+		accumulator.merge(collection.angleAccumulator)
 		
-	if len(angles) > 0:
-		angles.sort()
-		count = len(angles)
+	if accumulator.count > 0:
+		count = accumulator.count
 		totalCount = count + badCount
 		processedPercent = (float(count) / float(totalCount)) * 100.0
-		minAngle = angles[0]
-		maxAngle = angles[-1]
-		circularMean = getCircularMeanOfAngles(angles, options.angleAxisScaleZeroTo360)
+		minAngle = accumulator.minAngle
+		maxAngle = accumulator.maxAngle
+		circularMean = accumulator.getCircularMean(options.angleAxisScaleZeroTo360)
 	
 	if options.outputCellSummary == True:
 	
@@ -251,7 +256,7 @@ def showAngleSummary(chunkCollections, options):
 		
 	if options.outputRoseDiagram == True:
 		IJ.showStatus("PCP Auto Count: Generating Rose Diagram...")
-		RoseDiagram.generate(angles, options.angleAxisMode, circularMean, 24, -1, options.outputRoseDiagramAxisSize, options.outputRoseDiagramMarkerIncrement)
+		RoseDiagram.generateFromBars(accumulator.bars, count, options.angleAxisMode, circularMean, -1, options.outputRoseDiagramAxisSize, options.outputRoseDiagramMarkerIncrement)
 
 # This part only runs if the script is run directly, which should not happen.
 if __name__ == "__main__" or __name__ == "__builtin__":
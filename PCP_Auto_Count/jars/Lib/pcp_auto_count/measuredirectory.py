@@ -0,0 +1,125 @@
+# A headless version of measurebatch.py that measures every image file in a directory instead of the open images.
+# Images are opened one at a time, measured, written to a CSV file and closed before the next one is opened,
+# so memory use is bounded by the largest image rather than the whole set. No windows are shown.
+# With the strip_width setting, each image's chunks are also measured and written a strip at a time. That bounds
+# the memory used for chunks; each image is still opened whole.
+#
+# From the command line, run the "Measure Directory" menu script with Fiji in headless mode, e.g.:
+#   ImageJ-linux64 --headless --run "Measure Directory..." 'imageDirectory="/data/plate1",outputFile="/data/plate1.csv",filePattern="*.tif"'
+import csv
+import time
+from glob import glob
+from os import listdir
+from os.path import basename, isfile, join
+from ij import IJ
+from pcp_auto_count.chunkcollection import ChunkCollection
+from pcp_auto_count.profiler import StageProfiler, reportProfile
+from pcp_auto_count.progress import ProgressReporter
+from pcp_auto_count.settings import ProcessingOptions, settingsFileExists, getProcessingOptionsFromSettingsFile
+
+degreeSign = u"\N{DEGREE SIGN}"
+angleLabel = "Angle" + degreeSign
+
+# Image files picked up when no file pattern is given.
+imageExtensions = ('.tif', '.tiff', '.png')
+
+csvColumns = ["Image", "Label", "Chunk Centroid X", "Chunk Centroid Y", "Cave Centroid X", "Cave Centroid Y", "Vector Length", "Chunk Area", angleLabel.encode('utf-8')]
+
+# Measures the images in imageDirectory and writes one row per chunk to outputPath.
+# filePattern is a glob pattern such as "*.tif"; without one, every TIFF and PNG file is measured.
+# The options come from settingsPath if given, otherwise from the last used settings (or the defaults).
+# Returns the number of images measured.
+def main(imageDirectory, outputPath, filePattern=None, settingsPath=None):
+
+	options = None
+	if settingsPath is not None:
+		options = getProcessingOptionsFromSettingsFile(settingsPath)
+	else:
+		try:
+			if settingsFileExists():
+				options = getProcessingOptionsFromSettingsFile()
+		except:
+			print "PCP Auto Count Warning: could not load existing settings. Continuing with defaults."
+	if options is None:
+		options = ProcessingOptions()
+
+	imagePaths = getImagePaths(imageDirectory, filePattern)
+	if len(imagePaths) == 0:
+		print "PCP Auto Count: no images found in " + imageDirectory
+		return 0
+	if options.stripWidth > 0:
+		print "PCP Auto Count: measuring chunks " + str(options.stripWidth) + " columns at a time (strip_width). Each image is still opened whole."
+
+	measuredCount = 0
+	outputFile = open(outputPath, 'wb')
+	try:
+		writer = csv.writer(outputFile)
+		writer.writerow(csvColumns)
+
+		for i, imagePath in enumerate(imagePaths):
+
+			imageName = basename(imagePath)
+			imp = IJ.openImage(imagePath)
+			if imp is None:
+				print "PCP Auto Count Warning: could not open " + imagePath + ", skipping it."
+				continue
+
+			# With profiling on, the profiles of every strip are added up into one for the whole image.
+			imageProfiler = None
+			if options.outputStageProfile == True:
+				imageProfiler = StageProfiler(imageName, imp.width, imp.height)
+
+			# Rows are written out as soon as they're measured, so they're safe on disk even if a later image fails.
+			chunkCount = [0]
+			def writeMeasuredChunks(chunks):
+				chunks.runStage("write rows", writeChunkRows, writer, imageName, chunks, options)
+				outputFile.flush()
+				chunkCount[0] += len(chunks.chunks)
+				if imageProfiler is not None:
+					imageProfiler.merge(chunks.profiler)
+				chunks.flush()
+
+			# Progress is printed per image, so the chunk-level progress isn't reported anywhere.
+			if options.stripWidth > 0:
+				# Large images are measured a strip at a time, with rows written after every strip.
+				start = time.time()
+				ChunkCollection.measureImageInStrips(imp, options, writeMeasuredChunks, ProgressReporter())
+				if imageProfiler is not None:
+					# Finding chunks is interleaved with measuring the strips, so its time is what the other stages leave over.
+					# The chunks it finds are only counted by the stages after it.
+					imageProfiler.addStage("find chunks", time.time() - start - imageProfiler.getTotalSeconds(), 0, 0, 0, 0)
+			else:
+				chunks = ChunkCollection()
+				chunks.progress = ProgressReporter()
+				chunks.measureImage(imp, options)
+				writeMeasuredChunks(chunks)
+			reportProfile(imageProfiler)
+
+			print "PCP Auto Count: measured " + imageName + " (" + str(i + 1) + " of " + str(len(imagePaths)) + "), " + str(chunkCount[0]) + " chunks"
+			measuredCount += 1
+
+			# Let go of this image before opening the next one.
+			imp.flush()
+	finally:
+		outputFile.close()
+
+	return measuredCount
+
+# Returns the paths of the images to measure, sorted by file name so runs are repeatable.
+def getImagePaths(imageDirectory, filePattern=None):
+	if filePattern is not None and len(filePattern) > 0:
+		paths = [p for p in glob(join(imageDirectory, filePattern)) if isfile(p)]
+	else:
+		paths = [join(imageDirectory, name) for name in listdir(imageDirectory) if name.lower().endswith(imageExtensions)]
+		paths = [p for p in paths if isfile(p)]
+	paths.sort()
+	return paths
+
+# Writes the CSV rows for one image: every measured chunk, then the bad chunks if the options ask for them.
+def writeChunkRows(writer, imageName, chunks, options):
+	for row in chunks.getResultRows(options.outputResultsTableIncludeBadChunks):
+		writer.writerow([imageName] + row)
+
+# This part only runs if the script is run directly, which should not happen.
+if __name__ == "__main__" or __name__ == "__builtin__":
+	print "This module is not meant to be run directly."
@@ -0,0 +1,96 @@
+# Compact storage for noise: the components the labeler finds that are too small to be cells.
+# On noisy images most components are a few pixels, and building a Chunk for each one costs more than finding them.
+# Noise is only ever counted and drawn, so instead every component is a record: a size, a bounding box and a range
+# of spans in span arrays shared by all the records, in the same (x, then y) order an entity keeps its spans in.
+# Nothing in this file depends on ImageJ.
+from array import array
+from itertools import izip
+
+class NoiseRecords:
+
+	# maxSize is the noise threshold the records were made with: every component of that many pixels or fewer.
+	def __init__(self, maxSize=0):
+		self.maxSize = maxSize
+
+		# The spans of record i are spanOffsets[i] up to (not including) spanOffsets[i + 1].
+		self.spanXs = array('i')
+		self.spanMinYs = array('i')
+		self.spanMaxYs = array('i')
+		self.spanOffsets = array('i', [0])
+
+		self.sizes = array('i')
+		self.minXs = array('i')
+		self.maxXs = array('i')
+		self.minYs = array('i')
+		self.maxYs = array('i')
+
+	def __len__(self):
+		return len(self.sizes)
+
+	# Adds one component from its spans, which must be sorted by x, then by y.
+	def addSpans(self, spans):
+		for x, ystart, yend in spans:
+			self.spanXs.append(x)
+			self.spanMinYs.append(ystart)
+			self.spanMaxYs.append(yend)
+		self.finishRecord(self.spanOffsets[-1], len(self.spanXs))
+
+	# Adds records from the runs of a labeled image, all at once.
+	# recordIndexes[i] is the record run i belongs to (counting from 0, in order), or -1 if it isn't noise.
+	# The runs of each record must come in (x, then y) order, which they do in column-major labeling order.
+	def addRuns(self, recordIndexes, recordCount, runXs, runStarts, runEnds):
+		if recordCount == 0:
+			return
+
+		# A counting sort: find where every record's spans go, then drop each run in its place.
+		spanCounts = [0] * recordCount
+		for recordIndex in recordIndexes:
+			if recordIndex >= 0:
+				spanCounts[recordIndex] += 1
+		first = len(self.spanXs)
+		nextSpans = [0] * recordCount
+		position = first
+		for i in range(recordCount):
+			nextSpans[i] = position
+			position += spanCounts[i]
+
+		self.spanXs.extend(array('i', [0]) * (position - first))
+		self.spanMinYs.extend(array('i', [0]) * (position - first))
+		self.spanMaxYs.extend(array('i', [0]) * (position - first))
+		for run, recordIndex in enumerate(recordIndexes):
+			if recordIndex < 0:
+				continue
+			span = nextSpans[recordIndex]
+			nextSpans[recordIndex] = span + 1
+			self.spanXs[span] = runXs[run]
+			self.spanMinYs[span] = runStarts[run]
+			self.spanMaxYs[span] = runEnds[run]
+
+		start = first
+		for i in range(recordCount):
+			self.finishRecord(start, start + spanCounts[i])
+			start += spanCounts[i]
+
+	# Records the size and bounding box of the record made of spans start up to end.
+	def finishRecord(self, start, end):
+		self.spanOffsets.append(end)
+		size = 0
+		minY = self.spanMinYs[start]
+		maxY = self.spanMaxYs[start]
+		for i in range(start, end):
+			size += (self.spanMaxYs[i] - self.spanMinYs[i]) + 1
+			minY = min(minY, self.spanMinYs[i])
+			maxY = max(maxY, self.spanMaxYs[i])
+		self.sizes.append(size)
+		self.minXs.append(self.spanXs[start])
+		self.maxXs.append(self.spanXs[end - 1])
+		self.minYs.append(minY)
+		self.maxYs.append(maxY)
+
+	# Yields (x, minY, maxY) for every span of every record, so all the noise can be drawn like a single entity.
+	def iterSpans(self):
+		return izip(self.spanXs, self.spanMinYs, self.spanMaxYs)
+
+# This part only runs if the script is run directly, which should not happen.
+if __name__ == "__main__" or __name__ == "__builtin__":
+	print "This module is not meant to be run directly."
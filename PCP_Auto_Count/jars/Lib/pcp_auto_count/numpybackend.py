@@ -0,0 +1,160 @@
+# An optional NumPy backend for finding chunks, for running the core under CPython (see basechunkcollection.py).
+# It works on the whole image as an array: the runs of every column are found at once, labeled (with SciPy's
+# ndimage.label when SciPy is installed, otherwise with the same run union-find as the chunk finder),
+# and the size, bounding box and centroid of every chunk come from one bincount-style reduction over the runs.
+# The chunks are the same, in the same order, as ChunkFinder.FindChunksUnionFind produces, with the same field values.
+# Fiji's Jython has no NumPy, so there isAvailable() is False and the chunk finder is used instead.
+from pcp_auto_count.chunk import Chunk
+from pcp_auto_count.pixelbuffer import PixelBuffer
+from pcp_auto_count.progress import ProgressReporter
+from pcp_auto_count.runlabeling import findRoot, unionRuns
+
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+try:
+	from scipy import ndimage
+except ImportError:
+	ndimage = None
+
+# Returns True if NumPy could be imported.
+def isAvailable():
+	return numpy is not None
+
+# Returns the foreground pixels of a PixelBuffer, or of a 2-D array of pixel values (a list of rows), as a boolean array indexed [x, y].
+def getForegroundMask(pixels, foreground=255):
+	if isinstance(pixels, PixelBuffer):
+		values = numpy.frombuffer(pixels.data, dtype=numpy.uint8).reshape(pixels.height, pixels.width)
+		foreground = pixels.foreground
+	else:
+		values = numpy.asarray(pixels)
+	return numpy.ascontiguousarray((values == foreground).T)
+
+# Returns (xs, starts, ends) for every vertical run of True in a mask indexed [x, y], in column-major order.
+def getRuns(mask):
+	width, height = mask.shape
+	padded = numpy.zeros((width, height + 2), dtype=numpy.int8)
+	padded[:, 1:-1] = mask
+	edges = numpy.diff(padded, axis=1)
+	xs, starts = numpy.nonzero(edges == 1)
+	endXs, ends = numpy.nonzero(edges == -1)
+	return xs, starts, ends - 1
+
+# Returns a label for every run. Runs of the same chunk (4-connected, like the chunk finder) share a label.
+# The labels themselves are in no particular order.
+def labelRuns(mask, xs, starts, ends):
+	if ndimage is not None:
+		labels, count = ndimage.label(mask)
+		return labels[xs, starts]
+
+	# Without SciPy, union the runs of neighbouring columns, as in ChunkFinder.FindChunksUnionFind.
+	runXs = xs.tolist()
+	runStarts = starts.tolist()
+	runEnds = ends.tolist()
+	parent = list(range(len(runXs)))
+	previousFirst = 0
+	previousLast = 0
+	columnFirst = 0
+	while columnFirst < len(runXs):
+		x = runXs[columnFirst]
+		columnLast = columnFirst
+		while columnLast < len(runXs) and runXs[columnLast] == x:
+			columnLast += 1
+		# Empty columns have no runs here, so check the previous runs really are in the column to the left.
+		if previousFirst == previousLast or runXs[previousFirst] != x - 1:
+			previousFirst = columnFirst
+			previousLast = columnFirst
+		p = previousFirst
+		for label in range(columnFirst, columnLast):
+			while p < previousLast and runEnds[p] < runStarts[label]:
+				p += 1
+			q = p
+			while q < previousLast and runStarts[q] <= runEnds[label]:
+				unionRuns(parent, label, q)
+				q += 1
+		previousFirst = columnFirst
+		previousLast = columnLast
+		columnFirst = columnLast
+	return numpy.array([findRoot(parent, label) for label in range(len(parent))], dtype=numpy.int64)
+
+# Turns arbitrary run labels into chunk indexes 0, 1, 2... in the order each chunk's first run appears.
+def getChunkIndexes(runLabels):
+	uniqueLabels, firstRuns = numpy.unique(runLabels, return_index=True)
+	order = numpy.argsort(firstRuns)
+	chunkIndexes = numpy.zeros(uniqueLabels[-1] + 1, dtype=numpy.int64)
+	chunkIndexes[uniqueLabels[order]] = numpy.arange(len(uniqueLabels))
+	return chunkIndexes[runLabels]
+
+# Returns a dictionary of per-chunk arrays for runs already grouped into chunks:
+# size, minX, maxX, minY, maxY, sumX and sumY (the sums of the pixel coordinates, for centroids).
+# The sums are exact, so the centroids divide out to exactly what Entity.getCentroid returns.
+def getChunkStatistics(chunkIndexes, xs, starts, ends, count):
+	lengths = (ends - starts) + 1
+	statistics = {}
+	statistics['size'] = numpy.bincount(chunkIndexes, weights=lengths, minlength=count).astype(numpy.int64)
+	statistics['sumX'] = numpy.bincount(chunkIndexes, weights=xs * lengths, minlength=count)
+	statistics['sumY'] = numpy.bincount(chunkIndexes, weights=((starts + ends) * lengths) // 2, minlength=count)
+
+	# Reductions per chunk run over the runs sorted by chunk. The sort is stable, so each chunk's runs stay in column-major order.
+	order = numpy.argsort(chunkIndexes, kind='mergesort')
+	firsts = numpy.concatenate(([0], numpy.cumsum(numpy.bincount(chunkIndexes, minlength=count))[:-1]))
+	statistics['minX'] = numpy.minimum.reduceat(xs[order], firsts)
+	statistics['maxX'] = numpy.maximum.reduceat(xs[order], firsts)
+	statistics['minY'] = numpy.minimum.reduceat(starts[order], firsts)
+	statistics['maxY'] = numpy.maximum.reduceat(ends[order], firsts)
+	statistics['order'] = order
+	statistics['firsts'] = firsts
+	return statistics
+
+# Finds the chunks in a PixelBuffer (or a 2-D array of pixel values) and adds them to the provided (empty) list,
+# with their spans, size, bounding box and centroid already filled in.
+def FindChunks(pixels, chunks, progress=None, foreground=255):
+
+	if progress is None:
+		progress = ProgressReporter()
+
+	progress.showStatus("PCP Auto Count: Finding Chunks...")
+	progress.showProgress(0, 1)
+
+	mask = getForegroundMask(pixels, foreground)
+	xs, starts, ends = getRuns(mask)
+	if len(xs) == 0:
+		progress.showProgress(1, 1)
+		return
+
+	chunkIndexes = getChunkIndexes(labelRuns(mask, xs, starts, ends))
+	count = int(chunkIndexes.max()) + 1
+	statistics = getChunkStatistics(chunkIndexes, xs, starts, ends, count)
+
+	progress.showStatus("PCP Auto Count: Calculating Chunk Sizes...")
+
+	order = statistics['order']
+	sortedXs = xs[order].astype(numpy.intc).tostring()
+	sortedStarts = starts[order].astype(numpy.intc).tostring()
+	sortedEnds = ends[order].astype(numpy.intc).tostring()
+	itemSize = numpy.dtype(numpy.intc).itemsize
+	lasts = statistics['firsts'].tolist()[1:] + [len(xs)]
+
+	for i, first in enumerate(statistics['firsts'].tolist()):
+		chunk = Chunk()
+		first = first * itemSize
+		last = lasts[i] * itemSize
+		chunk.spanXs.fromstring(sortedXs[first:last])
+		chunk.spanMinYs.fromstring(sortedStarts[first:last])
+		chunk.spanMaxYs.fromstring(sortedEnds[first:last])
+		chunk.size = int(statistics['size'][i])
+		chunk.minX = int(statistics['minX'][i])
+		chunk.maxX = int(statistics['maxX'][i])
+		chunk.minY = int(statistics['minY'][i])
+		chunk.maxY = int(statistics['maxY'][i])
+		chunk.cachedCentroid = [float(statistics['sumX'][i]) / float(chunk.size), float(statistics['sumY'][i]) / float(chunk.size)]
+		chunk.findCentroid()
+		chunks.append(chunk)
+
+	progress.showProgress(1, 1)
+
+# This part only runs if the script is run directly, which should not happen.
+if __name__ == "__main__" or __name__ == "__builtin__":
+	print "This module is not meant to be run directly."
@@ -1,11 +1,13 @@
 # Improved version of the dialog window where a user sets options for running PCP Auto Count.
 from ij.gui import GenericDialog
-from javax.swing import JDialog, JLabel, JButton, JPanel, JTabbedPane, JCheckBox, JSpinner, SpinnerNumberModel, JRadioButton, ButtonGroup, JComboBox, SwingConstants, BoxLayout, Box, JColorChooser
+from javax.swing import ImageIcon, JDialog, JLabel, JButton, JPanel, JTabbedPane, JCheckBox, JSpinner, SpinnerNumberModel, JRadioButton, ButtonGroup, JComboBox, SwingConstants, BoxLayout, Box, JColorChooser
 from javax.swing.border import TitledBorder
 from java.awt import FlowLayout, GridBagLayout, GridBagConstraints, Insets, Color, Component, Dimension, Font
-from java.awt.event import ActionListener
+from java.awt.event import ActionListener, ItemListener
+from javax.swing.event import ChangeListener
 import copy
 from java.lang.System import getProperty
+from pcp_auto_count.preview import ChunkPreview, previewSize
 from pcp_auto_count.settings import ProcessingOptions, DefaultDrawingColors
 
 class ControlTarget():
@@ -26,7 +28,8 @@ class ControlTarget():
 	COLORS = 14,
 	DRAWING = 15,
 	ANNOTATION = 16,
-	RESULTS_TABLE_OPTIONS = 17
+	RESULTS_TABLE_OPTIONS = 17,
+	PREVIEW = 18
 	
 class ControlPositioningOptions():
 	def __init__(self):
@@ -55,7 +58,8 @@ class ControlPositioningOptions():
 
 class OptionsDialog(JDialog):
 
-	def __init__(self, startingOptions=None):
+	# If a previewImage is given, the dialog shows how its chunks and caves are classified as the options change.
+	def __init__(self, startingOptions=None, previewImage=None):
 		
 		# Get the main PCP Auto Count window	
 		gd = GenericDialog("PCP Auto Count Options")
@@ -99,6 +103,11 @@ class OptionsDialog(JDialog):
 		# Create the tabbed pane, put the tab panels inside, and display it
 		self.initializeTabs()
 
+		# Create the preview pane, if there's an image to preview
+		self.chunkPreview = None
+		if previewImage is not None:
+			self.initializePreview(previewImage)
+
 		# Fix sizes of components.
 		self.fixSize()
 		self.setLocationRelativeTo(None)
@@ -129,6 +138,7 @@ class OptionsDialog(JDialog):
 		# Position and place the panel for these buttons onto the dialog
 		opts = ControlPositioningOptions()
 		opts.startY = 1
+		opts.width = 2
 		opts.setWeightAll(0)
 		opts.anchor = GridBagConstraints.LAST_LINE_END
 		self.addControl(self.dialogButtonPanel, ControlTarget.SELF, opts)
@@ -725,6 +735,11 @@ class OptionsDialog(JDialog):
 		self.drawPlasticWrapCombobox = JComboBox()
 		self.populatePlasticWrapComboboxItems(self.startingOptions.getColorPlasticWrap(), self.startingOptions.getColorPlasticWrapNew())
 		self.addControl(self.drawPlasticWrapCombobox, ControlTarget.PROCESSED_IMAGE_OPTIONS, opts)
+		
+		# Create and position the Annotations as Overlay checkbox
+		opts.startY += 1
+		self.annotationsAsOverlayCheckbox = JCheckBox("Put arrows, labels and angles in an overlay that can be hidden (Image > Overlay)", self.startingOptions.outputImageAnnotationsAsOverlay)
+		self.addControl(self.annotationsAsOverlayCheckbox, ControlTarget.PROCESSED_IMAGE_OPTIONS, opts)
                 		
 		# Create and position the Draw Noise checkbox
 		opts = ControlPositioningOptions()
@@ -1116,6 +1131,44 @@ class OptionsDialog(JDialog):
 		
 		self.addControl(self.tabbedPane, ControlTarget.SELF, opts)
 			
+	def initializePreview(self, imp):
+
+		# Builds the preview pane, next to the tabs, and starts the first preview.
+		self.previewPanel = JPanel(GridBagLayout())
+		self.previewPanel.setBorder(TitledBorder("Preview of " + imp.getTitle()))
+
+		opts = ControlPositioningOptions()
+		opts.setPaddingAll(10)
+		opts.setWeightAll(1)
+		self.previewImageLabel = JLabel()
+		self.previewImageLabel.setHorizontalAlignment(SwingConstants.CENTER)
+		self.previewImageLabel.setPreferredSize(Dimension(previewSize, previewSize))
+		self.addControl(self.previewImageLabel, ControlTarget.PREVIEW, opts)
+
+		opts.startY = 1
+		opts.setWeightAll(0)
+		opts.paddingTop = 0
+		self.previewStatusLabel = JLabel(" ")
+		self.addControl(self.previewStatusLabel, ControlTarget.PREVIEW, opts)
+
+		opts = ControlPositioningOptions()
+		opts.startX = 1
+		opts.setWeightAll(0)
+		opts.setPaddingAll(10)
+		opts.anchor = GridBagConstraints.FIRST_LINE_START
+		opts.verticalFill = True
+		self.addControl(self.previewPanel, ControlTarget.SELF, opts)
+
+		# Every control that changes which chunks are kept, or where their caves are, updates the preview.
+		listener = PreviewOptionsChangedListener(self)
+		for spinner in (self.maxNoiseSpinner, self.minConglomerateSpinner, self.excludeBorderCellsDistanceSpinner, self.splitDoubletsWMultiplierSpinner, self.excludeDoubletsWMultiplierSpinner, self.splitDoubletsHMultiplierSpinner, self.excludeDoubletsHMultiplierSpinner, self.maxSmallCaveSpinner, self.minLargeCaveSpinner):
+			spinner.addChangeListener(listener)
+		for control in (self.removeNoiseCheckbox, self.removeConglomeratesCheckbox, self.excludeBorderCellsCheckbox, self.splitDoubletsWCheckbox, self.excludeDoubletsWCheckbox, self.splitDoubletsHCheckbox, self.excludeDoubletsHCheckbox, self.applyPlasticWrapCheckbox, self.ignoreSmallCavesCheckbox, self.ignoreLargeCavesCheckbox, self.trueCaveModeCombobox):
+			control.addItemListener(listener)
+
+		self.chunkPreview = ChunkPreview(imp, self.showPreview, self.showPreviewStatus)
+		self.previewOptionsChanged(None)
+
 	def addControl(self, control, target, options=None):
 	
 		# A convenience method for adding controls to different containers in the dialog
@@ -1182,6 +1235,8 @@ class OptionsDialog(JDialog):
                         self.annotationPanel.add(control, gbc)
                 elif target == ControlTarget.RESULTS_TABLE_OPTIONS:
                         self.outputResultsTableOptionsPanel.add(control, gbc)
+		elif target == ControlTarget.PREVIEW:
+			self.previewPanel.add(control, gbc)
 			
 	def setSelectedOptions(self):		
 		# Looks at the values of all the controls on the options dialog and sets the options according to them.
@@ -1310,6 +1365,7 @@ class OptionsDialog(JDialog):
 		self.selectedOptions.outputImageArrows = self.drawArrowsCheckbox.isSelected()
 		self.selectedOptions.outputImageLabels = self.drawLabelsCheckbox.isSelected()
 		self.selectedOptions.outputImageAngles = self.drawAnglesCheckbox.isSelected()
+		self.selectedOptions.outputImageAnnotationsAsOverlay = self.annotationsAsOverlayCheckbox.isSelected()
 		
 		self.selectedOptions.outputImagePlasticWrapBorder = False
 		self.selectedOptions.outputImagePlasticWrapAddedWeight = False
@@ -1346,6 +1402,36 @@ class OptionsDialog(JDialog):
 		self.selectedOptions.drawingArrowlineSize = self.drawingArrowlineSizeSpinner.getValue()
 		
 			
+	# Hiding the dialog (OK, Cancel or closing the window) also stops the preview.
+	def setVisible(self, visible):
+		if not visible:
+			self.stopPreview()
+		JDialog.setVisible(self, visible)
+
+	def dispose(self):
+		self.stopPreview()
+		JDialog.dispose(self)
+
+	def stopPreview(self):
+		if self.chunkPreview is not None:
+			self.chunkPreview.stop()
+			self.chunkPreview = None
+
+	# Runs on the event thread whenever an option shown in the preview changes. The preview itself is drawn in the background.
+	def previewOptionsChanged(self, event):
+		if self.chunkPreview is None:
+			return
+		self.setSelectedOptions()
+		self.previewStatusLabel.setText("Updating...")
+		self.chunkPreview.requestUpdate(self.selectedOptions)
+
+	def showPreview(self, image, summary):
+		self.previewImageLabel.setIcon(ImageIcon(image))
+		self.previewStatusLabel.setText(summary)
+
+	def showPreviewStatus(self, message):
+		self.previewStatusLabel.setText(message)
+
 	def eventOkClicked(self, event):
 		self.userCanceled = False
 		self.setSelectedOptions()
@@ -1605,6 +1691,15 @@ class OptionsDialog(JDialog):
                 
 		
 
+# Tells the dialog an option shown in the preview changed: spinners send change events, checkboxes and comboboxes item events.
+class PreviewOptionsChangedListener(ChangeListener, ItemListener):
+	def __init__(self, dialog):
+		self.dialog = dialog
+	def stateChanged(self, event):
+		self.dialog.previewOptionsChanged(event)
+	def itemStateChanged(self, event):
+		self.dialog.previewOptionsChanged(event)
+
 class AxisZeroDirectionChangedListener(ActionListener):
 	def actionPerformed(self, event):
 		comboBox = event.getSource()
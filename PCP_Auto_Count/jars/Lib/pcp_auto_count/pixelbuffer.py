@@ -0,0 +1,116 @@
+# Bulk access to image pixels.
+# Reading a pixel through ImageJ costs a Jython-to-Java call, so instead the whole pixel array is copied once
+# and scanned here. Nothing in this file depends on ImageJ, so it also works on plain Python lists.
+import re
+from array import array
+
+# An 8-bit, single channel image held as a string with one character per pixel, in row-major order.
+class PixelBuffer:
+
+	def __init__(self, data, width, height, foreground=255):
+		self.data = data
+		self.width = width
+		self.height = height
+		self.foreground = foreground
+		self.runPattern = re.compile(re.escape(chr(foreground)) + '+')
+
+	# Builds a buffer from a flat, row-major sequence of pixel values (0 to 255, or signed Java bytes).
+	@staticmethod
+	def fromValues(values, width, height, foreground=255):
+		return PixelBuffer(''.join([chr(v & 0xff) for v in values]), width, height, foreground)
+
+	# Builds a buffer from a list of rows, each a sequence of pixel values.
+	@staticmethod
+	def fromRows(rows, foreground=255):
+		height = len(rows)
+		width = 0
+		if height > 0:
+			width = len(rows[0])
+		values = []
+		for row in rows:
+			values.extend(row)
+		return PixelBuffer.fromValues(values, width, height, foreground)
+
+	def getPixel(self, x, y):
+		return ord(self.data[(y * self.width) + x])
+
+	def isForeground(self, x, y):
+		return self.getPixel(x, y) == self.foreground
+
+	# Returns the pixels of one row, left to right, as a string.
+	def getRow(self, y):
+		start = y * self.width
+		return self.data[start:start + self.width]
+
+	# Returns the pixels of one column, top to bottom, as a string.
+	def getColumn(self, x):
+		return self.data[x::self.width]
+
+	# Returns [ystart, yend] pairs for every run of foreground pixels in the column, top to bottom.
+	def getColumnRuns(self, x):
+		return [[m.start(), m.end() - 1] for m in self.runPattern.finditer(self.getColumn(x))]
+
+	# Returns [xstart, xend] pairs for every run of foreground pixels in the row, left to right.
+	def getRowRuns(self, y):
+		return [[m.start(), m.end() - 1] for m in self.runPattern.finditer(self.getRow(y))]
+
+	# Returns a copy of this buffer with rows and columns swapped, so columns can be read as contiguous rows.
+	def getColumnMajorView(self):
+		data = ''.join([self.getColumn(x) for x in range(self.width)])
+		return PixelBuffer(data, self.height, self.width, self.foreground)
+
+# A writable RGB image held as packed ints (the same layout as ImageJ's ColorProcessor).
+# Drawing happens here, and the finished pixels are handed back to ImageJ all at once.
+# Runs of pixels are filled with slice assignments rather than one pixel at a time, which needs an array('i')
+# (in Jython, that's also a Java int[], so ImageJ takes it as it is).
+class RgbPixelBuffer:
+
+	def __init__(self, pixels, width, height):
+		self.pixels = pixels
+		self.width = width
+		self.height = height
+
+		# A full column of each color used so far, sliced to the length of each span.
+		self.columnFills = {}
+
+	# Returns a new width x height buffer with every pixel set to rgb.
+	@staticmethod
+	def filled(width, height, rgb):
+		return RgbPixelBuffer(array('i', [rgb]) * (width * height), width, height)
+
+	def setPixel(self, x, y, rgb):
+		self.pixels[(y * self.width) + x] = rgb
+
+	def getColumnFill(self, rgb):
+		if rgb not in self.columnFills:
+			self.columnFills[rgb] = array('i', [rgb]) * self.height
+		return self.columnFills[rgb]
+
+	# Colors a vertical run of pixels.
+	def fillSpan(self, x, ystart, yend, rgb):
+		width = self.width
+		self.pixels[(ystart * width) + x:(yend * width) + x + 1:width] = self.getColumnFill(rgb)[:(yend - ystart) + 1]
+
+	# Colors every pixel of a chunk or cave.
+	def fillEntity(self, entity, rgb):
+		pixels = self.pixels
+		width = self.width
+		column = self.getColumnFill(rgb)
+		for x, ystart, yend in entity.iterSpans():
+			pixels[(ystart * width) + x:(yend * width) + x + 1:width] = column[:(yend - ystart) + 1]
+
+	# Colors a rectangle of pixels, one row at a time.
+	def fillRect(self, x, y, width, height, rgb):
+		row = array('i', [rgb]) * width
+		for rowY in range(y, y + height):
+			start = (rowY * self.width) + x
+			self.pixels[start:start + width] = row
+
+	# Colors a list of [x, y] points.
+	def fillPoints(self, points, rgb):
+		for p in points:
+			self.pixels[(p[1] * self.width) + p[0]] = rgb
+
+# This part only runs if the script is run directly, which should not happen.
+if __name__ == "__main__" or __name__ == "__builtin__":
+	print "This module is not meant to be run directly."
@@ -1,151 +1,122 @@
 # This class contains the "plastic wrap" algorithm
 # Use the method "plasticWrapChunks" to apply plastic wrap to each chunk in the collection.
-from ij import IJ
+#
+# There are two engines that find the wrap, selected by ProcessingOptions.plasticWrapMode:
+# 'legacy' sweeps scanlines around the chunk's bounding box in five passes.
+# 'hull' builds the convex hull of the chunk's span endpoints and rasterizes its edges once.
+# Both produce the same things: the border pixels, and the border pixels that were not already part of the chunk.
+# Their outlines differ by a few pixels. benchmarks/plastic_wrap.py reports how much that changes the caves and angles.
+import time
+from pcp_auto_count.progress import ProgressReporter
 from pcp_auto_count.umath import getPointsOnLineSegment
+from pcp_auto_count.workerpool import runOnItems
 
 class PlasticWrap:
 
 	# This is the main plastic wrap algorithm.
+	# Chunks are wrapped independently, so they are spread over workerCount threads (0 means one per processor).
 	@staticmethod
-	def plasticWrapChunks(chunkCollection, expandBoundsBy = 0):
-	
-		chunkCount = len(chunkCollection.chunks)
-
-		# Analyze each chunk.
-		for i, c in enumerate(chunkCollection.chunks):
-		
-			IJ.showStatus("PCP Auto Count: Plastic Wrapping Chunks...")
-			IJ.showProgress(i, chunkCount)
-		
-			# Expand the bounding box by a set amount for context.			
-			if expandBoundsBy < 0:
-				expandBoundsBy = 0
-									
-			bbMinX = c.minX - expandBoundsBy
-			bbMaxX = c.maxX + expandBoundsBy
-			bbMinY = c.minY - expandBoundsBy
-			bbMaxY = c.maxY + expandBoundsBy
-			
-			if bbMinX < 0:
-				bbMinX = 0
-			if bbMinY < 0:
-				bbMinY = 0
-			if bbMaxX >= chunkCollection.imageWidth:
-				bbMaxX = chunkCollection.imageWidth - 1
-			if bbMaxY >= chunkCollection.imageHeight:
-				bbMaxY = chunkCollection.imageHeight - 1
-				
-			# We are looking for "border pixels". Store their coordinates here.
-			borderPoints = []
-			
-			# Any pixels in the border that were not originally part of the chunk will be noted here.
-			borderChunkAdditions = []
-			
-			# FIRST SCAN: STRAIGHT DOWN SCAN
-			# First scan for border points: Run a horizontal line from top to bottom of the box.
-			
-			for y in range(bbMinY, bbMaxY + 1):
-				scanline = getPointsOnLineSegment(bbMinX, bbMaxX, y, y)
-				closestWhitePixelX = -1
-				furthestWhitePixelX = -1
-				for p in scanline:
-					if c.containsPixel(p[0], p[1]) == True:
-						if closestWhitePixelX < 0:
-							closestWhitePixelX = p[0]
-						furthestWhitePixelX = p[0]
-				if furthestWhitePixelX > 0:
-					borderPoints.append([closestWhitePixelX, y])
-					if furthestWhitePixelX > closestWhitePixelX + 1:
-						for i in range(closestWhitePixelX + 1, furthestWhitePixelX + 1):
-							borderPoints.append([i, y])
-							if c.containsPixel(i, y) == False:
-								borderChunkAdditions.append([i, y])
-					elif furthestWhitePixelX == closestWhitePixelX + 1:
-						borderPoints.append([furthestWhitePixelX, y])
-					break # We stop scanning as soon as we had a scanline find one or more white pixels.
-			
-					
-			# SECOND SCAN: FROM POINT DOWN THE RIGHT BORDER
-			# Second scan: starting at the rightmost pixel found with coordinates (x, y):
-			# Draw a line from (x, y) to (bbMaxX, y + 1).
-			# Repeat, increasing destination y by 1 each time.
-			# When a white pixel is found, you continue the scan, but startX moves to the x coord of the right-most white pixel found.
-			
-			# So, the starting pixel to draw our scanlines for this phase is the rightmost white pixel.			
-			startX = borderPoints[-1][0]
-			startY = borderPoints[-1][1]
-			
-			# If the first scanline would be vertical, we're on the edge of what we'd scan. We can skip this phase.
-			run = bbMaxX - startX
-			if run != 0:
+	def plasticWrapChunks(chunkCollection, expandBoundsBy = 0, mode = 'legacy', workerCount = 1, progress = None):
+
+		if progress is None:
+			progress = ProgressReporter()
+
+		def wrapChunk(c):
+			if mode == 'hull':
+				borderPoints, borderChunkAdditions = PlasticWrap.findHullWrap(c)
+			else:
+				borderPoints, borderChunkAdditions = PlasticWrap.findLegacyWrap(c, chunkCollection.imageWidth, chunkCollection.imageHeight, expandBoundsBy)
+		
+			# Recording plastic wrap pixels for specialized image output	
+			c.plasticWrapBorder = borderPoints
+			c.plasticWrapUniquePixels = borderChunkAdditions
 			
-				for endY in range(startY + 1, bbMaxY + 1):
-				
-					scanline = getPointsOnLineSegment(startX, bbMaxX, startY, endY)
-					furthestWhitePixelIndex = 0
-					for index, p in enumerate(scanline):
-						if c.containsPixel(p[0], p[1]) == True:
-							furthestWhitePixelIndex = index
+			# Actually add the plastic pixels to the chunk (this also updates its size)
+			c.addPixels(borderChunkAdditions)
+
+		def showWrapProgress(finishedCount, totalCount):
+			progress.showStatus("PCP Auto Count: Plastic Wrapping Chunks...")
+			progress.showProgress(finishedCount, totalCount)
+
+		runOnItems(wrapChunk, chunkCollection.chunks, workerCount, showWrapProgress)
+
+		progress.showProgress(1, 1)
+
+	# The original five-scan algorithm. Returns (borderPoints, borderChunkAdditions) without changing the chunk.
+	@staticmethod
+	def findLegacyWrap(c, imageWidth, imageHeight, expandBoundsBy = 0):
+
+		# Expand the bounding box by a set amount for context.			
+		if expandBoundsBy < 0:
+			expandBoundsBy = 0
 								
-					if furthestWhitePixelIndex > 0: # Notice we don't care about the point at the first index, since it was already added previously
-						for i in range(1, furthestWhitePixelIndex + 1):
-							borderPoints.append([scanline[i][0], scanline[i][1]])
-							if c.containsPixel(scanline[i][0], scanline[i][1]) == False:
-								borderChunkAdditions.append([scanline[i][0], scanline[i][1]])
-						startX = borderPoints[-1][0]
-						startY = borderPoints[-1][1]
-						
-						# If we are now starting at the rightmost border of the image, we can go to the next scan.
-						if startX == bbMaxX:
-							break
-			
-			# THIRD SCAN: FROM POINT TO THE LEFT ACROSS THE BOTTOM BORDER
-			# Third scan. Starting at the most recent border pixel found with coordinates (x, y):
-			# Draw a line from (x, y) to (bbMax - 1, bbMaxY).
-			# Repeat, decreasing destination x by 1 each time.
-			
-			startX = borderPoints[-1][0]
-			startY = borderPoints[-1][1]
-			
-			endX1 = bbMaxX
-			
-			for endX in range(endX1, bbMinX - 1, -1):
+		bbMinX = c.minX - expandBoundsBy
+		bbMaxX = c.maxX + expandBoundsBy
+		bbMinY = c.minY - expandBoundsBy
+		bbMaxY = c.maxY + expandBoundsBy
+		
+		if bbMinX < 0:
+			bbMinX = 0
+		if bbMinY < 0:
+			bbMinY = 0
+		if bbMaxX >= imageWidth:
+			bbMaxX = imageWidth - 1
+		if bbMaxY >= imageHeight:
+			bbMaxY = imageHeight - 1
 			
-				scanline = getPointsOnLineSegment(startX, endX, startY, bbMaxY)
-				furthestWhitePixelIndex = 0
-				for index, p in enumerate(scanline):
-					if c.containsPixel(p[0], p[1]) == True:
-						furthestWhitePixelIndex = index
+		# We are looking for "border pixels". Store their coordinates here.
+		borderPoints = []
+		
+		# Any pixels in the border that were not originally part of the chunk will be noted here.
+		borderChunkAdditions = []
+		
+		# FIRST SCAN: STRAIGHT DOWN SCAN
+		# First scan for border points: Run a horizontal line from top to bottom of the box.
+		
+		for y in range(bbMinY, bbMaxY + 1):
+			scanline = getPointsOnLineSegment(bbMinX, bbMaxX, y, y)
+			closestWhitePixelX = -1
+			furthestWhitePixelX = -1
+			for p in scanline:
+				if c.containsPixel(p[0], p[1]) == True:
+					if closestWhitePixelX < 0:
+						closestWhitePixelX = p[0]
+					furthestWhitePixelX = p[0]
+			if furthestWhitePixelX > 0:
+				borderPoints.append([closestWhitePixelX, y])
+				if furthestWhitePixelX > closestWhitePixelX + 1:
+					for i in range(closestWhitePixelX + 1, furthestWhitePixelX + 1):
+						borderPoints.append([i, y])
+						if c.containsPixel(i, y) == False:
+							borderChunkAdditions.append([i, y])
+				elif furthestWhitePixelX == closestWhitePixelX + 1:
+					borderPoints.append([furthestWhitePixelX, y])
+				break # We stop scanning as soon as we had a scanline find one or more white pixels.
+		
 				
-				if furthestWhitePixelIndex > 0:
-					for i in range(1, furthestWhitePixelIndex + 1):
-						borderPoints.append([scanline[i][0], scanline[i][1]])
-						if c.containsPixel(scanline[i][0], scanline[i][1]) == False:
-							borderChunkAdditions.append([scanline[i][0], scanline[i][1]])
-					startX = borderPoints[-1][0]
-					startY = borderPoints[-1][1]
-					
-					# If we are now starting at the bottom border of the image, we can go to the next scan.
-					if startY == bbMaxY:
-						break
-			
-			# FOURTH SCAN: FROM POINT UP THE LEFT BORDER
-			# Fourth scan. We are now drawing points from the last border point to the bottom-left corner, incrementing up the left-most of the image.
-			
-			startX = borderPoints[-1][0]
-			startY = borderPoints[-1][1]
-			
-			endY1 = bbMaxY
-			
-			for endY in range(endY1, bbMinY - 1, -1):
+		# SECOND SCAN: FROM POINT DOWN THE RIGHT BORDER
+		# Second scan: starting at the rightmost pixel found with coordinates (x, y):
+		# Draw a line from (x, y) to (bbMaxX, y + 1).
+		# Repeat, increasing destination y by 1 each time.
+		# When a white pixel is found, you continue the scan, but startX moves to the x coord of the right-most white pixel found.
+		
+		# So, the starting pixel to draw our scanlines for this phase is the rightmost white pixel.			
+		startX = borderPoints[-1][0]
+		startY = borderPoints[-1][1]
+		
+		# If the first scanline would be vertical, we're on the edge of what we'd scan. We can skip this phase.
+		run = bbMaxX - startX
+		if run != 0:
+		
+			for endY in range(startY + 1, bbMaxY + 1):
 			
-				scanline = getPointsOnLineSegment(startX, bbMinX, startY, endY)
+				scanline = getPointsOnLineSegment(startX, bbMaxX, startY, endY)
 				furthestWhitePixelIndex = 0
 				for index, p in enumerate(scanline):
 					if c.containsPixel(p[0], p[1]) == True:
 						furthestWhitePixelIndex = index
-				
-				if furthestWhitePixelIndex > 0:
+							
+				if furthestWhitePixelIndex > 0: # Notice we don't care about the point at the first index, since it was already added previously
 					for i in range(1, furthestWhitePixelIndex + 1):
 						borderPoints.append([scanline[i][0], scanline[i][1]])
 						if c.containsPixel(scanline[i][0], scanline[i][1]) == False:
@@ -153,57 +124,195 @@ class PlasticWrap:
 					startX = borderPoints[-1][0]
 					startY = borderPoints[-1][1]
 					
-					# If we're now at the leftmost border of the image, we can go to the last scan.
-					if startX == bbMinX:
+					# If we are now starting at the rightmost border of the image, we can go to the next scan.
+					if startX == bbMaxX:
 						break
-						
-					
-			# FIFTH (FINAL) SCAN: FROM POINT TO THE RIGHT ACROSS THE TOP BORDER
-			# Fifth scan. This one is special because we need to end up back at the very first border point we found.
-			# There should be no border points to find above it or at its level, nor any new border points to the right of it.
-			# This does narrow the scope a bit.
-			
-			startX = borderPoints[-1][0]
-			startY = borderPoints[-1][1]
+		
+		# THIRD SCAN: FROM POINT TO THE LEFT ACROSS THE BOTTOM BORDER
+		# Third scan. Starting at the most recent border pixel found with coordinates (x, y):
+		# Draw a line from (x, y) to (bbMax - 1, bbMaxY).
+		# Repeat, decreasing destination x by 1 each time.
+		
+		startX = borderPoints[-1][0]
+		startY = borderPoints[-1][1]
+		
+		endX1 = bbMaxX
+		
+		for endX in range(endX1, bbMinX - 1, -1):
+		
+			scanline = getPointsOnLineSegment(startX, endX, startY, bbMaxY)
+			furthestWhitePixelIndex = 0
+			for index, p in enumerate(scanline):
+				if c.containsPixel(p[0], p[1]) == True:
+					furthestWhitePixelIndex = index
 			
-			endX1 = bbMinX
+			if furthestWhitePixelIndex > 0:
+				for i in range(1, furthestWhitePixelIndex + 1):
+					borderPoints.append([scanline[i][0], scanline[i][1]])
+					if c.containsPixel(scanline[i][0], scanline[i][1]) == False:
+						borderChunkAdditions.append([scanline[i][0], scanline[i][1]])
+				startX = borderPoints[-1][0]
+				startY = borderPoints[-1][1]
+				
+				# If we are now starting at the bottom border of the image, we can go to the next scan.
+				if startY == bbMaxY:
+					break
+		
+		# FOURTH SCAN: FROM POINT UP THE LEFT BORDER
+		# Fourth scan. We are now drawing points from the last border point to the bottom-left corner, incrementing up the left-most of the image.
+		
+		startX = borderPoints[-1][0]
+		startY = borderPoints[-1][1]
+		
+		endY1 = bbMaxY
+		
+		for endY in range(endY1, bbMinY - 1, -1):
+		
+			scanline = getPointsOnLineSegment(startX, bbMinX, startY, endY)
+			furthestWhitePixelIndex = 0
+			for index, p in enumerate(scanline):
+				if c.containsPixel(p[0], p[1]) == True:
+					furthestWhitePixelIndex = index
 			
-			for endX in range(endX1, bbMaxX + 1):
+			if furthestWhitePixelIndex > 0:
+				for i in range(1, furthestWhitePixelIndex + 1):
+					borderPoints.append([scanline[i][0], scanline[i][1]])
+					if c.containsPixel(scanline[i][0], scanline[i][1]) == False:
+						borderChunkAdditions.append([scanline[i][0], scanline[i][1]])
+				startX = borderPoints[-1][0]
+				startY = borderPoints[-1][1]
 				
-				scanline = getPointsOnLineSegment(startX, endX, startY, bbMinY)
-				furthestWhitePixelIndex = 0
-				for index, p in enumerate(scanline):
-					if c.containsPixel(p[0], p[1]) == True:
-						furthestWhitePixelIndex = index
-						
-				if furthestWhitePixelIndex > 0:
-					for i in range(1, furthestWhitePixelIndex + 1):
-						if scanline[i] not in borderPoints:
-							borderPoints.append([scanline[i][0], scanline[i][1]])
-							if c.containsPixel(scanline[i][0], scanline[i][1]) == False:
-								borderChunkAdditions.append([scanline[i][0], scanline[i][1]])
+				# If we're now at the leftmost border of the image, we can go to the last scan.
+				if startX == bbMinX:
+					break
 					
-					startX = borderPoints[-1][0]
-					startY = borderPoints[-1][1]
-			
-			# Recording plastic wrap pixels for specialized image output	
-			c.plasticWrapBorder = borderPoints
-			c.plasticWrapUniquePixels = borderChunkAdditions
-			
-			# Actually add the plastic pixels to the chunk
-			for b in borderChunkAdditions:
-				for col in c.columns:
-					if b[0] == col.x:
-						col.ys.append(b[1])
-						break
+				
+		# FIFTH (FINAL) SCAN: FROM POINT TO THE RIGHT ACROSS THE TOP BORDER
+		# Fifth scan. This one is special because we need to end up back at the very first border point we found.
+		# There should be no border points to find above it or at its level, nor any new border points to the right of it.
+		# This does narrow the scope a bit.
+		
+		startX = borderPoints[-1][0]
+		startY = borderPoints[-1][1]
+		
+		endX1 = bbMinX
+		
+		for endX in range(endX1, bbMaxX + 1):
 			
-			for col in c.columns:
-				col.ys.sort()
+			scanline = getPointsOnLineSegment(startX, endX, startY, bbMinY)
+			furthestWhitePixelIndex = 0
+			for index, p in enumerate(scanline):
+				if c.containsPixel(p[0], p[1]) == True:
+					furthestWhitePixelIndex = index
+					
+			if furthestWhitePixelIndex > 0:
+				for i in range(1, furthestWhitePixelIndex + 1):
+					if scanline[i] not in borderPoints:
+						borderPoints.append([scanline[i][0], scanline[i][1]])
+						if c.containsPixel(scanline[i][0], scanline[i][1]) == False:
+							borderChunkAdditions.append([scanline[i][0], scanline[i][1]])
 				
-			# Update stale size information
-			c.getSize()
+				startX = borderPoints[-1][0]
+				startY = borderPoints[-1][1]
+
+		return (borderPoints, borderChunkAdditions)
+
+	# The hull engine. Returns (borderPoints, borderChunkAdditions) without changing the chunk.
+	# Every pixel of the chunk lies between the top and bottom of its column's spans, so the hull of the
+	# span endpoints is the hull of the whole chunk. Its edges are rasterized the same way the legacy scanlines are,
+	# clockwise starting from the leftmost pixel of the top row, which is where the legacy scans start too.
+	@staticmethod
+	def findHullWrap(c):
+
+		hull = PlasticWrap.getHullOfSpans(c)
 
-		IJ.showProgress(1, 1)
+		borderPoints = []
+		borderChunkAdditions = []
+		seen = set()
+		for i in range(len(hull)):
+			ax, ay = hull[i]
+			bx, by = hull[(i + 1) % len(hull)]
+			edge = getPointsOnLineSegment(ax, bx, ay, by)
+			# Order the edge's points from its start to its end, so the border is one continuous walk.
+			edge.sort(key=lambda p: ((p[0] - ax) * (bx - ax)) + ((p[1] - ay) * (by - ay)))
+			for p in edge:
+				if (p[0], p[1]) not in seen:
+					seen.add((p[0], p[1]))
+					borderPoints.append([p[0], p[1]])
+					if c.containsPixel(p[0], p[1]) == False:
+						borderChunkAdditions.append([p[0], p[1]])
+
+		return (borderPoints, borderChunkAdditions)
+
+	# Returns the convex hull of the chunk's span endpoints as a list of (x, y) vertices, clockwise on screen
+	# (y points down), starting with the leftmost pixel of the top row. Uses Andrew's monotone chain.
+	@staticmethod
+	def getHullOfSpans(c):
+
+		# The spans are already sorted by x, then y, and each span contributes its top and bottom pixel.
+		points = []
+		for x, ystart, yend in c.iterSpans():
+			points.append((x, ystart))
+			if yend != ystart:
+				points.append((x, yend))
+
+		if len(points) < 3:
+			return points
+
+		def cross(o, a, b):
+			return ((a[0] - o[0]) * (b[1] - o[1])) - ((a[1] - o[1]) * (b[0] - o[0]))
+
+		lower = []
+		for p in points:
+			while len(lower) >= 2 and cross(lower[-2], lower[-1], p) <= 0:
+				lower.pop()
+			lower.append(p)
+		upper = []
+		for p in reversed(points):
+			while len(upper) >= 2 and cross(upper[-2], upper[-1], p) <= 0:
+				upper.pop()
+			upper.append(p)
+		hull = lower[:-1] + upper[:-1]
+
+		# With y pointing down, the first chain runs along the top of the chunk, so the hull is already clockwise on screen.
+		# Rotate it to start at the top row's leftmost vertex.
+		top = min(range(len(hull)), key=lambda i: (hull[i][1], hull[i][0]))
+		return hull[top:] + hull[:top]
+
+	# Runs both engines on every chunk without changing the chunks, and returns one record per chunk with
+	# each engine's time in seconds and pixel counts, plus how many added pixels the engines agree on.
+	# With options, a copy of the chunk wrapped by each engine is also measured the way the pipeline measures it,
+	# and the record gets each engine's angle ('legacyAngle' and 'hullAngle'), or None if no usable cave was found.
+	@staticmethod
+	def compareEngines(chunkCollection, expandBoundsBy = 0, options = None):
+		results = []
+		for c in chunkCollection.chunks:
+			start = time.time()
+			legacyBorder, legacyAdditions = PlasticWrap.findLegacyWrap(c, chunkCollection.imageWidth, chunkCollection.imageHeight, expandBoundsBy)
+			legacySeconds = time.time() - start
+			start = time.time()
+			hullBorder, hullAdditions = PlasticWrap.findHullWrap(c)
+			hullSeconds = time.time() - start
+			shared = set([(p[0], p[1]) for p in legacyAdditions]) & set([(p[0], p[1]) for p in hullAdditions])
+			result = {'size': c.getSize(), 'legacySeconds': legacySeconds, 'hullSeconds': hullSeconds, 'legacyBorder': len(legacyBorder), 'hullBorder': len(hullBorder), 'legacyAdditions': len(legacyAdditions), 'hullAdditions': len(hullAdditions), 'sharedAdditions': len(shared)}
+			if options is not None:
+				result['legacyAngle'] = PlasticWrap.measureWrappedCopy(c, legacyAdditions, options)
+				result['hullAngle'] = PlasticWrap.measureWrappedCopy(c, hullAdditions, options)
+			results.append(result)
+		return results
+
+	# Adds the given wrap pixels to a copy of a chunk and finds its centroid, cave and angle.
+	# Returns the angle, or None if the copy has no usable cave (the pipeline would count it as a bad chunk).
+	@staticmethod
+	def measureWrappedCopy(c, borderChunkAdditions, options):
+		wrapped = c.copy()
+		wrapped.addPixels(borderChunkAdditions)
+		wrapped.findCentroid()
+		wrapped.findCave(options)
+		if not wrapped.hasUsableCave():
+			return None
+		wrapped.calculateAngle(options)
+		return wrapped.angle
 		
 # This part only runs if the script is run directly, which should not happen.
 if __name__ == "__main__" or __name__ == "__builtin__":
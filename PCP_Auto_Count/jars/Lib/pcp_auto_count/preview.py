@@ -0,0 +1,148 @@
+# A live preview of how the chunks and caves of an image are classified, for the options dialog.
+# The image is labeled once, on a background thread. After that, every change of options only re-runs the filters
+# and the measurements they affect (see BaseChunkCollection.refilterChunks), so an update takes a fraction of a second.
+# Updates never run on the Swing event thread: requests are debounced and handed to a single worker thread,
+# and the finished preview image is passed back to the event thread with invokeLater.
+import copy
+import sys
+import jarray
+from java.awt.image import BufferedImage
+from java.lang import Runnable, Thread
+from java.util.concurrent import Executors, ThreadFactory, TimeUnit
+from javax.swing import SwingUtilities
+from pcp_auto_count.basechunkcollection import getLabelingNoiseMaxSize
+from pcp_auto_count.chunkcollection import ChunkCollection
+from pcp_auto_count.imagejadapter import getPixelBuffer
+from pcp_auto_count.progress import ProgressReporter
+
+# How long to wait after the last change before updating, so dragging a spinner doesn't queue an update per step.
+previewDelayMilliseconds = 60
+
+# The longest side of the preview image, in pixels.
+previewSize = 320
+
+backgroundRGB = 0x000000
+chunkRGB = 0xffffff
+
+# Calls a function without arguments. Used to hand work to the worker thread and results back to the event thread.
+class PreviewTask(Runnable):
+
+	def __init__(self, function):
+		self.function = function
+
+	def run(self):
+		self.function()
+
+# Makes the preview's worker a daemon thread, so an open preview never keeps Fiji from quitting.
+class DaemonThreadFactory(ThreadFactory):
+
+	def newThread(self, runnable):
+		thread = Thread(runnable, "PCP Auto Count Preview")
+		thread.setDaemon(True)
+		return thread
+
+# A downscaled RGB canvas, previewSize pixels on its longest side (or the image size, for small images).
+# Every image pixel maps to one canvas pixel, so entities are drawn span by span without visiting every pixel.
+class PreviewCanvas:
+
+	def __init__(self, imageWidth, imageHeight):
+		self.scale = max(1.0, float(max(imageWidth, imageHeight)) / previewSize)
+		self.width = max(1, int(imageWidth / self.scale))
+		self.height = max(1, int(imageHeight / self.scale))
+		self.pixels = jarray.zeros(self.width * self.height, 'i')
+
+	# Colors every pixel of a chunk or cave.
+	def fillEntity(self, entity, rgb):
+		pixels = self.pixels
+		width = self.width
+		scale = self.scale
+		maxX = self.width - 1
+		maxY = self.height - 1
+		for x, ystart, yend in entity.iterSpans():
+			px = min(int(x / scale), maxX)
+			first = min(int(ystart / scale), maxY)
+			last = min(int(yend / scale), maxY)
+			for i in range((first * width) + px, (last * width) + px + 1, width):
+				pixels[i] = rgb
+
+	def toImage(self):
+		image = BufferedImage(self.width, self.height, BufferedImage.TYPE_INT_RGB)
+		image.setRGB(0, 0, self.width, self.height, self.pixels, 0, self.width)
+		return image
+
+# Draws the classification of every chunk: measured chunks in white with their caves in the arrow color,
+# and every kind of removed chunk in the color the output image uses for it.
+def drawClassification(chunks, options):
+	canvas = PreviewCanvas(chunks.imageWidth, chunks.imageHeight)
+	oblongRGB = options.getColorOblongChunks().getRGB()
+	for entityList, rgb in [(chunks.noiseChunks, options.getColorNoise().getRGB()), (chunks.conglomerates, options.getColorConglomerates().getRGB()), (chunks.tooWideChunks, oblongRGB), (chunks.tooTallChunks, oblongRGB), (chunks.doubletBothAxisChunks, oblongRGB), (chunks.removedBorderChunks, options.getColorBorderChunks().getRGB()), (chunks.badChunks, options.getColorBadChunks().getRGB())]:
+		for c in entityList:
+			canvas.fillEntity(c, rgb)
+	caveRGB = options.getColorArrows().getRGB()
+	for c in chunks.chunks:
+		canvas.fillEntity(c, chunkRGB)
+	for c in chunks.chunks:
+		canvas.fillEntity(c.cave, caveRGB)
+	return canvas.toImage()
+
+# Returns a one-line summary of how many chunks ended up where.
+def getClassificationSummary(chunks):
+	removedCount = len(chunks.noiseChunks) + len(chunks.conglomerates) + len(chunks.tooWideChunks) + len(chunks.tooTallChunks) + len(chunks.doubletBothAxisChunks) + len(chunks.removedBorderChunks)
+	return str(len(chunks.chunks)) + " measured, " + str(len(chunks.badChunks)) + " without a cave, " + str(removedCount) + " removed (" + str(len(chunks.noiseChunks)) + " noise)"
+
+class ChunkPreview:
+
+	# imp is the image to preview. onPreviewReady(image, summary) and onPreviewStatus(message) are called on the event thread.
+	def __init__(self, imp, onPreviewReady, onPreviewStatus):
+		self.imp = imp
+		self.onPreviewReady = onPreviewReady
+		self.onPreviewStatus = onPreviewStatus
+		self.chunks = None
+		self.pendingUpdate = None
+		self.executor = Executors.newSingleThreadScheduledExecutor(DaemonThreadFactory())
+
+	# Asks for the preview to be redrawn with these options. Call this on the event thread; it returns straight away.
+	# The options are copied, so the caller can keep changing its own. Only the last of a quick series of requests runs.
+	def requestUpdate(self, options):
+		options = copy.deepcopy(options)
+		if self.pendingUpdate is not None:
+			self.pendingUpdate.cancel(False)
+		self.pendingUpdate = self.executor.schedule(PreviewTask(lambda: self.update(options)), previewDelayMilliseconds, TimeUnit.MILLISECONDS)
+
+	# Runs on the worker thread.
+	def update(self, options):
+		try:
+			# Noise set aside while labeling can't be brought back by refiltering, so if the noise threshold went
+			# below what was set aside, the image is labeled again.
+			if self.chunks is not None and getLabelingNoiseMaxSize(options) < self.chunks.noiseRecords.maxSize:
+				self.chunks = None
+			if self.chunks is None:
+				self.showStatus("Finding chunks...")
+				chunks = ChunkCollection()
+				chunks.progress = ProgressReporter()
+				chunks.setImageInfoFromImage(self.imp, options)
+				# Noise is kept as chunks, so any noise threshold can be previewed without labeling again.
+				chunks.findChunksInPixels(getPixelBuffer(self.imp), options, 0)
+				chunks.measureChunks(options)
+				self.chunks = chunks
+			else:
+				self.chunks.refilterChunks(options)
+			image = drawClassification(self.chunks, options)
+			summary = getClassificationSummary(self.chunks)
+			SwingUtilities.invokeLater(PreviewTask(lambda: self.onPreviewReady(image, summary)))
+		except:
+			error = sys.exc_info()[1]
+			print "PCP Auto Count Warning: could not update the preview (" + str(error) + ")."
+			self.showStatus("Preview unavailable.")
+
+	def showStatus(self, message):
+		SwingUtilities.invokeLater(PreviewTask(lambda: self.onPreviewStatus(message)))
+
+	# Stops the worker thread. Pending updates are dropped.
+	def stop(self):
+		self.executor.shutdownNow()
+		self.chunks = None
+
+# This part only runs if the script is run directly, which should not happen.
+if __name__ == "__main__" or __name__ == "__builtin__":
+	print "This module is not meant to be run directly."
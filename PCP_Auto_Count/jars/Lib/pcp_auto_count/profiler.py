@@ -0,0 +1,116 @@
+# Per-stage profiling of the processing pipeline, turned on by the output_stage_profile setting.
+# For every stage (finding chunks, each filter, plastic wrap, caves, angles, drawing, tables...) it records the wall time,
+# and the number of chunks and chunk pixels going in and coming out. Recording a stage only costs a clock read
+# and a sum over the chunk sizes, so it can be left on for whole batches.
+# Profiles print as a table and are saved as one JSON file per image, in a "profiles" folder next to the settings file.
+# Nothing in this file depends on ImageJ.
+import json
+import os
+import re
+import time
+from pcp_auto_count.settings import getSettingsFilePath
+
+# Returns the number of chunks in a list and the number of pixels in them.
+def getChunkCounts(chunks):
+	pixelCount = 0
+	for c in chunks:
+		pixelCount += c.size
+	return len(chunks), pixelCount
+
+class StageProfiler:
+
+	def __init__(self, imageTitle="untitled", imageWidth=0, imageHeight=0):
+		self.imageTitle = imageTitle
+		self.imageWidth = imageWidth
+		self.imageHeight = imageHeight
+
+		# One dictionary per stage, in the order the stages first ran. A stage that runs again adds to its entry.
+		self.stages = []
+		self.stageIndexes = {}
+
+		self.currentStage = None
+		self.stageStart = 0.0
+		self.chunksIn = 0
+		self.pixelsIn = 0
+
+	# Starts timing a stage that works on the given list of chunks.
+	def startStage(self, name, chunks):
+		self.currentStage = name
+		self.chunksIn, self.pixelsIn = getChunkCounts(chunks)
+		self.stageStart = time.time()
+
+	# Stops timing the current stage. chunks is the list it left behind.
+	def endStage(self, chunks):
+		seconds = time.time() - self.stageStart
+		chunksOut, pixelsOut = getChunkCounts(chunks)
+		self.addStage(self.currentStage, seconds, self.chunksIn, chunksOut, self.pixelsIn, pixelsOut)
+		self.currentStage = None
+
+	def addStage(self, name, seconds, chunksIn, chunksOut, pixelsIn, pixelsOut, runs=1):
+		if name not in self.stageIndexes:
+			self.stageIndexes[name] = len(self.stages)
+			self.stages.append({'stage': name, 'runs': 0, 'seconds': 0.0, 'chunksIn': 0, 'chunksOut': 0, 'pixelsIn': 0, 'pixelsOut': 0})
+		stage = self.stages[self.stageIndexes[name]]
+		stage['runs'] += runs
+		stage['seconds'] += seconds
+		stage['chunksIn'] += chunksIn
+		stage['chunksOut'] += chunksOut
+		stage['pixelsIn'] += pixelsIn
+		stage['pixelsOut'] += pixelsOut
+
+	# Adds the stages of another profile (e.g. of one strip of the same image) to this one.
+	def merge(self, other):
+		for stage in other.stages:
+			self.addStage(stage['stage'], stage['seconds'], stage['chunksIn'], stage['chunksOut'], stage['pixelsIn'], stage['pixelsOut'], stage['runs'])
+
+	def getTotalSeconds(self):
+		total = 0.0
+		for stage in self.stages:
+			total += stage['seconds']
+		return total
+
+	# Returns the profile as a dictionary, as saved in the JSON file.
+	def getReport(self):
+		return {'image': self.imageTitle, 'width': self.imageWidth, 'height': self.imageHeight, 'totalSeconds': self.getTotalSeconds(), 'stages': self.stages}
+
+	# Returns the profile as a text table, one stage per row.
+	def getSummaryTable(self):
+		lines = ["PCP Auto Count profile for " + self.imageTitle + " (" + str(self.imageWidth) + " x " + str(self.imageHeight) + ")"]
+		lines.append("%-28s %9s %10s %10s %12s %12s" % ("Stage", "Seconds", "Chunks in", "Chunks out", "Pixels in", "Pixels out"))
+		for stage in self.stages:
+			lines.append("%-28s %9.3f %10d %10d %12d %12d" % (stage['stage'], stage['seconds'], stage['chunksIn'], stage['chunksOut'], stage['pixelsIn'], stage['pixelsOut']))
+		lines.append("%-28s %9.3f" % ("Total", self.getTotalSeconds()))
+		return '\n'.join(lines)
+
+	# Saves the profile as JSON and returns the path of the file.
+	# Without a path, it goes in the profiles folder, named after the image and the time.
+	def writeJson(self, path=None):
+		if path is None:
+			directory = getProfileDirectory()
+			if not os.path.exists(directory):
+				os.makedirs(directory)
+			name = re.sub(r'[^A-Za-z0-9._-]+', '_', self.imageTitle)
+			path = directory + '/' + name + '-' + time.strftime('%Y%m%d-%H%M%S') + '.json'
+		profileFile = open(path, 'w')
+		try:
+			json.dump(self.getReport(), profileFile, indent=1)
+		finally:
+			profileFile.close()
+		return path
+
+def getProfileDirectory():
+	return getSettingsFilePath().replace('\\', '/').replace('/settings.ini', '') + '/profiles'
+
+# Prints a collection's profile and saves it as JSON, if it has one.
+def reportProfile(profiler):
+	if profiler is None:
+		return
+	print profiler.getSummaryTable()
+	try:
+		print "PCP Auto Count: profile saved to " + profiler.writeJson()
+	except (IOError, OSError), e:
+		print "PCP Auto Count Warning: could not save the profile (" + str(e) + ")."
+
+# This part only runs if the script is run directly, which should not happen.
+if __name__ == "__main__" or __name__ == "__builtin__":
+	print "This module is not meant to be run directly."
@@ -0,0 +1,63 @@
+# Progress reporting for the processing pipeline.
+# The core modules report progress through one of these objects instead of calling ImageJ directly,
+# so they also run outside Fiji. The Fiji version lives in imagejadapter.py.
+#
+# The pipeline reports progress for every column and every chunk, far more often than a status bar can usefully show it.
+# ThrottledProgressReporter passes on only the updates worth showing.
+# Stage times are recorded by StageProfiler (see profiler.py), with the output_stage_profile setting.
+import time
+
+# The base reporter ignores everything. It's what the core uses when nobody is watching (plain Python, worker threads, headless runs).
+class ProgressReporter:
+
+	def showStatus(self, message):
+		pass
+
+	def showProgress(self, current, total):
+		pass
+
+# Passes status and progress on to displayStatus and displayProgress, which subclasses override to actually show them.
+# A status is only passed on when it changes. Progress is passed on once it has moved at least minFractionStep
+# (0.01 is every percent) and at least minInterval seconds have passed since the last update, and always when it
+# finishes or starts over. Progress may come from several worker threads at once; at worst an update is skipped.
+class ThrottledProgressReporter(ProgressReporter):
+
+	def __init__(self, minInterval=0.1, minFractionStep=0.01):
+		self.minInterval = minInterval
+		self.minFractionStep = minFractionStep
+		self.status = None
+		self.lastFraction = -1.0
+		self.lastUpdate = 0.0
+
+	def showStatus(self, message):
+		if message == self.status:
+			return
+		self.status = message
+		self.lastFraction = -1.0
+		self.displayStatus(message)
+
+	def showProgress(self, current, total):
+		if current >= total:
+			fraction = 1.0
+		else:
+			fraction = float(current) / total
+			# The first update of a stage, and any update going backwards, is always shown.
+			if self.lastFraction >= 0.0 and fraction >= self.lastFraction:
+				if fraction - self.lastFraction < self.minFractionStep:
+					return
+				now = time.time()
+				if now - self.lastUpdate < self.minInterval:
+					return
+		self.lastFraction = fraction
+		self.lastUpdate = time.time()
+		self.displayProgress(current, total)
+
+	def displayStatus(self, message):
+		pass
+
+	def displayProgress(self, current, total):
+		pass
+
+# This part only runs if the script is run directly, which should not happen.
+if __name__ == "__main__" or __name__ == "__builtin__":
+	print "This module is not meant to be run directly."
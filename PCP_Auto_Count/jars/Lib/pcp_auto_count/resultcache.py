@@ -0,0 +1,170 @@
+# An on-disk cache of measured chunks, kept in a "cache" folder next to the settings file.
+# Each entry holds the chunk lists of one measured image (spans, centroids, caves, angles and labels) and is keyed by
+# a hash of the image's pixels plus the processing settings that change the measurements, so re-running with only
+# different output settings skips finding and measuring chunks altogether.
+# The folder is kept under the result_cache_size setting (in megabytes) by deleting the least recently used entries.
+# Nothing in this file depends on ImageJ.
+import cPickle
+import hashlib
+import os
+from array import array
+from pcp_auto_count.cave import Cave
+from pcp_auto_count.chunk import Chunk
+from pcp_auto_count.noiserecords import NoiseRecords
+from pcp_auto_count.settings import getSettingsFilePath
+
+# Bump this whenever the measurements or the stored fields change, so old entries are never read back.
+cacheFormatVersion = 2
+
+# Processing settings that don't change the measured chunks, so they aren't part of the key.
+# (Rose diagram bars are counted again from the cached angles, so the angle axis mode doesn't matter either.)
+ignoredSettings = ('batch_worker_count', 'chunk_worker_count', 'chunk_labeling_mode', 'strip_width', 'result_cache_size', 'angle_axis_mode')
+
+# The chunk lists of a collection that are stored.
+cachedLists = ['chunks', 'noiseChunks', 'conglomerates', 'tooWideChunks', 'tooTallChunks', 'doubletBothAxisChunks', 'removedBorderChunks', 'badChunks']
+
+# The arrays of a collection's NoiseRecords, which are stored as they are.
+noiseRecordArrays = ['spanXs', 'spanMinYs', 'spanMaxYs', 'spanOffsets', 'sizes', 'minXs', 'maxXs', 'minYs', 'maxYs']
+
+# Entity fields that are only lookup indexes, rebuilt when needed.
+transientFields = ('columnOffsets', 'pixelMask', 'cachedCentroid')
+
+cacheFileExtension = '.cache'
+
+def getCacheDirectory():
+	return getSettingsFilePath().replace('\\', '/').replace('/settings.ini', '') + '/cache'
+
+# Returns the cache key of a PixelBuffer measured with the given options.
+def getCacheKey(pixels, options):
+	settings = [line for line in options.getProcessingIniString().split('\n') if not line.startswith(ignoredSettings)]
+	digest = hashlib.sha1()
+	digest.update(str(cacheFormatVersion) + '\n')
+	digest.update(str(pixels.width) + 'x' + str(pixels.height) + ' ' + str(pixels.foreground) + '\n')
+	digest.update('\n'.join(settings) + '\n')
+	digest.update(pixels.data)
+	return digest.hexdigest()
+
+def getCacheFilePath(key):
+	return getCacheDirectory() + '/' + key + cacheFileExtension
+
+# Turns a chunk or cave into a plain dictionary of its fields, with the span arrays as lists.
+def getEntityRecord(entity):
+	record = {}
+	for name, value in entity.__dict__.items():
+		if name in transientFields:
+			continue
+		if isinstance(value, array):
+			value = value.tolist()
+		elif isinstance(value, Cave):
+			value = getEntityRecord(value)
+		record[name] = value
+	return record
+
+def getEntityFromRecord(entityClass, record):
+	entity = entityClass()
+	for name, value in record.items():
+		if name in ('spanXs', 'spanMinYs', 'spanMaxYs'):
+			value = array('i', value)
+		elif name == 'cave' and value is not None:
+			value = getEntityFromRecord(Cave, value)
+		setattr(entity, name, value)
+	return entity
+
+# Fills the chunk lists of an (empty) collection from the cache entry for key.
+# Returns False if there is no usable entry, in which case the collection is left untouched.
+def loadCachedResult(key, collection):
+	path = getCacheFilePath(key)
+	if not os.path.exists(path):
+		return False
+	try:
+		cacheFile = open(path, 'rb')
+		try:
+			records = cPickle.load(cacheFile)
+		finally:
+			cacheFile.close()
+		lists = {}
+		for name in cachedLists:
+			lists[name] = [getEntityFromRecord(Chunk, record) for record in records[name]]
+		noiseRecords = NoiseRecords(records['noiseRecords']['maxSize'])
+		for name in noiseRecordArrays:
+			setattr(noiseRecords, name, array('i', records['noiseRecords'][name]))
+	except Exception, e:
+		print "PCP Auto Count Warning: could not read cached results (" + str(e) + "). Measuring again."
+		return False
+
+	for name in cachedLists:
+		setattr(collection, name, lists[name])
+	collection.noiseRecords = noiseRecords
+
+	# Touching the entry marks it as recently used.
+	try:
+		os.utime(path, None)
+	except OSError:
+		pass
+	return True
+
+# Stores the chunk lists of a measured collection under key, then trims the cache to maxMegabytes.
+def storeResult(key, collection, maxMegabytes):
+	records = {}
+	for name in cachedLists:
+		records[name] = [getEntityRecord(chunk) for chunk in getattr(collection, name)]
+	records['noiseRecords'] = {'maxSize': collection.noiseRecords.maxSize}
+	for name in noiseRecordArrays:
+		records['noiseRecords'][name] = getattr(collection.noiseRecords, name).tolist()
+
+	directory = getCacheDirectory()
+	path = getCacheFilePath(key)
+	# Written under a temporary name first, so a half-written entry is never read (batch workers may share the cache).
+	temporaryPath = path + '.' + str(id(collection)) + '.tmp'
+	try:
+		if not os.path.exists(directory):
+			os.makedirs(directory)
+		cacheFile = open(temporaryPath, 'wb')
+		try:
+			cPickle.dump(records, cacheFile, 2)
+		finally:
+			cacheFile.close()
+		if os.path.exists(path):
+			os.remove(path)
+		os.rename(temporaryPath, path)
+	except (IOError, OSError), e:
+		print "PCP Auto Count Warning: could not cache results (" + str(e) + ")."
+		try:
+			if os.path.exists(temporaryPath):
+				os.remove(temporaryPath)
+		except OSError:
+			pass
+		return
+
+	evictOldEntries(maxMegabytes * 1024 * 1024)
+
+# Deletes the least recently used entries until the cache takes up at most maxBytes.
+def evictOldEntries(maxBytes):
+	directory = getCacheDirectory()
+	entries = []
+	totalBytes = 0
+	for name in os.listdir(directory):
+		if not name.endswith(cacheFileExtension):
+			continue
+		path = directory + '/' + name
+		try:
+			size = os.path.getsize(path)
+			entries.append((os.path.getmtime(path), size, path))
+		except OSError:
+			# Another worker removed it in the meantime.
+			continue
+		totalBytes += size
+
+	entries.sort()
+	for modified, size, path in entries:
+		if totalBytes <= maxBytes:
+			break
+		try:
+			os.remove(path)
+		except OSError:
+			pass
+		totalBytes -= size
+
+# This part only runs if the script is run directly, which should not happen.
+if __name__ == "__main__" or __name__ == "__builtin__":
+	print "This module is not meant to be run directly."
@@ -3,7 +3,7 @@ from ij import IJ
 from ij.gui import Line, TextRoi, OvalRoi, ShapeRoi
 from java.awt import Color, Font, BasicStroke
 from java.awt.geom import Arc2D
-from pcp_auto_count.umath import getEndpoint
+from pcp_auto_count.umath import getEndpoint, getAngleHistogram, angleAxisModeIsZeroTo360
 
 dashedLine = BasicStroke(1.0, BasicStroke.CAP_BUTT, BasicStroke.JOIN_BEVEL, 10.0, [3.0, 4.0], 0)
 legendFont = Font("Arial", Font.PLAIN, 14)
@@ -34,6 +34,15 @@ class RoseDiagram:
 
 	@staticmethod
 	def generate(angles=[], mode="B", angleStats=None, barCount=24, scaleMax=-1, preferredAxisSize=1, markerIncrement=90, barColor=None):	
+		
+		# Examine the provided angle values and group them based on the number of bars, then draw the diagram from those.
+		bars = RoseDiagram.__getBarsFromAngles(angles, barCount, mode)
+		return RoseDiagram.generateFromBars(bars, len(angles), mode, angleStats, scaleMax, preferredAxisSize, markerIncrement, barColor)
+		
+	# Draws a rose diagram from bar counts that were already worked out (see AngleAccumulator), so the angles themselves aren't needed.
+	# angleCount is the number of angles that were counted; the mean angle is only drawn if there were any.
+	@staticmethod
+	def generateFromBars(bars, angleCount, mode="B", angleStats=None, scaleMax=-1, preferredAxisSize=1, markerIncrement=90, barColor=None):
 			
 		# Create a new ImageJ image to draw the rose diagram on	
 		IJ.newImage("Rose Diagram", "RGB", 600, 600, 1)
@@ -49,10 +58,7 @@ class RoseDiagram:
 		# The next thing to draw is the scale labels for the rings on the diagram.
 		# We need to do math before we can draw those though.
 		
-		# For the math, examine the provided angle values and group them based on the number of bars.
-		bars = RoseDiagram.__getBarsFromAngles(angles, barCount, mode)
-		
-		# Also determine the bar with the most members.
+		# For the math, determine the bar with the most members.
 		
 		largestBarSize = RoseDiagram.__getLargestBar(bars)
 		if preferredAxisSize > largestBarSize:
@@ -70,7 +76,7 @@ class RoseDiagram:
 		RoseDiagram.__drawBars(processor, mode, bars, largestBarSize, barColor)
 		
 		# Show the average angle as well.
-		if len(angles) > 0:
+		if angleCount > 0:
 			RoseDiagram.__drawMeanAngle(processor, angleStats, mode)
 		
 		# Update and return the ImagePlus.
@@ -261,50 +267,7 @@ class RoseDiagram:
 		
 	@staticmethod
 	def __getBarsFromAngles(angles, barCount, mode):
-		barAngleSize = 360.0 / float(barCount)
-		bars = [0] * barCount
-		
-		isZeroTo360 = False
-		if mode in ["A", "B", "C", "D", "E", "F", "G", "H"]:
-			isZeroTo360 = True
-		
-		straddleOffset = barAngleSize / 2.0
-		
-		for i in range(barCount):
-		
-			startAngle = 0.0
-			
-			if isZeroTo360:
-				startAngle = (0.0 + (barAngleSize * float(i))) - straddleOffset
-				if i == 0:
-					startAngle = startAngle + 360.0
-			else:		
-				startAngle = (-180.0 + (barAngleSize * float(i))) - straddleOffset
-				if i == 0:
-					startAngle = startAngle + 360.0
-				
-			endAngle = startAngle + barAngleSize
-			if i == 0:
-				endAngle = endAngle - 360.0
-			
-			for a in angles:
-				af = float(a)
-				if isZeroTo360:
-					if i == 0:
-						if (af >= startAngle and af < 360.0) or (af >= 0.0 and af < endAngle):
-							bars[i] = bars[i] + 1
-					else:	
-						if af >= startAngle and af < endAngle:
-							bars[i] = bars[i] + 1
-				else:
-					if i == 0:
-						if (af > startAngle and af <= 180.0) or (af > -180.0 and af <= endAngle):
-							bars[i] = bars[i] + 1
-					else:
-						if af > startAngle and af <= endAngle:
-							bars[i] = bars[i] + 1
-					
-		return bars
+		return getAngleHistogram(angles, barCount, angleAxisModeIsZeroTo360(mode))
 		
 	@staticmethod
 	def __getBarsFromAngles_OLD(angles, barCount, mode):
@@ -0,0 +1,27 @@
+# Union-find over runs of pixels, shared by the chunk and cave finders.
+# Each run gets an integer label (its index in the caller's lists), and parent[label] links it towards its group's root.
+# Nothing in this file depends on ImageJ.
+
+# Finds the root label of a run, compressing the path along the way.
+def findRoot(parent, label):
+	root = label
+	while parent[root] != root:
+		root = parent[root]
+	while parent[label] != root:
+		nextLabel = parent[label]
+		parent[label] = root
+		label = nextLabel
+	return root
+
+# Joins the groups of two runs. The smaller root always wins, so roots stay in scan order.
+def unionRuns(parent, a, b):
+	rootA = findRoot(parent, a)
+	rootB = findRoot(parent, b)
+	if rootA < rootB:
+		parent[rootB] = rootA
+	elif rootB < rootA:
+		parent[rootA] = rootB
+
+# This part only runs if the script is run directly, which should not happen.
+if __name__ == "__main__" or __name__ == "__builtin__":
+	print "This module is not meant to be run directly."
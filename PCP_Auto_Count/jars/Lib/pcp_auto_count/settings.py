@@ -1,9 +1,40 @@
 # A module that deals with the persistence of user-supplied options.
-from ij import IJ
-from java.lang.System import getProperty
-from os.path import exists
+from os.path import exists, expanduser
 from os import mkdir
-from java.awt import Color
+import sys
+
+# The options are also used by the ImageJ-independent core, so this module loads in plain Python too.
+# There, colors are plain RGBA values with the same getters as java.awt.Color.
+try:
+	from ij import IJ
+	from java.lang.System import getProperty
+	from java.awt import Color
+except ImportError:
+	IJ = None
+
+	def getProperty(name):
+		return expanduser('~')
+
+	class Color:
+		def __init__(self, red, green, blue, alpha=255):
+			self.red = red
+			self.green = green
+			self.blue = blue
+			self.alpha = alpha
+		def getRed(self):
+			return self.red
+		def getGreen(self):
+			return self.green
+		def getBlue(self):
+			return self.blue
+		def getAlpha(self):
+			return self.alpha
+		# Packed as ARGB in a signed 32-bit int, like java.awt.Color, so it fits an RGB pixel array.
+		def getRGB(self):
+			rgb = ((self.alpha & 0xff) << 24) | ((self.red & 0xff) << 16) | ((self.green & 0xff) << 8) | (self.blue & 0xff)
+			if rgb > 0x7fffffff:
+				rgb -= 0x100000000
+			return rgb
 
 settingsFileName = 'settings.ini'
 anglesCacheFileName = 'rdangles.txt'
@@ -16,6 +47,7 @@ class ProcessingOptions:
 		self.removeConglomerates = False
 		self.conglomeratesMinSize = 1000
 		self.usePlasticWrap = usePlasticWrap
+		self.plasticWrapMode = 'legacy'
 		self.ignoreSmallCaves = False
 		self.smallCaveMaxSize = 1
 		self.ignoreLargeCaves = False
@@ -31,6 +63,14 @@ class ProcessingOptions:
 		self.splitDoubletsH = False
 		self.splitDoubletsMultiplierW = 2.7
 		self.splitDoubletsMultiplierH = 2.7
+		self.chunkLabelingMode = 'unionfind'
+		self.caveLabelingMode = 'unionfind'
+		self.batchWorkerCount = 0
+		self.chunkWorkerCount = 0
+		# Above 0, the directory runner measures each image this many columns at a time (see BaseChunkCollection.measureInStrips).
+		# That bounds the memory used for chunks, not for the image: each image is still opened whole.
+		self.stripWidth = 0
+		self.resultCacheSize = 256
 		self.angleAxisDirectionClockwise = angleAxisDirectionClockwise
 		self.angleAxisScaleZeroTo360 = angleAxisScaleZeroTo360
 		self.angleAxisZeroDirection = angleAxisZeroDirection
@@ -48,6 +88,8 @@ class ProcessingOptions:
 		self.outputImagePlasticWrapBorder = outputImagePlasticWrapBorder
 		self.outputImagePlasticWrapAddedWeight = outputImagePlasticWrapAddedWeight
 		self.outputImageMarginPixels = 0
+		# Put the arrows and labels of the output image in an overlay that can be hidden, rather than in its pixels.
+		self.outputImageAnnotationsAsOverlay = False
 		self.outputCellSummary = outputCellSummary
 		self.outputRoseDiagram = False
 		self.outputRoseDiagramAxisSize = 0
@@ -57,6 +99,7 @@ class ProcessingOptions:
 		self.outputOverlayArrows = True
 		self.outputOverlayLabels = True
 		self.outputOverlayAngles = False
+		self.outputStageProfile = False
 
                 self.drawingFontSize = 12
 		self.drawingArrowheadSize = 5
@@ -130,6 +173,14 @@ class ProcessingOptions:
 		
 	def toIniString(self):
 		iniString = '[processing]\n'
+		iniString += self.getProcessingIniString() + '\n'
+		iniString += '[output]\n'
+		iniString += self.getOutputIniString()
+		return iniString
+
+	# The [processing] section of the settings file, without its header.
+	def getProcessingIniString(self):
+		iniString = ''
 		iniString += 'remove_noise = ' + str(self.removeNoise).lower() + '\n'
 		iniString += 'noise_max_size = ' + str(self.noiseMaxSize) + '\n'
 		iniString += 'remove_conglomerates = ' + str(self.removeConglomerates).lower() + '\n'
@@ -144,8 +195,15 @@ class ProcessingOptions:
 		iniString += 'split_doublets_h = ' + str(self.splitDoubletsH).lower() + '\n'
 		iniString += 'split_doublets_multiplier_w = ' + str(self.splitDoubletsMultiplierW) + '\n'
 		iniString += 'split_doublets_multiplier_h = ' + str(self.splitDoubletsMultiplierH) + '\n'
+		iniString += 'chunk_labeling_mode = ' + self.chunkLabelingMode.lower() + '\n'
+		iniString += 'cave_labeling_mode = ' + self.caveLabelingMode.lower() + '\n'
+		iniString += 'batch_worker_count = ' + str(self.batchWorkerCount) + '\n'
+		iniString += 'chunk_worker_count = ' + str(self.chunkWorkerCount) + '\n'
+		iniString += 'strip_width = ' + str(self.stripWidth) + '\n'
+		iniString += 'result_cache_size = ' + str(self.resultCacheSize) + '\n'
 		iniString += 'true_cave_mode = ' + self.trueCaveMode.lower() + '\n'
 		iniString += 'use_plastic_wrap = ' + str(self.usePlasticWrap).lower() + '\n'
+		iniString += 'plastic_wrap_mode = ' + self.plasticWrapMode.lower() + '\n'
 		iniString += 'ignore_small_caves = ' + str(self.ignoreSmallCaves).lower() + '\n'
 		iniString += 'small_cave_max_size = ' + str(self.smallCaveMaxSize) + '\n'
 		iniString += 'ignore_large_caves = ' + str(self.ignoreLargeCaves).lower() + '\n'
@@ -153,8 +211,12 @@ class ProcessingOptions:
 		iniString += 'angle_axis_direction_clockwise = ' + str(self.angleAxisDirectionClockwise).lower() + '\n'
 		iniString += 'angle_axis_scale_zero_to_360 = ' + str(self.angleAxisScaleZeroTo360).lower() + '\n'
 		iniString += 'angle_axis_zero_direction = ' + str(self.angleAxisZeroDirection).lower() + '\n'
-		iniString += 'angle_axis_mode = ' + self.angleAxisMode.upper() + '\n\n'
-		iniString += '[output]\n'
+		iniString += 'angle_axis_mode = ' + self.angleAxisMode.upper() + '\n'
+		return iniString
+
+	# The [output] and [colors] sections of the settings file.
+	def getOutputIniString(self):
+		iniString = ''
 		iniString += 'output_results_table = ' + str(self.outputResultsTable).lower() + '\n'
 		iniString += 'output_results_table_include_bad_chunks = ' + str(self.outputResultsTableIncludeBadChunks).lower() + '\n'
 		iniString += 'output_image = ' + str(self.outputImage).lower() + '\n'
@@ -169,6 +231,7 @@ class ProcessingOptions:
 		iniString += 'output_image_plastic_wrap_border = ' + str(self.outputImagePlasticWrapBorder).lower() + '\n'
 		iniString += 'output_image_plastic_wrap_added_weight = ' + str(self.outputImagePlasticWrapAddedWeight).lower() + '\n'
 		iniString += 'output_image_margin_pixels = ' + str(self.outputImageMarginPixels) + '\n'
+		iniString += 'output_image_annotations_as_overlay = ' + str(self.outputImageAnnotationsAsOverlay).lower() + '\n'
 		iniString += 'output_cell_summary = ' + str(self.outputCellSummary).lower() + '\n'
 		iniString += 'output_rose_diagram = ' + str(self.outputRoseDiagram).lower() + '\n'
 		iniString += 'output_rose_diagram_axis_size = ' + str(self.outputRoseDiagramAxisSize) + '\n'
@@ -177,7 +240,8 @@ class ProcessingOptions:
 		iniString += 'output_overlay = ' + str(self.outputOverlay).lower() + '\n'
 		iniString += 'output_overlay_arrows = ' + str(self.outputOverlayArrows).lower() + '\n'
 		iniString += 'output_overlay_labels = ' + str(self.outputOverlayLabels).lower() + '\n'
-		iniString += 'output_overlay_angles = ' + str(self.outputOverlayAngles).lower() + '\n\n'
+		iniString += 'output_overlay_angles = ' + str(self.outputOverlayAngles).lower() + '\n'
+		iniString += 'output_stage_profile = ' + str(self.outputStageProfile).lower() + '\n\n'
 		
 		iniString += '[colors]\n'
                 iniString += 'color_noise_red = ' + str(self.color_noise_red) + '\n'
@@ -294,8 +358,14 @@ class ProcessingOptions:
                 setattr(self, rgba[2], newColor.getBlue())
                 setattr(self, rgba[3], newColor.getAlpha())
 
+# Returns True when running on Windows, asking ImageJ when it's there.
+def isWindows():
+	if IJ is not None:
+		return IJ.isWindows()
+	return sys.platform.startswith('win')
+
 def getSettingsFilePath():	
-	if IJ.isWindows():
+	if isWindows():
 		return str(getProperty('user.home')) + '\\AppData\\Roaming\\PCP Auto Count\\' + settingsFileName
 	else:
 		return str(getProperty('user.home')) + '/.PCP Auto Count/' + settingsFileName
@@ -310,7 +380,7 @@ def createDefaultSettingsFile():
 	
 	settingsFilePath = getSettingsFilePath()
 	
-	if IJ.isWindows():
+	if isWindows():
 		settingsDirectory = settingsFilePath.replace('\\','/').replace('/settings.ini','')
 		if exists(settingsDirectory) == False:
 			mkdir(settingsDirectory)
@@ -321,9 +391,12 @@ def createDefaultSettingsFile():
 	writer.writelines(defaultSettings.toIniString())
 	writer.close()
 	
-def getProcessingOptionsFromSettingsFile():        
+# Reads the options from the user's settings file, or from another settings file if a path is given.
+def getProcessingOptionsFromSettingsFile(settingsFilePath=None):        
 	
-	settingsFilePath = getSettingsFilePath().replace('\\','/')
+	if settingsFilePath is None:
+		settingsFilePath = getSettingsFilePath()
+	settingsFilePath = settingsFilePath.replace('\\','/')
 	
 	savedOptions = ProcessingOptions()
 
@@ -442,6 +515,44 @@ def getProcessingOptionsFromSettingsFile():
                         if n >= 0.1:
                                 savedOptions.splitDoubletsMultiplierH = n    
                                 
+                elif line.startswith('chunk_labeling_mode = '):
+                        x = line[22:]
+                        if x in ['unionfind', 'legacy', 'numpy']:
+                                savedOptions.chunkLabelingMode = x
+
+                elif line.startswith('cave_labeling_mode = '):
+                        x = line[21:]
+                        if x in ['unionfind', 'legacy']:
+                                savedOptions.caveLabelingMode = x
+
+                elif line.startswith('batch_worker_count = '):
+                        x = line[21:]
+                        if x.isnumeric():
+                                n = int(x)
+                                if n >= 0:
+                                        savedOptions.batchWorkerCount = n
+
+                elif line.startswith('chunk_worker_count = '):
+                        x = line[21:]
+                        if x.isnumeric():
+                                n = int(x)
+                                if n >= 0:
+                                        savedOptions.chunkWorkerCount = n
+
+                elif line.startswith('strip_width = '):
+                        x = line[14:]
+                        if x.isnumeric():
+                                n = int(x)
+                                if n >= 0:
+                                        savedOptions.stripWidth = n
+
+                elif line.startswith('result_cache_size = '):
+                        x = line[20:]
+                        if x.isnumeric():
+                                n = int(x)
+                                if n >= 0:
+                                        savedOptions.resultCacheSize = n
+
                 elif line.startswith('true_cave_mode = '):
                         x = line[17:]
                         if x in ['largest', 'northmost', 'southmost', 'eastmost', 'westmost', 'highest', 'lowest', 'leftmost', 'rightmost']:
@@ -453,6 +564,11 @@ def getProcessingOptionsFromSettingsFile():
                                 savedOptions.usePlasticWrap = True
                         elif x == 'false':
                                 savedOptions.usePlasticWrap = False
+
+                elif line.startswith('plastic_wrap_mode = '):
+                        x = line[20:]
+                        if x in ['legacy', 'hull']:
+                                savedOptions.plasticWrapMode = x
                                 
                 elif line.startswith('ignore_small_caves = '):
                         x = line[21:]
@@ -635,6 +751,20 @@ def getProcessingOptionsFromSettingsFile():
                         elif x == 'false':
                                 savedOptions.outputCellSummary = False
                                 
+                elif line.startswith('output_image_annotations_as_overlay = '):
+                        x = line[38:]
+                        if x == 'true':
+                                savedOptions.outputImageAnnotationsAsOverlay = True
+                        elif x == 'false':
+                                savedOptions.outputImageAnnotationsAsOverlay = False
+
+                elif line.startswith('output_stage_profile = '):
+                        x = line[23:]
+                        if x == 'true':
+                                savedOptions.outputStageProfile = True
+                        elif x == 'false':
+                                savedOptions.outputStageProfile = False
+
                 elif line.startswith('output_overlay = '):
                         x = line[17:]
                         if x == 'true':
@@ -717,7 +847,7 @@ def writeProcessingOptionsToSettingsFile(options):
 	
 	settingsDirectory = settingsFilePath
 	
-	if IJ.isWindows():
+	if isWindows():
 		settingsDirectory = settingsDirectory.replace('\\','/')
 	
 	settingsDirectory = settingsDirectory.replace('/settings.ini','')	
@@ -788,7 +918,7 @@ def writeAnglesToCacheFile(angles):
         cacheFilePath = getAnglesCacheFilePath()	
 	cacheDirectory = cacheFilePath
 	
-	if IJ.isWindows():
+	if isWindows():
 		cacheDirectory = cacheDirectory.replace('\\','/')
 	
 	cacheDirectory = cacheDirectory.replace('/rdangles.txt','')	
@@ -805,7 +935,7 @@ def readAnglesFromCacheFile():
         if not anglesCacheFileExists():
                 return angleText
         cacheFilePath = getAnglesCacheFilePath()
-        if IJ.isWindows():
+        if isWindows():
 		cacheFilePath = cacheFilePath.replace('\\','/')
 	lines = []
         with open(cacheFilePath, 'r') as cacheFile:
@@ -828,7 +958,7 @@ def readAnglesFromCacheFile():
         
 
 def getAnglesCacheFilePath():	
-	if IJ.isWindows():
+	if isWindows():
 		return str(getProperty('user.home')) + '\\AppData\\Roaming\\PCP Auto Count\\' + anglesCacheFileName
 	else:
 		return str(getProperty('user.home')) + '/.PCP Auto Count/' + anglesCacheFileName
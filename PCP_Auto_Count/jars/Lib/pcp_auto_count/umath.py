@@ -13,22 +13,33 @@ def angleFlipY(angle):
 	else:
 		return 180.0 + (360.0 - angle)
 
+# How far getAngleM turns angles back for each angleAxisZeroDirection.
+angleAxisZeroOffsets = { "east": 0.0, "north": 90.0, "west": 180.0, "south": 270.0 }
+
 # Gets angle using the slope formula. Transforms it based on the axisMode.	
 def getAngleM(x1, x2, y1, y2, optionsObj = None):
+	angle = getImageAngle(x1, x2, y1, y2)
+	return (angle, getAxisAngle(angle, getAngleAxis(optionsObj)))
 
-	options = {
-		"angleAxisZeroDirection": "east",
-		"angleAxisDirectionClockwise": False,
-		"angleAxisScaleZeroTo360" : True
-	}
-
-	if optionsObj is not None:
-		options = {
-			"angleAxisZeroDirection": optionsObj.angleAxisZeroDirection,
-			"angleAxisDirectionClockwise": optionsObj.angleAxisDirectionClockwise,
-			"angleAxisScaleZeroTo360" : optionsObj.angleAxisScaleZeroTo360
-		}
-		
+# getAngleM for lists of points: returns a list of image angles and a list of transformed angles.
+# It's a per-element wrapper. The only saving is that the axis options are looked up once, not once per angle;
+# every angle still goes through getImageAngle and getAxisAngle one at a time, so the results are exactly getAngleM's.
+def getAnglesM(x1s, x2s, y1s, y2s, optionsObj = None):
+	axis = getAngleAxis(optionsObj)
+	angles = map(getImageAngle, x1s, x2s, y1s, y2s)
+	return (angles, [getAxisAngle(angle, axis) for angle in angles])
+
+# Returns the axis options getAngleM uses as a tuple: (zero direction offset, clockwise, 0 to 360 scale).
+# Without options, 0 points east, angles go counterclockwise, and the scale is 0 to 360.
+def getAngleAxis(optionsObj = None):
+	if optionsObj is None:
+		return (0.0, False, True)
+	zeroOffset = angleAxisZeroOffsets.get(optionsObj.angleAxisZeroDirection, 0.0)
+	return (zeroOffset, optionsObj.angleAxisDirectionClockwise == True, optionsObj.angleAxisScaleZeroTo360 != False)
+
+# Gets the angle (0 to 360, counterclockwise from east) of the line from (x1, y1) to (x2, y2) on an image, using the slope formula.
+# Returns -1.0 if the points are the same.
+def getImageAngle(x1, x2, y1, y2):
 
 	angle = -1.0
 	
@@ -73,43 +84,54 @@ def getAngleM(x1, x2, y1, y2, optionsObj = None):
 				angle = 180.0 + angle
 			elif quadrant == 4:
 				angle = 360.0 + angle
-				
-        cangle = angle
-	
-	if options["angleAxisZeroDirection"] == "north":
-		cangle = angle - 90.0
-	elif options["angleAxisZeroDirection"] == "west":
-		cangle = angle - 180.0
-	elif options["angleAxisZeroDirection"] == "south":
-		cangle = angle - 270.0
+
+	return angle
+
+# Transforms an image angle for the axis options returned by getAngleAxis.
+def getAxisAngle(angle, axis):
+
+	cangle = angle - axis[0]
 		
 	if cangle < 0.0:
 		cangle = cangle + 360.0
 	
-	if options["angleAxisDirectionClockwise"] == True:
+	if axis[1] == True:
 		cangle = 360.0 - cangle
 
-	if options["angleAxisScaleZeroTo360"] == False:
+	if axis[2] == False:
 		if cangle > 180.0:
 			cangle = cangle - 360.0
 			
-	return (angle, cangle)
-
-
+	return cangle
 
 # A function to get the circular mean and angular dispersion of the angles in an array.
 # Angles should be in degrees, and be 0 to (not including) 360.
 def getCircularMeanOfAngles(angles, zeroTo360=True):
-	
-	n = float(len(angles))
+	sums = getSinCosSums(angles)
+	return getCircularMeanFromSums(sums[0], sums[1], len(angles), zeroTo360)
+
+# Returns the sums of the sines and cosines of a list of angles in degrees (negative angles are taken as angle + 360),
+# one angle at a time, like getCircularMeanOfAngles always has.
+# Sums of several lists can be added together and passed to getCircularMeanFromSums, without joining the lists.
+def getSinCosSums(angles):
+	sin = math.sin
+	cos = math.cos
+	radians = math.radians
 	s = 0.0
 	c = 0.0
-	for a in angles:
-		angle = a
+	for angle in angles:
 		if angle < 0.0:
 			angle = angle + 360.0
-		s = s + math.sin(math.radians(angle))
-		c = c + math.cos(math.radians(angle))
+		r = radians(angle)
+		s = s + sin(r)
+		c = c + cos(r)
+	return (s, c)
+
+# The circular mean and angular dispersion of n angles whose sines and cosines add up to s and c.
+# Returns [mean angle, RML, variance, standard deviation], like getCircularMeanOfAngles.
+def getCircularMeanFromSums(s, c, n, zeroTo360=True):
+	
+	n = float(n)
 		
 	s = s / n
 	c = c / n
@@ -141,6 +163,74 @@ def getCircularMeanOfAngles(angles, zeroTo360=True):
 		
 	return [avg, r, v, sdv]
 
+# Returns the (start, end) angles of each bar of a rose diagram with barCount bars, as used by angleIsInBar.
+# Bars are centered on multiples of 360 / barCount, starting at 0 (or -180 on the -180 to 180 scale),
+# so the first bar straddles 0 (or 180) and its start is above its end.
+def getAngleHistogramEdges(barCount, zeroTo360=True):
+	barAngleSize = 360.0 / float(barCount)
+	straddleOffset = barAngleSize / 2.0
+	edges = []
+	for i in range(barCount):
+		if zeroTo360:
+			startAngle = (0.0 + (barAngleSize * float(i))) - straddleOffset
+		else:
+			startAngle = (-180.0 + (barAngleSize * float(i))) - straddleOffset
+		if i == 0:
+			startAngle = startAngle + 360.0
+		endAngle = startAngle + barAngleSize
+		if i == 0:
+			endAngle = endAngle - 360.0
+		edges.append((startAngle, endAngle))
+	return edges
+
+# Tests whether an angle is counted in bar i. On the 0 to 360 scale a bar includes its start angle,
+# on the -180 to 180 scale its end angle. 360 and -180 themselves are never counted.
+def angleIsInBar(angle, i, edges, zeroTo360=True):
+	startAngle, endAngle = edges[i]
+	if zeroTo360:
+		if i == 0:
+			return (angle >= startAngle and angle < 360.0) or (angle >= 0.0 and angle < endAngle)
+		return angle >= startAngle and angle < endAngle
+	else:
+		if i == 0:
+			return (angle > startAngle and angle <= 180.0) or (angle > -180.0 and angle <= endAngle)
+		return angle > startAngle and angle <= endAngle
+
+# Counts how many angles fall in each bar of a rose diagram with barCount bars, in a single pass over the angles.
+def getAngleHistogram(angles, barCount, zeroTo360=True):
+	bars = [0] * barCount
+	addToAngleHistogram(bars, angles, zeroTo360)
+	return bars
+
+# Adds the angles to the bar counts of a rose diagram histogram (one count per bar), like getAngleHistogram.
+# The bar an angle belongs to is worked out from the angle, then confirmed with angleIsInBar against its neighbours too,
+# so angles right on an edge are counted exactly as testing every bar would count them.
+def addToAngleHistogram(bars, angles, zeroTo360=True):
+	barCount = len(bars)
+	edges = getAngleHistogramEdges(barCount, zeroTo360)
+	barAngleSize = 360.0 / float(barCount)
+	firstStart = -(barAngleSize / 2.0)
+	if zeroTo360 == False:
+		firstStart = firstStart - 180.0
+
+	neighbours = []
+	for i in range(barCount):
+		neighbours.append(sorted(set([(i - 1) % barCount, i, (i + 1) % barCount])))
+
+	for a in angles:
+		af = float(a)
+		# Angles outside -360 to 360 (or NaN) can't be in any bar.
+		if not (-360.0 <= af <= 360.0):
+			continue
+		guess = int(math.floor((af - firstStart) / barAngleSize)) % barCount
+		for i in neighbours[guess]:
+			if angleIsInBar(af, i, edges, zeroTo360):
+				bars[i] = bars[i] + 1
+
+# Returns True if a rose diagram angle axis mode (see rosediagram.py) uses the 0 to 360 scale, False for -180 to 180.
+def angleAxisModeIsZeroTo360(mode):
+	return mode in ["A", "B", "C", "D", "E", "F", "G", "H"]
+
 # Gets the distance between two points.
 def getDistance(startX, startY, endX, endY):
         return math.sqrt(pow(endX - startX, 2) + pow(endY - startY, 2))
@@ -213,28 +303,6 @@ def findCenterOfMass(columns):
 	
 	return [avgX, avgY]
 
-# Finds the center of mass for pixels passed in.
-# The columns list should be in the format used by Cave.columns.
-def findCenterOfMassB(columns):
-
-	centroid = [-1, -1]
-		
-	sumX = 0
-	sumY = 0
-	tally = 0
-	
-	for column in columns:
-		sumX = sumX + (column.x*len(column.ys))
-		for y in column.ys:
-			sumY = sumY + y
-			tally = tally + 1
-	
-	avgX = float(sumX) / float(tally)
-	avgY = float(sumY) / float(tally)
-	
-	return [avgX, avgY]
-
-
 # Get all the points (rounded to integers) on the described line segments.	
 def getPointsOnLineSegment(x1, x2, y1, y2):
 
@@ -290,13 +358,11 @@ def getPointsOnLineSegment(x1, x2, y1, y2):
 		x = int(round(floatX))
 		p2.append([x, y])
 	
+	# The two passes overlap a lot, so look up points from the first pass in a set rather than scanning the list.
+	seen = set([(op[0], op[1]) for op in pointsInLine])
 	for p in p2:
-		duplicate = False
-		for op in pointsInLine:
-			if p[0] == op[0] and p[1] == op[1]:
-				duplicate = True
-				break
-		if duplicate == False:
+		if (p[0], p[1]) not in seen:
+			seen.add((p[0], p[1]))
 			pointsInLine.append([p[0], p[1]])
 	
 	if abs(rise) > abs(run):
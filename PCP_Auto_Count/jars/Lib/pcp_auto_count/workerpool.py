@@ -0,0 +1,110 @@
+# Runs independent jobs on a pool of Java threads.
+# Jython threads run Python code truly in parallel, so each image (or each chunk of an image) can be measured on its own thread.
+# Results always come back in the order the jobs were given, no matter which job finishes first.
+# Outside Jython (plain CPython) there are no Java threads, and Python threads wouldn't run the work in parallel anyway,
+# so jobs simply run one at a time on the calling thread.
+import sys
+try:
+	from java.lang import Runtime
+	from java.util.concurrent import Callable, Executors
+	from java.util.concurrent.atomic import AtomicInteger
+except ImportError:
+	Runtime = None
+	Callable = object
+
+# Wraps a Python function call so an ExecutorService can run it.
+# Exceptions are caught here and re-raised on the calling thread, so they keep their Python type and traceback.
+class WorkerJob(Callable):
+
+	def __init__(self, function, args):
+		self.function = function
+		self.args = args
+		self.result = None
+		self.error = None
+
+	def call(self):
+		try:
+			self.result = self.function(*self.args)
+		except:
+			self.error = sys.exc_info()
+		return None
+
+# Turns the workerCount option into a thread count: 0 (or less) means one thread per processor.
+# Without Java, it's always one.
+def getWorkerCount(workerCount):
+	if Runtime is None:
+		return 1
+	if workerCount > 0:
+		return workerCount
+	return Runtime.getRuntime().availableProcessors()
+
+# Calls function(*args) for every entry of argumentLists and returns the results in the same order.
+# onJobFinished(finishedCount, totalCount) is called on the calling thread as results are collected.
+# With one worker (or one job) everything runs on the calling thread, exactly like a plain loop.
+def runJobs(function, argumentLists, workerCount=0, onJobFinished=None):
+
+	total = len(argumentLists)
+	threadCount = min(getWorkerCount(workerCount), total)
+	results = []
+
+	if threadCount <= 1:
+		for i, args in enumerate(argumentLists):
+			results.append(function(*args))
+			if onJobFinished is not None:
+				onJobFinished(i + 1, total)
+		return results
+
+	pool = Executors.newFixedThreadPool(threadCount)
+	try:
+		jobs = [WorkerJob(function, args) for args in argumentLists]
+		futures = [pool.submit(job) for job in jobs]
+		for i, job in enumerate(jobs):
+			futures[i].get()
+			if job.error is not None:
+				raise job.error[0], job.error[1], job.error[2]
+			results.append(job.result)
+			if onJobFinished is not None:
+				onJobFinished(i + 1, total)
+	finally:
+		pool.shutdownNow()
+
+	return results
+
+# Calls function(item) for every item and returns the results in the same order as the items.
+# The items are split into contiguous slices and each slice is one job, so items never change order or owner mid-run.
+# onItemFinished(finishedCount, totalCount) is called after every item, from whichever thread finished it;
+# the count is shared between threads, so it always goes up by exactly one.
+def runOnItems(function, items, workerCount=0, onItemFinished=None):
+
+	total = len(items)
+	threadCount = min(getWorkerCount(workerCount), total)
+
+	if threadCount <= 1:
+		results = []
+		for i, item in enumerate(items):
+			results.append(function(item))
+			if onItemFinished is not None:
+				onItemFinished(i + 1, total)
+		return results
+
+	finished = AtomicInteger(0)
+
+	def runSlice(start, end):
+		sliceResults = []
+		for i in range(start, end):
+			sliceResults.append(function(items[i]))
+			if onItemFinished is not None:
+				onItemFinished(finished.incrementAndGet(), total)
+		return sliceResults
+
+	# A few slices per thread, so a slice full of slow items doesn't leave the other threads idle.
+	sliceCount = min(threadCount * 4, total)
+	bounds = [(total * i) // sliceCount for i in range(sliceCount + 1)]
+	results = []
+	for sliceResults in runJobs(runSlice, [[bounds[i], bounds[i + 1]] for i in range(sliceCount)], threadCount):
+		results.extend(sliceResults)
+	return results
+
+# This part only runs if the script is run directly, which should not happen.
+if __name__ == "__main__" or __name__ == "__builtin__":
+	print "This module is not meant to be run directly."
@@ -0,0 +1,12 @@
+#@ File (label="Image directory", style="directory") imageDirectory
+#@ File (label="Results CSV file", style="save") outputFile
+#@ String (label="File pattern (blank for all TIFF and PNG files)", value="", required=false) filePattern
+#@ File (label="Settings file (blank for last used settings)", required=false, description="Its strip_width setting (0 by default) measures each image that many columns at a time. That bounds the memory used for chunks but not for the image: each image is still loaded whole, so it does not help with an image too large to open.") settingsFile
+# Menu Option to measure every image file in a directory, one at a time, writing the results to a CSV file.
+# Also works headless from the command line, with the parameters above passed to --run.
+if __name__ == "__main__" or __name__ == "__builtin__":
+	from pcp_auto_count import measuredirectory
+	settingsPath = None
+	if settingsFile is not None:
+		settingsPath = settingsFile.getPath()
+	measuredirectory.main(imageDirectory.getPath(), outputFile.getPath(), filePattern, settingsPath)
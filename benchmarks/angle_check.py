@@ -0,0 +1,339 @@
+# Regression check for the angle math in umath.py.
+# Compares getAngleM and the list version getAnglesM, and the circular mean (getCircularMeanOfAngles, and
+# getSinCosSums with getCircularMeanFromSums), with copies of the functions they replaced, kept below as they were.
+# Every combination of angleAxisZeroDirection, angleAxisDirectionClockwise and angleAxisScaleZeroTo360 is checked,
+# on points in every quadrant and on the quadrant boundaries: the same x, the same y, and the same point.
+# Results must be identical to the last bit, except for circular means of sums added up from several lists, which may
+# only differ by rounding. Rose diagram binning (getAngleHistogram) is compared with the old loop over every bar and
+# every angle, for several bar counts on both scales, at every bar edge and one ulp either side of it, at -360, -180, 0,
+# 180 and 360, and for NaN, infinite and out-of-range angles.
+# Any difference is printed and makes the script exit with an error.
+# Nothing here depends on ImageJ, so run it with plain Python 2 or with Jython, e.g.:
+#   python2 benchmarks/angle_check.py
+import math
+import os
+import random
+import struct
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'PCP_Auto_Count', 'jars', 'Lib'))
+
+from pcp_auto_count.umath import getAngleHistogram, getAngleM, getAnglesM, getCircularMeanOfAngles, getCircularMeanFromSums, getSinCosSums
+
+# How far a circular mean of added-up sums may be from the mean of the joined list.
+sumTolerance = 1e-9
+
+# The rose diagram bar counts binning is checked with.
+histogramBarCounts = [1, 2, 24, 72, 360]
+
+# The axis options ProcessingOptions has, without the rest of it.
+class AxisOptions:
+
+	def __init__(self, zeroDirection, clockwise, zeroTo360):
+		self.angleAxisZeroDirection = zeroDirection
+		self.angleAxisDirectionClockwise = clockwise
+		self.angleAxisScaleZeroTo360 = zeroTo360
+
+	def getName(self):
+		return self.angleAxisZeroDirection + ', clockwise ' + str(self.angleAxisDirectionClockwise) + ', 0 to 360 ' + str(self.angleAxisScaleZeroTo360)
+
+# getAngleM as it was before the angles were computed a list at a time.
+def referenceGetAngleM(x1, x2, y1, y2, optionsObj = None):
+
+	options = {
+		"angleAxisZeroDirection": "east",
+		"angleAxisDirectionClockwise": False,
+		"angleAxisScaleZeroTo360" : True
+	}
+
+	if optionsObj is not None:
+		options = {
+			"angleAxisZeroDirection": optionsObj.angleAxisZeroDirection,
+			"angleAxisDirectionClockwise": optionsObj.angleAxisDirectionClockwise,
+			"angleAxisScaleZeroTo360" : optionsObj.angleAxisScaleZeroTo360
+		}
+
+	angle = -1.0
+
+	if y1 > y2:
+		y2 = y2 + (2 * (y1 - y2))
+	elif y1 < y2:
+		y2 = y2 - (2 * (y2 - y1))
+
+	if x1 == x2:
+		if y2 > y1:
+			angle = 90.0
+		elif y2 < y1:
+			angle = 270.0
+	else:
+		if y1 == y2:
+			if x2 > x1:
+				angle = 0.0
+			elif x2 < x1:
+				angle = 180.0
+		else:
+			slope = (y2 - y1) / (x2 - x1)
+			angle = math.degrees(math.atan(slope))
+			quadrant = 1
+			if y2 > y1:
+				if x2 > x1:
+					quadrant = 1
+				else:
+					quadrant = 2
+			else:
+				if x2 > x1:
+					quadrant = 4
+				else:
+					quadrant = 3
+			if quadrant == 2 or quadrant == 3:
+				angle = 180.0 + angle
+			elif quadrant == 4:
+				angle = 360.0 + angle
+
+	cangle = angle
+
+	if options["angleAxisZeroDirection"] == "north":
+		cangle = angle - 90.0
+	elif options["angleAxisZeroDirection"] == "west":
+		cangle = angle - 180.0
+	elif options["angleAxisZeroDirection"] == "south":
+		cangle = angle - 270.0
+
+	if cangle < 0.0:
+		cangle = cangle + 360.0
+
+	if options["angleAxisDirectionClockwise"] == True:
+		cangle = 360.0 - cangle
+
+	if options["angleAxisScaleZeroTo360"] == False:
+		if cangle > 180.0:
+			cangle = cangle - 360.0
+
+	return (angle, cangle)
+
+# getCircularMeanOfAngles as it was before it was split into getSinCosSums and getCircularMeanFromSums.
+def referenceGetCircularMeanOfAngles(angles, zeroTo360=True):
+
+	n = float(len(angles))
+	s = 0.0
+	c = 0.0
+	for a in angles:
+		angle = a
+		if angle < 0.0:
+			angle = angle + 360.0
+		s = s + math.sin(math.radians(angle))
+		c = c + math.cos(math.radians(angle))
+
+	s = s / n
+	c = c / n
+
+	r = math.sqrt(pow(s, 2) + pow(c, 2))
+	v = 1 - r
+
+	sdv = math.degrees(math.sqrt(math.log(1 / pow(r, 2))))
+
+	avg = -1.0
+	if s > 0.0 and c > 0.0:
+		avg = math.degrees(math.atan(s / c))
+	elif s < 0.0 and c > 0.0:
+		avg = math.degrees(math.atan(s / c)) + 360.0
+	else:
+		avg = math.degrees(math.atan(s / c)) + 180.0
+
+	if zeroTo360 == False:
+		if avg > 180.0:
+			avg = avg - 360.0
+
+	return [avg, r, v, sdv]
+
+# Counts the angles in each rose diagram bar the way RoseDiagram.generate did before getAngleHistogram: every bar, every angle.
+def referenceGetAngleHistogram(angles, barCount, isZeroTo360):
+	barAngleSize = 360.0 / float(barCount)
+	bars = [0] * barCount
+	straddleOffset = barAngleSize / 2.0
+	for i in range(barCount):
+		startAngle = 0.0
+		if isZeroTo360:
+			startAngle = (0.0 + (barAngleSize * float(i))) - straddleOffset
+			if i == 0:
+				startAngle = startAngle + 360.0
+		else:
+			startAngle = (-180.0 + (barAngleSize * float(i))) - straddleOffset
+			if i == 0:
+				startAngle = startAngle + 360.0
+		endAngle = startAngle + barAngleSize
+		if i == 0:
+			endAngle = endAngle - 360.0
+		for a in angles:
+			af = float(a)
+			if isZeroTo360:
+				if i == 0:
+					if (af >= startAngle and af < 360.0) or (af >= 0.0 and af < endAngle):
+						bars[i] = bars[i] + 1
+				else:
+					if af >= startAngle and af < endAngle:
+						bars[i] = bars[i] + 1
+			else:
+				if i == 0:
+					if (af > startAngle and af <= 180.0) or (af > -180.0 and af <= endAngle):
+						bars[i] = bars[i] + 1
+				else:
+					if af > startAngle and af <= endAngle:
+						bars[i] = bars[i] + 1
+	return bars
+
+# Returns the next float after x in the direction of direction (1.0 or -1.0), like math.nextafter in newer Pythons.
+def getNextFloat(x, direction):
+	if x != x or math.isinf(x):
+		return x
+	if x == 0.0:
+		return math.copysign(5e-324, direction)
+	bits = struct.unpack('<q', struct.pack('<d', x))[0]
+	if (x > 0.0) == (direction > 0.0):
+		bits += 1
+	else:
+		bits -= 1
+	return struct.unpack('<d', struct.pack('<q', bits))[0]
+
+# Returns the angles binning is checked with for a bar count and scale: every bar's start and end (as the old loop
+# worked them out) and center, one ulp either side of each, the ends of both scales and a few that fit in no bar.
+def getHistogramAngles(barCount, zeroTo360):
+	barAngleSize = 360.0 / float(barCount)
+	first = 0.0
+	if not zeroTo360:
+		first = -180.0
+	angles = []
+	for i in range(barCount):
+		start = (first + (barAngleSize * float(i))) - (barAngleSize / 2.0)
+		for angle in [start, start + barAngleSize, start + 360.0, start + barAngleSize - 360.0, first + (barAngleSize * float(i))]:
+			angles += [getNextFloat(angle, -1.0), angle, getNextFloat(angle, 1.0)]
+	for angle in [-360.0, -180.0, 0.0, 180.0, 360.0]:
+		angles += [getNextFloat(angle, -1.0), angle, getNextFloat(angle, 1.0)]
+	angles += [-0.0, float('nan'), float('inf'), float('-inf'), -720.0, 720.0, 1e9, -1e9, 361, -181]
+	rng = random.Random(barCount)
+	angles += [rng.uniform(-400.0, 400.0) for i in range(200)]
+	return angles
+
+# Returns None (for the default axis) and every combination of the axis options.
+def getAxisOptions():
+	axisOptions = [None]
+	for zeroDirection in ['east', 'north', 'west', 'south']:
+		for clockwise in [False, True]:
+			for zeroTo360 in [True, False]:
+				axisOptions.append(AxisOptions(zeroDirection, clockwise, zeroTo360))
+	return axisOptions
+
+# Returns (x1, x2, y1, y2) centroid and cave centroid pairs: every direction on a small grid around a point (the
+# same x, the same y and the same point included), the same with integer coordinates, and random pairs.
+def getPointPairs():
+	pairs = []
+	for dx in [-3.0, -1.0, -0.5, 0.0, 0.5, 1.0, 3.0]:
+		for dy in [-3.0, -1.0, -0.5, 0.0, 0.5, 1.0, 3.0]:
+			pairs.append((10.25, 10.25 + dx, 20.75, 20.75 + dy))
+	for dx in [-2, -1, 0, 1, 2]:
+		for dy in [-2, -1, 0, 1, 2]:
+			pairs.append((10, 10 + dx, 20, 20 + dy))
+	rng = random.Random(1)
+	for i in range(2000):
+		x1 = rng.uniform(0.0, 1000.0)
+		y1 = rng.uniform(0.0, 1000.0)
+		pairs.append((x1, x1 + rng.uniform(-30.0, 30.0), y1, y1 + rng.uniform(-30.0, 30.0)))
+	return pairs
+
+# Returns lists of angles to take circular means of, on both scales.
+def getAngleLists():
+	rng = random.Random(2)
+	lists = [[0.0], [90.0], [359.9], [-90.0], [180.0], [-179.5], [0.0, 90.0], [10.0, 350.0], [170.0, -170.0], [0.0, 360.0], [45.0, 45.0, 225.0]]
+	for i in range(50):
+		lists.append([rng.uniform(0.0, 360.0) for j in range(rng.randint(1, 200))])
+		lists.append([rng.uniform(-180.0, 180.0) for j in range(rng.randint(1, 200))])
+		center = rng.uniform(0.0, 360.0)
+		lists.append([(center + rng.gauss(0.0, 20.0)) % 360.0 for j in range(rng.randint(1, 200))])
+	return lists
+
+# Calls a function and returns what it returns, or the name of the exception it raises (some angle lists have no mean).
+def getOutcome(function, *args):
+	try:
+		return function(*args)
+	except (ArithmeticError, ValueError), e:
+		return e.__class__.__name__
+
+def checkAngles():
+	differences = []
+	pairs = getPointPairs()
+	x1s = [p[0] for p in pairs]
+	x2s = [p[1] for p in pairs]
+	y1s = [p[2] for p in pairs]
+	y2s = [p[3] for p in pairs]
+	for options in getAxisOptions():
+		name = 'default axis'
+		if options is not None:
+			name = options.getName()
+		imageAngles, angles = getAnglesM(x1s, x2s, y1s, y2s, options)
+		for i, (x1, x2, y1, y2) in enumerate(pairs):
+			expected = referenceGetAngleM(x1, x2, y1, y2, options)
+			if getAngleM(x1, x2, y1, y2, options) != expected:
+				differences.append(name + ': getAngleM' + str(pairs[i]) + ' = ' + repr(getAngleM(x1, x2, y1, y2, options)) + ' instead of ' + repr(expected))
+			if (imageAngles[i], angles[i]) != expected:
+				differences.append(name + ': getAnglesM at ' + str(pairs[i]) + ' = ' + repr((imageAngles[i], angles[i])) + ' instead of ' + repr(expected))
+	return differences
+
+def checkCircularMeans():
+	differences = []
+	for angles in getAngleLists():
+		for zeroTo360 in [True, False]:
+			what = 'circular mean of ' + str(len(angles)) + ' angles from ' + repr(angles[0]) + ', 0 to 360 ' + str(zeroTo360)
+			expected = getOutcome(referenceGetCircularMeanOfAngles, angles, zeroTo360)
+			mean = getOutcome(getCircularMeanOfAngles, angles, zeroTo360)
+			if mean != expected:
+				differences.append(what + ': ' + repr(mean) + ' instead of ' + repr(expected))
+			sums = getSinCosSums(angles)
+			mean = getOutcome(getCircularMeanFromSums, sums[0], sums[1], len(angles), zeroTo360)
+			if mean != expected:
+				differences.append(what + ', from sums: ' + repr(mean) + ' instead of ' + repr(expected))
+
+			# Sums of parts of the list, added up, as when statistics are merged across images.
+			if isinstance(expected, str) or len(angles) < 3:
+				continue
+			third = len(angles) // 3
+			s = 0.0
+			c = 0.0
+			for part in [angles[:third], angles[third:2 * third], angles[2 * third:]]:
+				partSums = getSinCosSums(part)
+				s += partSums[0]
+				c += partSums[1]
+			mean = getOutcome(getCircularMeanFromSums, s, c, len(angles), zeroTo360)
+			if isinstance(mean, str) or max([abs(m - e) for m, e in zip(mean, expected)]) > sumTolerance:
+				differences.append(what + ', from added-up sums: ' + repr(mean) + ' instead of ' + repr(expected))
+	return differences
+
+# Bins every angle on its own, so a difference shows which angle is counted in which bar.
+def checkHistograms():
+	differences = []
+	for barCount in histogramBarCounts:
+		for zeroTo360 in [True, False]:
+			for angle in getHistogramAngles(barCount, zeroTo360):
+				bars = getAngleHistogram([angle], barCount, zeroTo360)
+				expected = referenceGetAngleHistogram([angle], barCount, zeroTo360)
+				if bars != expected:
+					differences.append(str(barCount) + ' bars, 0 to 360 ' + str(zeroTo360) + ': ' + repr(angle) + ' counted in bars ' + str([i for i in range(barCount) if bars[i] > 0]) + ' instead of ' + str([i for i in range(barCount) if expected[i] > 0]))
+	return differences
+
+def main(args):
+	allMatch = True
+	for name, check in [('angles', checkAngles), ('circular means', checkCircularMeans), ('rose diagram bars', checkHistograms)]:
+		differences = check()
+		if len(differences) == 0:
+			print name + ': same results'
+			continue
+		allMatch = False
+		print name + ': DIFFERS'
+		for difference in differences[:20]:
+			print '  ' + difference
+		if len(differences) > 20:
+			print '  ... and ' + str(len(differences) - 20) + ' more'
+	if not allMatch:
+		sys.exit(1)
+
+if __name__ == '__main__':
+	main(sys.argv[1:])
@@ -0,0 +1,65 @@
+# Memory benchmark for chunk storage.
+# Builds the chunks of a dense synthetic image (a grid of square cells, or one image-sized conglomerate)
+# the same way the labeler does, one span at a time in column order, and reports peak memory and build time.
+# Run with the Python that will run the plugin, e.g.:  python benchmarks/entity_memory.py 2048 grid
+import os
+import sys
+import time
+import resource
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'PCP_Auto_Count', 'jars', 'Lib'))
+
+from pcp_auto_count.chunk import Chunk
+
+def peakMemoryKilobytes():
+	peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	if sys.platform == 'darwin':
+		peak = peak / 1024
+	return peak
+
+# Cells of cellSize x cellSize pixels separated by gap pixels, filling a size x size image.
+def buildGrid(size, cellSize=30, gap=2):
+	chunks = []
+	pitch = cellSize + gap
+	for cellX in range(0, size - cellSize + 1, pitch):
+		for cellY in range(0, size - cellSize + 1, pitch):
+			chunk = Chunk()
+			for x in range(cellX, cellX + cellSize):
+				chunk.addSpan(x, cellY, cellY + cellSize - 1)
+			chunks.append(chunk)
+	return chunks
+
+# A single chunk covering the whole image, as a worst case conglomerate.
+def buildConglomerate(size):
+	chunk = Chunk()
+	for x in range(size):
+		chunk.addSpan(x, 0, size - 1)
+	return [chunk]
+
+def main(args):
+	size = 2048
+	layout = 'grid'
+	if len(args) > 0:
+		size = int(args[0])
+	if len(args) > 1:
+		layout = args[1]
+
+	baseline = peakMemoryKilobytes()
+	start = time.time()
+	if layout == 'conglomerate':
+		chunks = buildConglomerate(size)
+	else:
+		chunks = buildGrid(size)
+	pixelCount = 0
+	for chunk in chunks:
+		pixelCount += chunk.getSize()
+	elapsed = time.time() - start
+	peak = peakMemoryKilobytes()
+
+	print 'layout: %s, image: %d x %d' % (layout, size, size)
+	print 'chunks: %d, pixels: %d' % (len(chunks), pixelCount)
+	print 'build time: %.2f s' % elapsed
+	print 'peak memory added: %.1f MB (%.1f bytes per pixel)' % ((peak - baseline) / 1024.0, ((peak - baseline) * 1024.0) / max(pixelCount, 1))
+
+if __name__ == '__main__':
+	main(sys.argv[1:])
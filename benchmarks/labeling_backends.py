@@ -0,0 +1,74 @@
+# Benchmark for the chunk labeling backends.
+# Builds synthetic images of ring-shaped cells with a notch (like PCP cells with a cave) plus some noise,
+# labels them with the union-find chunk finder and with the NumPy backend, and reports the time each takes
+# to find the chunks and their size, bounding box and centroid. It also checks both give the same chunks.
+# The NumPy backend needs NumPy (SciPy is used too if installed), so run this with CPython 2, e.g.:
+#   python2 benchmarks/labeling_backends.py 256 512 1024 2048
+import os
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'PCP_Auto_Count', 'jars', 'Lib'))
+
+from pcp_auto_count import numpybackend
+from pcp_auto_count.chunkfinder import ChunkFinder
+from pcp_auto_count.pixelbuffer import PixelBuffer
+
+# A size x size image with roughly one cell per 40 x 40 pixels.
+def buildImage(size, seed=1):
+	random.seed(seed)
+	pixels = bytearray(size * size)
+	for i in range((size * size) // 1600):
+		cx = random.randint(0, size - 1)
+		cy = random.randint(0, size - 1)
+		radius = random.randint(6, 16)
+		for y in range(max(0, cy - radius), min(size, cy + radius + 1)):
+			for x in range(max(0, cx - radius), min(size, cx + radius + 1)):
+				d = (x - cx) * (x - cx) + (y - cy) * (y - cy)
+				if (radius * radius) // 4 < d <= radius * radius and not (x > cx and abs(y - cy) < 2):
+					pixels[(y * size) + x] = 255
+	for i in range((size * size) // 400):
+		pixels[random.randint(0, (size * size) - 1)] = 255
+	return PixelBuffer(str(pixels), size, size)
+
+def getStatistics(chunks):
+	return [(c.size, c.minX, c.maxX, c.minY, c.maxY, c.centroid, c.centroidInt, list(c.iterSpans())) for c in chunks]
+
+def main(args):
+	sizes = [256, 512, 1024]
+	if len(args) > 0:
+		sizes = [int(a) for a in args]
+
+	if not numpybackend.isAvailable():
+		print 'NumPy is not installed, so there is nothing to compare.'
+		return
+
+	labeler = 'run union-find'
+	if numpybackend.ndimage is not None:
+		labeler = 'scipy.ndimage.label'
+	print 'NumPy backend labeling with ' + labeler
+
+	print ' size  chunks  union-find s  numpy s  speedup'
+	for size in sizes:
+		pixels = buildImage(size)
+
+		start = time.time()
+		pythonChunks = []
+		ChunkFinder.FindChunksUnionFind(pixels, pythonChunks)
+		for c in pythonChunks:
+			c.findCentroid()
+		pythonSeconds = time.time() - start
+
+		start = time.time()
+		numpyChunks = []
+		numpybackend.FindChunks(pixels, numpyChunks)
+		numpySeconds = time.time() - start
+
+		if getStatistics(pythonChunks) != getStatistics(numpyChunks):
+			print 'MISMATCH at size ' + str(size)
+
+		print '%5d %7d %13.3f %8.3f %7.1fx' % (size, len(pythonChunks), pythonSeconds, numpySeconds, pythonSeconds / max(numpySeconds, 1e-9))
+
+if __name__ == '__main__':
+	main(sys.argv[1:])
@@ -0,0 +1,194 @@
+# Regression check for the chunk finders.
+# Labels deterministic images (synthetic epithelia from synthetic.py, random speckle and a few edge cases) with the
+# legacy chunk finder (chunk_labeling_mode = legacy) and with the union-find one, and checks that both give the same
+# chunks in the same order: the same spans, bounding boxes and sizes. The union-find finder is also run with noise set
+# aside while labeling, and its chunks and noise records together must again be exactly the legacy chunks.
+# Strip labeling (strip_width) is checked the same way at several strip widths. It hands out chunks strip by strip, in
+# the order they are completed, so it must give the legacy chunks in that order: grouped by the strip they're completed
+# in, and in the usual order within each strip.
+# The cave finders are checked the same way: for every chunk, and for both halves of it as split by divide and by
+# divideHorizontally, the union-find cave finder must give the legacy cave candidates (caveLabelingMode = legacy) in
+# the same order, and CaveFinder.FindCave must pick the same cave with either caveLabelingMode, for every trueCaveMode.
+# Any difference is printed and makes the script exit with an error. Nothing here depends on ImageJ, so run it with
+# plain Python 2 or with Jython, e.g.:
+#   python2 benchmarks/labeling_check.py
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'PCP_Auto_Count', 'jars', 'Lib'))
+
+from synthetic import EpitheliumParameters, buildEpithelium
+from pcp_auto_count.cavefinder import CaveFinder
+from pcp_auto_count.chunkfinder import ChunkFinder
+from pcp_auto_count.noiserecords import NoiseRecords
+from pcp_auto_count.pixelbuffer import PixelBuffer
+from pcp_auto_count.settings import ProcessingOptions
+
+# The noise thresholds the union-find finder is checked with. 0 sets nothing aside.
+noiseMaxSizes = [0, 1, 5, 40]
+
+# The strip widths strip labeling is checked with. Anything as wide as the image is a single strip.
+stripWidths = [1, 7, 64, 100000]
+
+# The ways of picking the true cave that FindCave is checked with.
+trueCaveModes = ['largest', 'highest', 'lowest', 'leftmost', 'rightmost', 'northmost', 'southmost', 'eastmost', 'westmost']
+
+# A width x height image where every pixel is foreground with the given probability.
+def buildSpeckle(width, height, density, seed):
+	rng = random.Random(seed)
+	pixels = bytearray(width * height)
+	for i in range(width * height):
+		if rng.random() < density:
+			pixels[i] = 255
+	return PixelBuffer(str(pixels), width, height)
+
+# Returns the images to check as (name, PixelBuffer).
+def getImages():
+	images = []
+
+	for seed in range(1, 4):
+		parameters = EpitheliumParameters(240, 180, seed)
+		parameters.noiseDensity = 30.0
+		parameters.doubletFraction = 0.2
+		images.append((parameters.getName(), buildEpithelium(parameters)))
+	parameters = EpitheliumParameters(200, 260, 4)
+	parameters.cavePlacement = 'random'
+	parameters.cellSize = 12
+	parameters.borderWidth = 1
+	images.append((parameters.getName(), buildEpithelium(parameters)))
+
+	# Speckle: from scattered pixels to a maze of long, winding chunks that merge in many places.
+	for seed, density in enumerate([0.05, 0.3, 0.5, 0.6]):
+		images.append(('speckle-' + str(density), buildSpeckle(150, 120, density, seed)))
+
+	images.append(('empty', PixelBuffer('\x00' * (64 * 48), 64, 48)))
+	images.append(('full', PixelBuffer('\xff' * (64 * 48), 64, 48)))
+	images.append(('one column', buildSpeckle(1, 200, 0.5, 11)))
+	images.append(('one row', buildSpeckle(200, 1, 0.5, 12)))
+	images.append(('one pixel', PixelBuffer('\xff', 1, 1)))
+	return images
+
+# What has to match for an entity: its spans in order, its bounding box and its size.
+def getEntitySignature(entity):
+	return (list(entity.iterSpans()), entity.minX, entity.maxX, entity.minY, entity.maxY, entity.size)
+
+# The same for every record of a NoiseRecords.
+def getRecordSignatures(noiseRecords):
+	signatures = []
+	for i in range(len(noiseRecords)):
+		start = noiseRecords.spanOffsets[i]
+		end = noiseRecords.spanOffsets[i + 1]
+		spans = [(noiseRecords.spanXs[s], noiseRecords.spanMinYs[s], noiseRecords.spanMaxYs[s]) for s in range(start, end)]
+		signatures.append((spans, noiseRecords.minXs[i], noiseRecords.maxXs[i], noiseRecords.minYs[i], noiseRecords.maxYs[i], noiseRecords.sizes[i]))
+	return signatures
+
+# Returns a list of the differences between two lists of signatures (empty if they match).
+def compareSignatures(what, signatures, expected):
+	if len(signatures) != len(expected):
+		return [what + ': ' + str(len(signatures)) + ' instead of ' + str(len(expected))]
+	for i, (signature, expectedSignature) in enumerate(zip(signatures, expected)):
+		if signature[1:] != expectedSignature[1:]:
+			return [what + ' ' + str(i) + ': bounding box and size ' + str(signature[1:]) + ' instead of ' + str(expectedSignature[1:])]
+		if signature[0] != expectedSignature[0]:
+			return [what + ' ' + str(i) + ': different spans (bounding box and size ' + str(signature[1:]) + ')']
+	return []
+
+# Returns columns x to x + width - 1 of a PixelBuffer as a buffer of that width, like getPixelBuffer does for an ImagePlus.
+def getStrip(pixels, x, width):
+	rows = [pixels.data[(y * pixels.width) + x:(y * pixels.width) + x + width] for y in range(pixels.height)]
+	return PixelBuffer(''.join(rows), width, pixels.height, pixels.foreground)
+
+# Returns the signatures of entities in the order strip labeling completes them. A chunk is complete in the strip
+# holding the first column after its last one, or in the last strip if it reaches the right edge of the image.
+def getStripOrder(signatures, width, stripWidth):
+	lastStrip = (width - 1) // stripWidth
+	return sorted(signatures, key=lambda s: min((s[2] + 1) // stripWidth, lastStrip))
+
+# Labels an image strip by strip and returns the chunks and noise records, each in the order they were handed out.
+def findChunksInStrips(pixels, stripWidth, noiseMaxSize):
+	chunks = []
+	noiseRecords = []
+	def onChunksCompleted(completedChunks, completedNoiseRecords):
+		chunks.extend(completedChunks)
+		noiseRecords.extend(getRecordSignatures(completedNoiseRecords))
+	ChunkFinder.FindChunksInStrips(lambda x, width: getStrip(pixels, x, width), pixels.width, stripWidth, onChunksCompleted, None, noiseMaxSize)
+	return [getEntitySignature(c) for c in chunks], noiseRecords
+
+# Checks one image against the legacy finder. Returns a list of the differences.
+def checkImage(pixels):
+	legacyChunks = []
+	ChunkFinder.FindChunks(pixels, legacyChunks)
+	expected = [getEntitySignature(c) for c in legacyChunks]
+
+	differences = []
+	for noiseMaxSize in noiseMaxSizes:
+		chunks = []
+		noiseRecords = NoiseRecords(noiseMaxSize)
+		ChunkFinder.FindChunksUnionFind(pixels, chunks, None, noiseMaxSize, noiseRecords)
+		what = 'union-find with noise up to ' + str(noiseMaxSize) + ' set aside'
+		differences += compareSignatures(what + ', chunks', [getEntitySignature(c) for c in chunks], [s for s in expected if s[5] > noiseMaxSize])
+		differences += compareSignatures(what + ', noise records', getRecordSignatures(noiseRecords), [s for s in expected if s[5] <= noiseMaxSize])
+
+		for stripWidth in stripWidths:
+			stripExpected = getStripOrder(expected, pixels.width, stripWidth)
+			stripSignatures, stripNoiseRecords = findChunksInStrips(pixels, stripWidth, noiseMaxSize)
+			what = 'strips of ' + str(stripWidth) + ' with noise up to ' + str(noiseMaxSize) + ' set aside'
+			differences += compareSignatures(what + ', chunks', stripSignatures, [s for s in stripExpected if s[5] > noiseMaxSize])
+			differences += compareSignatures(what + ', noise records', stripNoiseRecords, [s for s in stripExpected if s[5] <= noiseMaxSize])
+	return differences
+
+# Returns what has to match for the cave FindCave picks for a chunk: its signature and the cave centroid, or None.
+def getSelectedCave(chunk, options):
+	CaveFinder.FindCave(chunk, options)
+	if chunk.cave is None:
+		return None
+	return (getEntitySignature(chunk.cave), chunk.caveCentroid)
+
+# Checks both cave finders on every chunk of an image and on its halves. Returns a list of the differences.
+def checkCaves(pixels):
+	chunks = []
+	ChunkFinder.FindChunks(pixels, chunks)
+	pieces = []
+	for c in chunks:
+		pieces.append(c)
+		if c.getBoundingBoxWidth() > 1:
+			pieces += list(c.divide())
+		if c.getBoundingBoxHeight() > 1:
+			pieces += list(c.divideHorizontally())
+
+	differences = []
+	for i, c in enumerate(pieces):
+		what = 'piece ' + str(i) + ' ' + str(getEntitySignature(c)[1:])
+		expected = [getEntitySignature(cave) for cave in CaveFinder.FindCaveCandidates(c)]
+		differences += compareSignatures(what + ', cave candidates', [getEntitySignature(cave) for cave in CaveFinder.FindCaveCandidatesUnionFind(c)], expected)
+		if len(expected) == 0:
+			continue
+		c.findCentroid()
+		for trueCaveMode in trueCaveModes:
+			legacyOptions = ProcessingOptions()
+			legacyOptions.trueCaveMode = trueCaveMode
+			legacyOptions.caveLabelingMode = 'legacy'
+			options = ProcessingOptions()
+			options.trueCaveMode = trueCaveMode
+			options.caveLabelingMode = 'unionfind'
+			if getSelectedCave(c, options) != getSelectedCave(c, legacyOptions):
+				differences.append(what + ': a different ' + trueCaveMode + ' cave')
+	return differences
+
+def main(args):
+	allMatch = True
+	for name, pixels in getImages():
+		differences = checkImage(pixels) + checkCaves(pixels)
+		if len(differences) == 0:
+			print name + ': same chunks and caves'
+			continue
+		allMatch = False
+		print name + ': DIFFERS'
+		for difference in differences:
+			print '  ' + difference
+	if not allMatch:
+		sys.exit(1)
+
+if __name__ == '__main__':
+	main(sys.argv[1:])
@@ -0,0 +1,222 @@
+# Benchmark and regression check for the whole measuring pipeline.
+# Builds synthetic epithelia (see synthetic.py), runs them through the pipeline with stage profiling on, and reports
+# the time of every stage along with pixels and chunks per second. The measured chunks are compared against the
+# golden results in benchmarks/golden, so a change that makes the pipeline faster can be checked to give the same
+# chunk counts, labels, sizes and angles. Any difference is printed and makes the script exit with an error.
+# The golden results were stored by this script (--update) once the pipeline optimizations were in, not by the code
+# from before them. Every case except filters-hull-1024 gives the same results with the earlier code (the hull plastic
+# wrap engine is new); that was checked by hand, as nothing here runs the earlier code.
+# With plain Python 2 only the ImageJ-independent core is timed. Under Fiji's Jython the image outputs of measure.py
+# (output image, arrows and labels) are timed too. For example:
+#   python2 benchmarks/pipeline.py                    runs the golden cases
+#   python2 benchmarks/pipeline.py 2048 4096 16384    times the default epithelium at these sizes
+#   python2 benchmarks/pipeline.py --update           runs the golden cases and stores their results as the new golden ones
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'PCP_Auto_Count', 'jars', 'Lib'))
+
+from synthetic import EpitheliumParameters, buildEpithelium
+from pcp_auto_count.basechunkcollection import BaseChunkCollection
+from pcp_auto_count.settings import ProcessingOptions
+
+try:
+	import jarray
+	from ij import ImagePlus
+	from ij.process import ByteProcessor
+	from pcp_auto_count.chunkcollection import ChunkCollection
+except ImportError:
+	ImagePlus = None
+
+goldenDirectory = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'golden')
+
+# Angles and centroids may differ in the last digits between Python and Jython.
+angleTolerance = 1e-6
+
+# The chunk lists whose sizes are compared.
+countedLists = ['chunks', 'noiseChunks', 'conglomerates', 'tooWideChunks', 'tooTallChunks', 'doubletBothAxisChunks', 'removedBorderChunks', 'badChunks']
+
+# Options every case starts from: one thread (so times are comparable), no result cache, and stage profiling on.
+def getBaseOptions():
+	options = ProcessingOptions()
+	options.chunkWorkerCount = 1
+	options.resultCacheSize = 0
+	options.outputStageProfile = True
+	return options
+
+# Options with every filter on, and the default (legacy) plastic wrap.
+def getFilterOptions():
+	options = getBaseOptions()
+	options.removeNoise = True
+	options.removeConglomerates = True
+	options.conglomeratesMinSize = 1500
+	options.splitDoubletsW = True
+	options.excludeOblongCellsH = True
+	options.excludeBorderCells = True
+	options.usePlasticWrap = True
+	return options
+
+# Returns the golden cases as (name, image parameters, options). Their golden results are in golden/<name>.json.
+def getGoldenCases():
+	cases = []
+
+	parameters = EpitheliumParameters(512, 512, 1)
+	cases.append(('plain-512', parameters, getBaseOptions()))
+
+	# Every filter at work: random caves, lots of noise, doublets to split and cells on the border to remove.
+	parameters = EpitheliumParameters(1024, 1024, 2)
+	parameters.cavePlacement = 'random'
+	parameters.noiseDensity = 20.0
+	parameters.doubletFraction = 0.1
+	parameters.cellSizeSpread = 0.35
+	cases.append(('filters-1024', parameters, getFilterOptions()))
+
+	# The same with the hull plastic wrap engine, which can change caves and angles (see plasticwrap.py).
+	options = getFilterOptions()
+	options.plasticWrapMode = 'hull'
+	cases.append(('filters-hull-1024', parameters, options))
+
+	# Strongly polarized cells, none of them touching the border.
+	parameters = EpitheliumParameters(768, 512, 3)
+	parameters.caveAngle = 200.0
+	parameters.caveAngleSpread = 5.0
+	parameters.borderCells = False
+	parameters.noiseDensity = 0.0
+	options = getBaseOptions()
+	options.angleAxisScaleZeroTo360 = True
+	cases.append(('polarized-768x512', parameters, options))
+
+	return cases
+
+# Runs the pipeline on one image and returns the measured collection. Its profiler holds the stage times.
+def runPipeline(parameters, options):
+	pixels = buildEpithelium(parameters)
+	title = parameters.getName()
+	if ImagePlus is None:
+		chunks = BaseChunkCollection()
+		chunks.measurePixels(pixels, options, title)
+		return chunks
+
+	values = [v - 256 if v > 127 else v for v in bytearray(pixels.data)]
+	imp = ImagePlus(title, ByteProcessor(pixels.width, pixels.height, jarray.array(values, 'b')))
+	chunks = ChunkCollection()
+	chunks.measureImage(imp, options)
+	# The same image outputs measure.py makes, without showing them.
+	nimp = chunks.runStage("output image", chunks.chunksToNewImage, options)
+	chunks.runStage("arrows", chunks.drawArrowsOnImage, nimp, options)
+	chunks.runStage("angle labels", chunks.drawAngleLabelsOnImage, nimp, True, True, options.getColorLabels(), options.drawingFontSize)
+	nimp.close()
+	return chunks
+
+# Returns what is compared against the golden results: the size of every chunk list, and label, size and angle of every measured chunk.
+def getResult(chunks):
+	counts = {}
+	for name in countedLists:
+		counts[name] = len(getattr(chunks, name))
+	# Noise is counted whether it was set aside while labeling or filtered out afterwards.
+	counts['noiseChunks'] += len(chunks.noiseRecords)
+	measured = [[c.label, c.getSize(), c.angle] for c in chunks.chunks]
+	return {'counts': counts, 'chunks': measured}
+
+# Returns a list of the differences between a result and the golden one (empty if they match).
+def compareResults(result, golden):
+	differences = []
+	for name in countedLists:
+		if result['counts'][name] != golden['counts'][name]:
+			differences.append(name + ': ' + str(result['counts'][name]) + ' instead of ' + str(golden['counts'][name]))
+	if len(result['chunks']) != len(golden['chunks']):
+		differences.append(str(len(result['chunks'])) + ' measured chunks instead of ' + str(len(golden['chunks'])))
+		return differences
+	for measured, expected in zip(result['chunks'], golden['chunks']):
+		if measured[0] != expected[0] or measured[1] != expected[1] or abs(measured[2] - expected[2]) > angleTolerance:
+			differences.append('chunk ' + str(measured) + ' instead of ' + str(expected))
+			if len(differences) >= 10:
+				differences.append('...')
+				break
+	return differences
+
+def getGoldenPath(name):
+	return os.path.join(goldenDirectory, name + '.json')
+
+def loadGolden(name):
+	path = getGoldenPath(name)
+	if not os.path.exists(path):
+		return None
+	goldenFile = open(path, 'r')
+	try:
+		return json.load(goldenFile)
+	finally:
+		goldenFile.close()
+
+def storeGolden(name, parameters, options, result):
+	if not os.path.exists(goldenDirectory):
+		os.makedirs(goldenDirectory)
+	golden = {'image': parameters.getDescription(), 'settings': options.getProcessingIniString().strip().split('\n')}
+	golden.update(result)
+	goldenFile = open(getGoldenPath(name), 'w')
+	try:
+		json.dump(golden, goldenFile, indent=1, sort_keys=True)
+	finally:
+		goldenFile.close()
+
+# Prints the stage times of a measured collection, with how many chunks each stage got through per second.
+def printStageTimes(chunks, pixelCount):
+	profiler = chunks.profiler
+	print '  %-24s %9s %10s %10s %12s' % ('stage', 'seconds', 'chunks in', 'chunks out', 'chunks/s')
+	for stage in profiler.stages:
+		print '  %-24s %9.3f %10d %10d %12.0f' % (stage['stage'], stage['seconds'], stage['chunksIn'], stage['chunksOut'], max(stage['chunksIn'], stage['chunksOut']) / max(stage['seconds'], 1e-9))
+	total = profiler.getTotalSeconds()
+	foundCount = 0
+	for stage in profiler.stages:
+		if stage['stage'] == 'find chunks':
+			foundCount = stage['chunksOut']
+	print '  total %.3f s: %.0f pixels/s, %.0f chunks/s (%d chunks found, %d measured)' % (total, pixelCount / max(total, 1e-9), foundCount / max(total, 1e-9), foundCount, len(chunks.chunks))
+
+# Runs one case, prints its times, and checks or stores its golden result. Returns False if the result doesn't match.
+def runCase(name, parameters, options, update=False):
+	print name + ' (' + parameters.getName() + ')'
+	start = time.time()
+	chunks = runPipeline(parameters, options)
+	printStageTimes(chunks, parameters.width * parameters.height)
+	print '  wall time including the synthetic image: %.3f s' % (time.time() - start)
+
+	result = getResult(chunks)
+	if update:
+		storeGolden(name, parameters, options, result)
+		print '  golden result stored'
+		return True
+	golden = loadGolden(name)
+	if golden is None:
+		print '  no golden result to compare with'
+		return True
+	differences = compareResults(result, golden)
+	if len(differences) == 0:
+		print '  matches the golden result'
+		return True
+	print '  DIFFERS from the golden result:'
+	for difference in differences:
+		print '    ' + difference
+	return False
+
+def main(args):
+	update = '--update' in args
+	sizes = [int(a) for a in args if a != '--update']
+
+	if len(sizes) > 0:
+		cases = []
+		for size in sizes:
+			cases.append(('plain-' + str(size), EpitheliumParameters(size, size, 1), getBaseOptions()))
+	else:
+		cases = getGoldenCases()
+
+	allMatch = True
+	for name, parameters, options in cases:
+		if not runCase(name, parameters, options, update):
+			allMatch = False
+	if not allMatch:
+		sys.exit(1)
+
+if __name__ == '__main__':
+	main(sys.argv[1:])
@@ -0,0 +1,123 @@
+# Benchmark for the plastic wrap engines.
+# Builds crescent-shaped synthetic cells (the shape plastic wrap is meant for: an open cave on one side),
+# runs the legacy and hull engines on each one, and reports per-chunk times and how closely their added pixels agree.
+# The two engines' borders differ by a few pixels, so it also measures every wrapped chunk the way the pipeline does,
+# on the crescents and on the cells of synthetic epithelia (see synthetic.py), and reports how often the engines
+# disagree on whether a chunk has a usable cave, and how far apart their angles are when both find one.
+# On single cells the angles stay within a few degrees. Larger differences come from chunks with two caves (doublets,
+# or neighbours that touch) and from cells cut off by the image border, whose caves are ambiguous to begin with.
+# It only uses the ImageJ-independent core, so it runs with plain Python 2 or with Fiji's Jython, e.g.:
+#   python2 benchmarks/plastic_wrap.py 200
+import os
+import sys
+import random
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'PCP_Auto_Count', 'jars', 'Lib'))
+
+from synthetic import EpitheliumParameters, buildEpithelium
+from pcp_auto_count.chunk import Chunk
+from pcp_auto_count.basechunkcollection import BaseChunkCollection, getLabelingNoiseMaxSize
+from pcp_auto_count.plasticwrap import PlasticWrap
+from pcp_auto_count.settings import ProcessingOptions
+
+# A disc of the given radius with a notch cut into one side, placed at (cx, cy).
+def buildCrescent(cx, cy, radius, notchDepth):
+	chunk = Chunk()
+	for dx in range(-radius, radius + 1):
+		half = int((radius * radius - dx * dx) ** 0.5)
+		ystart = cy - half
+		yend = cy + half
+		if dx > radius - notchDepth and half > 2:
+			# The notch splits this column in two.
+			notchHalf = half // 2
+			chunk.addSpan(cx + dx, ystart, cy - notchHalf - 1)
+			chunk.addSpan(cx + dx, cy + notchHalf + 1, yend)
+		else:
+			chunk.addSpan(cx + dx, ystart, yend)
+	return chunk
+
+# Returns the epithelia whose cells are compared, as (name, EpitheliumParameters).
+# The first three have single cells only. The last one adds doublets that are too narrow to be split. A doublet has
+# two caves, and the engines' slightly different outlines can make the cave finder pick either one, which flips the angle.
+def getEpithelia():
+	epithelia = []
+	parameters = EpitheliumParameters(512, 512, 1)
+	parameters.doubletFraction = 0.0
+	epithelia.append(('cells', parameters))
+	parameters = EpitheliumParameters(512, 512, 2)
+	parameters.doubletFraction = 0.0
+	parameters.cavePlacement = 'random'
+	parameters.cellSizeSpread = 0.35
+	epithelia.append(('random caves', parameters))
+	parameters = EpitheliumParameters(768, 512, 3)
+	parameters.doubletFraction = 0.0
+	parameters.cellSize = 44
+	parameters.caveSize = 0.35
+	parameters.caveOffset = 0.3
+	epithelia.append(('large caves', parameters))
+	parameters = EpitheliumParameters(512, 512, 4)
+	parameters.doubletFraction = 0.1
+	epithelia.append(('doublets', parameters))
+	return epithelia
+
+# Returns a collection holding the chunks of an epithelium that the pipeline would plastic wrap: those left after the filters.
+def getFilteredChunks(parameters, options):
+	pixels = buildEpithelium(parameters)
+	collection = BaseChunkCollection()
+	collection.setImageInfo(pixels.width, pixels.height, parameters.getName())
+	collection.findChunksInPixels(pixels, options, getLabelingNoiseMaxSize(options))
+	collection.filterChunks(options)
+	return collection
+
+# The difference between two angles in degrees, the short way around the circle.
+def getAngleDifference(a, b):
+	difference = abs(a - b) % 360.0
+	return min(difference, 360.0 - difference)
+
+# Prints how often the engines disagree about caves, and how far apart their angles are, for records from compareEngines.
+def printCaveSummary(name, results):
+	both = [r for r in results if r['legacyAngle'] is not None and r['hullAngle'] is not None]
+	legacyOnly = len([r for r in results if r['legacyAngle'] is not None and r['hullAngle'] is None])
+	hullOnly = len([r for r in results if r['legacyAngle'] is None and r['hullAngle'] is not None])
+	neither = len(results) - len(both) - legacyOnly - hullOnly
+	differences = [getAngleDifference(r['legacyAngle'], r['hullAngle']) for r in both]
+	print '%s: %d chunks. Usable cave with both engines: %d, legacy only: %d, hull only: %d, neither: %d' % (name, len(results), len(both), legacyOnly, hullOnly, neither)
+	if len(differences) == 0:
+		return
+	print '  angles with both: %d the same, %d within 1 degree, %d within 5 degrees, %d further apart (mean %.3f, max %.3f degrees)' % (
+		len([d for d in differences if d < 1e-6]), len([d for d in differences if 1e-6 <= d <= 1.0]), len([d for d in differences if 1.0 < d <= 5.0]),
+		len([d for d in differences if d > 5.0]), sum(differences) / len(differences), max(differences))
+
+def main(args):
+	count = 100
+	if len(args) > 0:
+		count = int(args[0])
+
+	random.seed(1)
+	collection = BaseChunkCollection()
+	collection.imageWidth = 4096
+	collection.imageHeight = 4096
+	for i in range(count):
+		radius = random.randint(8, 40)
+		collection.chunks.append(buildCrescent(50 + (i % 40) * 100, 50 + (i // 40) * 100, radius, random.randint(2, radius)))
+
+	options = ProcessingOptions()
+	results = PlasticWrap.compareEngines(collection, 0, options)
+
+	print 'chunk  size  legacy ms  hull ms  legacy added  hull added  shared'
+	for i, r in enumerate(results):
+		print '%5d %5d %10.2f %8.2f %13d %11d %7d' % (i, r['size'], r['legacySeconds'] * 1000.0, r['hullSeconds'] * 1000.0, r['legacyAdditions'], r['hullAdditions'], r['sharedAdditions'])
+
+	legacyTotal = sum([r['legacySeconds'] for r in results])
+	hullTotal = sum([r['hullSeconds'] for r in results])
+	print 'total: legacy %.3f s, hull %.3f s (%.1fx)' % (legacyTotal, hullTotal, legacyTotal / max(hullTotal, 1e-9))
+
+	print
+	print 'Caves and angles after wrapping with each engine:'
+	printCaveSummary('crescents', results)
+	options.removeNoise = True
+	for name, parameters in getEpithelia():
+		printCaveSummary(name + ' (' + parameters.getName() + ')', PlasticWrap.compareEngines(getFilteredChunks(parameters, options), 0, options))
+
+if __name__ == '__main__':
+	main(sys.argv[1:])
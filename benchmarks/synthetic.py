@@ -0,0 +1,133 @@
+# Deterministic synthetic PCP images for the benchmarks.
+# An image is a sheet of tightly packed elliptical cells on a honeycomb grid, separated by thin dark borders, like a
+# thresholded epithelium. Each cell has a cave: a round hole placed off its center, whose direction is what the plugin
+# measures. On top of that there can be noise specks between the cells, doublets (two cells fused side by side) and
+# cells cut off by the image border. The same parameters and seed always give the same image, on any Python.
+# Nothing in this file depends on ImageJ.
+import math
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'PCP_Auto_Count', 'jars', 'Lib'))
+
+from pcp_auto_count.pixelbuffer import PixelBuffer
+
+class EpitheliumParameters:
+
+	def __init__(self, width=512, height=512, seed=1):
+		self.width = width
+		self.height = height
+		self.seed = seed
+
+		# Average cell diameter in pixels, and how much it varies from cell to cell (as a fraction of it).
+		self.cellSize = 28
+		self.cellSizeSpread = 0.2
+		# Dark pixels between neighbouring cells.
+		self.borderWidth = 2
+
+		# Where caves go: 'aligned' points them all around caveAngle (in degrees, counterclockwise from east),
+		# give or take caveAngleSpread degrees, like a polarized tissue. 'random' points them anywhere.
+		self.cavePlacement = 'aligned'
+		self.caveAngle = 90.0
+		self.caveAngleSpread = 30.0
+		# Cave diameter and distance from the cell center, as fractions of the cell size.
+		self.caveSize = 0.25
+		self.caveOffset = 0.22
+
+		# Noise specks (one to three pixels) per 10,000 pixels of image.
+		self.noiseDensity = 4.0
+		# Fraction of cells fused with their right-hand neighbour into one doublet.
+		self.doubletFraction = 0.05
+		# With this off, cells that would touch the image border are left out.
+		self.borderCells = True
+
+	# A short name for the image, used to name its golden results.
+	def getName(self):
+		return 'epithelium-' + str(self.width) + 'x' + str(self.height) + '-seed' + str(self.seed)
+
+	# Returns the parameters as a dictionary, as stored with golden results.
+	def getDescription(self):
+		return dict(self.__dict__)
+
+# Fills the pixels inside an ellipse (centered on cx, cy, with half-axes rx and ry) one row run at a time.
+def fillEllipse(pixels, width, height, cx, cy, rx, ry, value):
+	for y in range(max(0, int(math.ceil(cy - ry))), min(height - 1, int(math.floor(cy + ry))) + 1):
+		dy = (y - cy) / ry
+		if dy * dy > 1.0:
+			continue
+		halfWidth = rx * math.sqrt(1.0 - (dy * dy))
+		start = max(0, int(math.ceil(cx - halfWidth)))
+		end = min(width - 1, int(math.floor(cx + halfWidth)))
+		if end >= start:
+			rowStart = y * width
+			pixels[rowStart + start:rowStart + end + 1] = value * (end - start + 1)
+
+def getCaveAngle(parameters, rng):
+	if parameters.cavePlacement == 'random':
+		return rng.uniform(0.0, 360.0)
+	return parameters.caveAngle + rng.uniform(-parameters.caveAngleSpread, parameters.caveAngleSpread)
+
+# Draws one cell with its cave. The cave points the given number of degrees counterclockwise from east (image y points down).
+def drawCell(pixels, parameters, cx, cy, rx, ry, caveAngle):
+	width = parameters.width
+	height = parameters.height
+	fillEllipse(pixels, width, height, cx, cy, rx, ry, '\xff')
+	radians = math.radians(caveAngle)
+	caveRadius = max(1.0, parameters.caveSize * min(rx, ry))
+	caveDistance = parameters.caveOffset * 2.0 * min(rx, ry)
+	fillEllipse(pixels, width, height, cx + (caveDistance * math.cos(radians)), cy - (caveDistance * math.sin(radians)), caveRadius, caveRadius, '\x00')
+
+# Builds the image described by an EpitheliumParameters, and returns it as a PixelBuffer (cells are 255, the rest 0).
+def buildEpithelium(parameters):
+	rng = random.Random(parameters.seed)
+	width = parameters.width
+	height = parameters.height
+	pixels = bytearray(width * height)
+
+	pitch = parameters.cellSize + parameters.borderWidth
+	# Every other row is shifted by half a cell, so the cells pack like a honeycomb.
+	rowCount = int(height / pitch) + 2
+	columnCount = int(width / pitch) + 2
+	for row in range(rowCount):
+		shift = (row % 2) * (pitch / 2.0)
+		column = 0
+		while column < columnCount:
+			cx = (column * pitch) + shift
+			cy = row * pitch
+			size = parameters.cellSize * (1.0 + rng.uniform(-parameters.cellSizeSpread, parameters.cellSizeSpread))
+			# Cells never grow into their neighbours, or the border between them would close.
+			rx = min(size, parameters.cellSize) / 2.0
+			ry = min(size * rng.uniform(0.85, 1.15), parameters.cellSize) / 2.0
+			caveAngle = getCaveAngle(parameters, rng)
+			isDoublet = rng.random() < parameters.doubletFraction
+
+			if isDoublet:
+				# Two cells side by side, joined across the border between them.
+				left = cx - rx
+				right = cx + pitch + rx
+				touchesBorder = left < 0 or right > width - 1 or cy - ry < 0 or cy + ry > height - 1
+				if parameters.borderCells or not touchesBorder:
+					# The bridge goes in first, so it can't fill in either cave.
+					fillEllipse(pixels, width, height, cx + (pitch / 2.0), cy, pitch / 2.0, ry * 0.6, '\xff')
+					drawCell(pixels, parameters, cx, cy, rx, ry, caveAngle)
+					drawCell(pixels, parameters, cx + pitch, cy, rx, ry, getCaveAngle(parameters, rng))
+				column += 2
+				continue
+
+			touchesBorder = cx - rx < 0 or cx + rx > width - 1 or cy - ry < 0 or cy + ry > height - 1
+			if parameters.borderCells or not touchesBorder:
+				drawCell(pixels, parameters, cx, cy, rx, ry, caveAngle)
+			column += 1
+
+	noiseCount = int((width * height * parameters.noiseDensity) / 10000.0)
+	for i in range(noiseCount):
+		x = rng.randrange(width)
+		y = rng.randrange(height)
+		pixels[(y * width) + x] = 255
+		if x + 1 < width and rng.random() < 0.5:
+			pixels[(y * width) + x + 1] = 255
+		if y + 1 < height and rng.random() < 0.3:
+			pixels[((y + 1) * width) + x] = 255
+
+	return PixelBuffer(str(pixels), width, height)